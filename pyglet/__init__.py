@@ -105,6 +105,20 @@ if getattr(sys, 'frozen', None):
 #:     this option is enabled if ``__debug__`` is (i.e., if Python was not run
 #:     with the -O option).  It is disabled by default when pyglet is "frozen"
 #:     within a py2exe or py2app library archive.
+#:
+#:     With this option disabled ("release mode"), GL functions are called
+#:     directly through ctypes with no Python code run per call.
+#: debug_gl_per_frame
+#:     If True, and ``debug_gl`` is also set, ``glGetError`` is checked once
+#:     per frame, after the event loop flips each window, instead of after
+#:     every call.  Errors are still reported as exceptions, but without the
+#:     per-call overhead and not at the exact call that failed.
+#:     The check is made by `pyglet.app.EventLoop` only, not by
+#:     `pyglet.window.Window.flip`; applications running their own loop
+#:     must call `pyglet.gl.lib.check_error` after drawing, or errors are
+#:     not reported at all.
+#:
+#:     **Since:** pyglet 1.2
 #: shadow_window
 #:     By default, pyglet creates a hidden window with a GL context when
 #:     pyglet.gl is imported.  This allows resources to be loaded before
@@ -144,11 +158,33 @@ if getattr(sys, 'frozen', None):
 #:
 #:     **Since:** pyglet 1.2
 #:
+#: graphics_vao
+#:     If True (the default), vertex domains record their attribute pointer
+#:     setup in a vertex array object when the context supports
+#:     ``GL_ARB_vertex_array_object`` (or OpenGL 3.0), so that drawing an
+#:     unchanged domain does not repeat the ``gl*Pointer`` calls.  Set to
+#:     False if a driver misbehaves with vertex array objects in the
+#:     compatibility profile.
+#:
+#:     **Since:** pyglet 1.2
+#:
+#: graphics_stream_buffers
+#:     The number of buffer objects each vertex buffer with ``stream`` usage
+#:     cycles through.  With the default of 1, the buffer is orphaned
+#:     (re-specified) whenever it is changed, so the driver can allocate new
+#:     storage instead of waiting for the GPU to finish drawing the previous
+#:     frame's data.  Higher values round-robin between that many buffers
+#:     instead, which avoids relying on the driver to orphan efficiently at
+#:     the cost of more video memory.
+#:
+#:     **Since:** pyglet 1.2
+#:
 options = {
     'audio': ('directsound', 'pulse', 'openal', 'silent'),
     'font': ('gdiplus', 'win32'), # ignored outside win32; win32 is deprecated
     'debug_font': False,
     'debug_gl': not _enable_optimisations,
+    'debug_gl_per_frame': False,
     'debug_gl_trace': False,
     'debug_gl_trace_args': False,
     'debug_graphics_batch': False,
@@ -162,6 +198,8 @@ options = {
     'debug_win32': False,
     'debug_x11': False,
     'graphics_vbo': True,
+    'graphics_vao': True,
+    'graphics_stream_buffers': 1,
     'shadow_window': False,
     'vsync': None,
     'xsync': True,
@@ -175,6 +213,7 @@ _option_types = {
     'font': tuple,
     'debug_font': bool,
     'debug_gl': bool,
+    'debug_gl_per_frame': bool,
     'debug_gl_trace': bool,
     'debug_gl_trace_args': bool,
     'debug_graphics_batch': bool,
@@ -188,6 +227,8 @@ _option_types = {
     'debug_win32': bool,
     'debug_x11': bool,
     'graphics_vbo': bool,
+    'graphics_vao': bool,
+    'graphics_stream_buffers': int,
     'shadow_window': bool,
     'vsync': bool,
     'xsync': bool,
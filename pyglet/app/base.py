@@ -10,10 +10,14 @@ import sys
 import threading
 import Queue
 
+import pyglet
 from pyglet import app
 from pyglet import clock
 from pyglet import event
 
+_debug_gl_per_frame = (pyglet.options['debug_gl'] and
+                       pyglet.options['debug_gl_per_frame'])
+
 _is_epydoc = hasattr(sys, 'is_epydoc') and sys.is_epydoc
 
 class PlatformEventLoop(object):
@@ -280,6 +284,9 @@ class EventLoop(event.EventDispatcher):
                 window.dispatch_event('on_draw')
                 window.flip()
                 window._legacy_invalid = False
+                if _debug_gl_per_frame:
+                    from pyglet.gl.lib import check_error
+                    check_error()
 
         # Update timout
         return self.clock.get_sleep_time(True)
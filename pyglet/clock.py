@@ -136,6 +136,23 @@ limiting/measurement.  Each clock must be "ticked" separately.
 Multiple and derived clocks potentially allow you to separate "game-time" and
 "wall-time", or to synchronise your clock to an audio or video stream instead
 of the system clock.
+
+Profiling scheduled functions
+=============================
+
+To find out which scheduled function is eating into the frame budget, the
+clock can record how often each scheduled function is called, how long it
+takes and how late it runs compared to when it was due::
+
+    clock.enable_profiling(log_interval=5)
+
+The statistics are printed every `log_interval` seconds, and can also be
+retrieved at any time with `get_profile_stats` or printed with
+`print_profile_stats`.  Statistics are kept per function, not per
+callable: a method scheduled on many objects has a single entry, and the
+objects are not kept alive by the profiler.  Profiling adds a small
+overhead to every scheduled call, so disable it again with
+`disable_profiling` when you are done.
 '''
 
 __docformat__ = 'restructuredtext'
@@ -192,6 +209,101 @@ class _ScheduledIntervalItem(object):
         self.args = args
         self.kwargs = kwargs
 
+class ScheduledFunctionStats(object):
+    '''Timing statistics recorded for one scheduled function while
+    profiling is enabled on a `Clock`.
+
+    :Ivariables:
+        `func` : function
+            The scheduled function.  For methods this is the underlying
+            function, not bound to any object.
+        `calls` : int
+            Number of times the function was called.
+        `total_time` : float
+            Cumulative wall time spent in the function, in seconds.
+        `max_time` : float
+            Longest single call, in seconds.
+        `total_lateness` : float
+            Cumulative time, in seconds, by which interval and one-shot
+            calls ran after they were due.  Always 0 for functions
+            scheduled with `Clock.schedule`.
+        `max_lateness` : float
+            Largest single lateness, in seconds.
+        `name` : str
+            Qualified name of the scheduled function, including its module
+            and, for methods, its class.
+
+    :since: pyglet 1.2
+    '''
+    __slots__ = ['func', 'name', 'calls', 'total_time', 'max_time',
+                 'total_lateness', 'max_lateness']
+
+    def __init__(self, func, name):
+        self.func = func
+        self.name = name
+        self.calls = 0
+        self.total_time = 0.
+        self.max_time = 0.
+        self.total_lateness = 0.
+        self.max_lateness = 0.
+
+    def _get_average_time(self):
+        if not self.calls:
+            return 0.
+        return self.total_time / self.calls
+
+    average_time = property(_get_average_time,
+                            doc='''Mean wall time per call, in seconds.
+
+    :type: float
+    ''')
+
+    def _get_average_lateness(self):
+        if not self.calls:
+            return 0.
+        return self.total_lateness / self.calls
+
+    average_lateness = property(_get_average_lateness,
+                                doc='''Mean lateness per call, in seconds.
+
+    :type: float
+    ''')
+
+    def _copy(self):
+        stats = ScheduledFunctionStats(self.func, self.name)
+        stats.calls = self.calls
+        stats.total_time = self.total_time
+        stats.max_time = self.max_time
+        stats.total_lateness = self.total_lateness
+        stats.max_lateness = self.max_lateness
+        return stats
+
+    def __repr__(self):
+        return '%s(%s, calls=%d, total_time=%f)' % (
+            self.__class__.__name__, self.name, self.calls, self.total_time)
+
+def _get_profile_key(func):
+    # Return (key, function, name) identifying a scheduled callable for
+    # profiling.  Methods are keyed by class and function rather than by
+    # bound method, so that a method scheduled on many objects has one entry
+    # and the objects are not kept alive; other functions are keyed by their
+    # code, so that closures created per call share an entry too.
+    im_func = getattr(func, 'im_func', None)
+    if im_func is not None:
+        cls = func.im_class
+        return ((cls, im_func), im_func,
+                '%s.%s.%s' % (cls.__module__, cls.__name__, im_func.__name__))
+
+    code = getattr(func, 'func_code', None)
+    if code is not None:
+        return (code, func,
+                '%s.%s' % (getattr(func, '__module__', None), func.__name__))
+
+    # Builtins and other callable objects.
+    cls = type(func)
+    name = getattr(func, '__name__', None) or cls.__name__
+    return ((cls, name), cls, '%s.%s' % (cls.__module__, name))
+
 def _dummy_schedule_func(*args, **kwargs):
     '''Dummy function that does nothing, placed onto zombie scheduled items
     to ensure they have no side effect if already queued inside tick() method.
@@ -224,6 +336,13 @@ class Clock(_ClockBase):
     # If True, a sleep(0) is inserted on every tick.   
     _force_sleep = False
 
+    # Dict of profile key => ScheduledFunctionStats, or None if profiling is
+    # disabled.  See _get_profile_key.
+    _profile_stats = None
+
+    # Interval, in seconds, between printed profile reports, or None.
+    _profile_log_interval = None
+
     def __init__(self, fps_limit=None, time_function=_default_time_function):
         '''Initialise a Clock, with optional framerate limit and custom
         time function.
@@ -292,12 +411,16 @@ class Clock(_ClockBase):
         '''
         ts = self.last_ts
         result = False
+        profile = self._profile_stats is not None
 
         # Call functions scheduled for every frame  
         # Dupe list just in case one of the items unchedules itself
         for item in list(self._schedule_items):
             result = True
-            item.func(dt, *item.args, **item.kwargs)
+            if profile:
+                self._call_profiled(item, dt, 0.)
+            else:
+                item.func(dt, *item.args, **item.kwargs)
 
         # Call all scheduled interval functions and reschedule for future.
         need_resort = False
@@ -306,7 +429,10 @@ class Clock(_ClockBase):
             if item.next_ts > ts:
                 break
             result = True
-            item.func(ts - item.last_ts, *item.args, **item.kwargs)
+            if profile:
+                self._call_profiled(item, ts - item.last_ts, ts - item.next_ts)
+            else:
+                item.func(ts - item.last_ts, *item.args, **item.kwargs)
             if item.interval:
                 # Try to keep timing regular, even if overslept this time;
                 # but don't schedule in the past (which could lead to
@@ -340,6 +466,121 @@ class Clock(_ClockBase):
 
         return result
 
+    def _call_profiled(self, item, dt, lateness):
+        func = item.func
+        if func == self._log_profile_stats:
+            # Don't include the time spent printing the report.
+            func(dt, *item.args, **item.kwargs)
+            return
+
+        key, stats_func, name = _get_profile_key(func)
+        stats = self._profile_stats.get(key)
+        if stats is None:
+            stats = self._profile_stats[key] = \
+                ScheduledFunctionStats(stats_func, name)
+
+        start = _default_time_function()
+        try:
+            func(dt, *item.args, **item.kwargs)
+        finally:
+            elapsed = _default_time_function() - start
+            stats.calls += 1
+            stats.total_time += elapsed
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+            if lateness > 0:
+                stats.total_lateness += lateness
+                if lateness > stats.max_lateness:
+                    stats.max_lateness = lateness
+
+    def enable_profiling(self, log_interval=None):
+        '''Start recording timing statistics for scheduled functions.
+
+        While profiling is enabled, every call made by
+        `call_scheduled_functions` is timed and accumulated per scheduled
+        function; see `ScheduledFunctionStats`.  Statistics already
+        recorded are kept.
+
+        :since: pyglet 1.2
+
+        :Parameters:
+            `log_interval` : float
+                If not None, `print_profile_stats` is scheduled on this
+                clock to run every `log_interval` seconds.
+
+        '''
+        if self._profile_stats is None:
+            self._profile_stats = {}
+
+        if self._profile_log_interval is not None:
+            self.unschedule(self._log_profile_stats)
+        self._profile_log_interval = log_interval
+        if log_interval is not None:
+            self.schedule_interval(self._log_profile_stats, log_interval)
+
+    def disable_profiling(self):
+        '''Stop recording timing statistics for scheduled functions and
+        discard any statistics already recorded.
+
+        :since: pyglet 1.2
+        '''
+        if self._profile_log_interval is not None:
+            self.unschedule(self._log_profile_stats)
+            self._profile_log_interval = None
+        self._profile_stats = None
+
+    def reset_profile_stats(self):
+        '''Discard recorded statistics without disabling profiling.
+
+        :since: pyglet 1.2
+        '''
+        if self._profile_stats is not None:
+            self._profile_stats = {}
+
+    def get_profile_stats(self):
+        '''Get a snapshot of the statistics recorded since profiling was
+        enabled or last reset.
+
+        The returned objects are copies; they are not updated by later
+        calls.
+
+        :since: pyglet 1.2
+
+        :rtype: list of `ScheduledFunctionStats`
+        :return: One entry per scheduled function that has been called,
+            most expensive (by `total_time`) first.  Empty if profiling is
+            disabled.
+        '''
+        if not self._profile_stats:
+            return []
+        stats = [s._copy() for s in self._profile_stats.values()]
+        stats.sort(key=lambda s: s.total_time, reverse=True)
+        return stats
+
+    def print_profile_stats(self, file=None):
+        '''Print a table of the recorded statistics, most expensive
+        function first.  Times are given in milliseconds.
+
+        :since: pyglet 1.2
+
+        :Parameters:
+            `file` : file
+                Stream to print to.  Defaults to ``sys.stdout``.
+
+        '''
+        if file is None:
+            file = sys.stdout
+        print >> file, '%-40s %8s %10s %10s %10s %10s' % (
+            'function', 'calls', 'total', 'mean', 'max', 'max late')
+        for stats in self.get_profile_stats():
+            print >> file, '%-40s %8d %10.3f %10.3f %10.3f %10.3f' % (
+                stats.name[-40:], stats.calls,
+                stats.total_time * 1000, stats.average_time * 1000,
+                stats.max_time * 1000, stats.max_lateness * 1000)
+
+    def _log_profile_stats(self, dt):
+        self.print_profile_stats()
+
     def tick(self, poll=False):
         '''Signify that one frame has passed.
 
@@ -862,6 +1103,62 @@ def unschedule(func):
     '''
     _default.unschedule(func)
 
+def enable_profiling(log_interval=None):
+    '''Start recording timing statistics for functions scheduled on the
+    default clock.
+
+    See `Clock.enable_profiling` for details.
+
+    :since: pyglet 1.2
+
+    :Parameters:
+        `log_interval` : float
+            If not None, the statistics are printed every `log_interval`
+            seconds.
+
+    '''
+    _default.enable_profiling(log_interval)
+
+def disable_profiling():
+    '''Stop recording timing statistics on the default clock.
+
+    :since: pyglet 1.2
+    '''
+    _default.disable_profiling()
+
+def get_profile_stats():
+    '''Get a snapshot of the statistics recorded on the default clock.
+
+    See `Clock.get_profile_stats` for details.
+
+    :since: pyglet 1.2
+
+    :rtype: list of `ScheduledFunctionStats`
+    '''
+    return _default.get_profile_stats()
+
+def reset_profile_stats():
+    '''Discard the statistics recorded on the default clock without
+    disabling profiling.
+
+    :since: pyglet 1.2
+    '''
+    _default.reset_profile_stats()
+
+def print_profile_stats(file=None):
+    '''Print a table of the statistics recorded on the default clock.
+
+    See `Clock.print_profile_stats` for details.
+
+    :since: pyglet 1.2
+
+    :Parameters:
+        `file` : file
+            Stream to print to.  Defaults to ``sys.stdout``.
+
+    '''
+    _default.print_profile_stats(file)
+
 class ClockDisplay(object):
     '''Display current clock values, such as FPS.
 
@@ -42,6 +42,7 @@ classes as a documented interface to the concrete classes.
 __docformat__ = 'restructuredtext'
 __version__ = '$Id$'
 
+import ctypes
 import unicodedata
 
 from pyglet.gl import *
@@ -205,6 +206,15 @@ class Glyph(image.TextureRegion):
         '''
         return 0
 
+# Image formats to stage glyph textures in, by internal format.
+_staging_formats = {
+    GL_ALPHA: ('A', GL_ALPHA),
+    GL_LUMINANCE: ('L', GL_LUMINANCE),
+    GL_LUMINANCE_ALPHA: ('LA', GL_LUMINANCE_ALPHA),
+    GL_RGB: ('RGB', GL_RGB),
+    GL_RGBA: ('RGBA', GL_RGBA),
+}
+
 class GlyphTextureAtlas(image.Texture):
     '''A texture within which glyphs can be drawn.
     '''
@@ -213,6 +223,13 @@ class GlyphTextureAtlas(image.Texture):
     y = 0
     line_height = 0
 
+    # (image format, GL format) of the client-side copy of the texture while
+    # uploads are deferred, the copy itself once a glyph is written to it,
+    # and the range of rows written.
+    _staging_format = None
+    _staging = None
+    _staging_rows = None
+
     def apply_blend_state(self):
         '''Set the OpenGL blend state for the glyphs in this texture.
         '''
@@ -241,10 +258,90 @@ class GlyphTextureAtlas(image.Texture):
         region = self.get_region(
             self.x, self.y, image.width, image.height)
         if image.width > 0:
-            region.blit_into(image, 0, 0, 0)
+            if self._staging_format:
+                self._stage(image, self.x, self.y)
+            else:
+                region.blit_into(image, 0, 0, 0)
             self.x += image.width + 1
         return region
 
+    def defer_upload(self, internalformat=GL_ALPHA):
+        '''Write glyphs fitted into this texture to client memory until
+        `upload` is called.
+
+        Uploading each glyph separately is slow when many glyphs are created
+        at once; see `Font.prewarm`.  Has no effect if `internalformat` is
+        not one of the unsized base formats, such as ``GL_ALPHA`` or
+        ``GL_RGBA``.
+
+        :Parameters:
+            `internalformat` : int
+                Internal format the texture was created with.
+
+        :since: pyglet 1.2
+        '''
+        if not self._staging_format:
+            self._staging_format = _staging_formats.get(internalformat)
+
+    def upload(self):
+        '''Upload glyphs written since `defer_upload` was called, and upload
+        subsequent glyphs as they are fitted.
+
+        :since: pyglet 1.2
+        '''
+        format, gl_format = self._staging_format or (None, None)
+        staging = self._staging
+        rows = self._staging_rows
+        self._staging_format = self._staging = self._staging_rows = None
+        if rows is None:
+            return
+
+        start, end = rows
+        pitch = self.width * len(format)
+        buffer = (GLubyte * ((end - start) * pitch)).from_buffer(
+            staging, start * pitch)
+        glBindTexture(self.target, self.id)
+        glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glTexSubImage2D(self.target, self.level, 0, start, self.width,
+                        end - start, gl_format, GL_UNSIGNED_BYTE, buffer)
+        glPopClientAttrib()
+
+    def _stage(self, image, x, y):
+        format, gl_format = self._staging_format
+        if self._staging is None:
+            self._staging = bytearray(self.width * self.height * len(format))
+            if x or y:
+                # Keep the glyphs already in the texture.
+                buffer = (GLubyte * len(self._staging)).from_buffer(
+                    self._staging)
+                glBindTexture(self.target, self.id)
+                glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+                glPixelStorei(GL_PACK_ALIGNMENT, 1)
+                glGetTexImage(self.target, self.level, gl_format,
+                              GL_UNSIGNED_BYTE, buffer)
+                glPopClientAttrib()
+
+        image = image.get_image_data()
+        row_bytes = image.width * len(format)
+        data = image.get_data(format, row_bytes)
+        if not isinstance(data, str):
+            # Image data can be a ctypes array or pointer.
+            data = ctypes.string_at(data, row_bytes * image.height)
+        pitch = self.width * len(format)
+        offset = y * pitch + x * len(format)
+        staging = self._staging
+        for row in range(image.height):
+            staging[offset:offset + row_bytes] = \
+                data[row * row_bytes:(row + 1) * row_bytes]
+            offset += pitch
+
+        if self._staging_rows:
+            start, end = self._staging_rows
+            self._staging_rows = min(start, y), max(end, y + image.height)
+        else:
+            self._staging_rows = y, y + image.height
+
 class GlyphRenderer(object):
     '''Abstract class for creating glyph images.
     '''
@@ -285,6 +382,9 @@ class Font(object):
     glyph_renderer_class = GlyphRenderer
     texture_class = GlyphTextureAtlas
 
+    # True while glyph texture uploads are deferred by `prewarm`.
+    _defer_uploads = False
+
     def __init__(self):
         self.textures = []
         self.glyphs = {}
@@ -349,10 +449,51 @@ class Font(object):
                 texture = self.texture_class.create_for_size(GL_TEXTURE_2D,
                     self.texture_width, self.texture_height,
                     self.texture_internalformat)
+            if self._defer_uploads:
+                texture.defer_upload(self.texture_internalformat)
             self.textures.insert(0, texture)
             glyph = texture.fit(image)
         return glyph
 
+    def prewarm(self, text):
+        '''Create glyphs for all characters in `text` ahead of their use.
+
+        Creating glyphs the first time text is laid out can cause a visible
+        pause; prewarming a font with the characters a HUD or score display
+        may need avoids this.  The glyphs are rendered with a single glyph
+        renderer and written to the font textures in client memory, and each
+        texture is uploaded once at the end::
+
+            font = pyglet.font.load('Arial', 16)
+            font.prewarm('0123456789 SCORE LIVES HI-SCORE')
+
+        Characters that already have glyphs are skipped, so prewarming is
+        cheap to repeat.
+
+        :Parameters:
+            `text` : str or unicode
+                Characters to create glyphs for; for example, every
+                printable Latin-1 character:
+                ``u''.join(map(unichr, range(0x20, 0x7f) + range(0xa0, 0x100)))``
+
+        :since: pyglet 1.2
+        '''
+        if self._defer_uploads:
+            self.get_glyphs(text)
+            return
+
+        self._defer_uploads = True
+        try:
+            for texture in self.textures:
+                if hasattr(texture, 'defer_upload'):
+                    texture.defer_upload(self.texture_internalformat)
+            self.get_glyphs(text)
+        finally:
+            self._defer_uploads = False
+            for texture in self.textures:
+                if hasattr(texture, 'upload'):
+                    texture.upload()
+
     def get_glyphs(self, text):
         '''Create and return a list of Glyphs for `text`.
 
@@ -277,6 +277,10 @@ class Context(object):
             self.object_space = context_share.object_space
         else:
             self.object_space = ObjectSpace()
+
+        # Vertex array objects are never shared between contexts, so those
+        # scheduled for deletion are kept on the context itself.
+        self._doomed_vaos = []
     
     def __repr__(self):
         return '%s()' % self.__class__.__name__
@@ -323,6 +327,11 @@ class Context(object):
             buffers = (gl.GLuint * len(buffers))(*buffers)
             gl.glDeleteBuffers(len(buffers), buffers)
             self.object_space._doomed_buffers[0:len(buffers)] = []
+        if self._doomed_vaos:
+            vaos = self._doomed_vaos[:]
+            vaos = (gl.GLuint * len(vaos))(*vaos)
+            gl.glDeleteVertexArrays(len(vaos), vaos)
+            self._doomed_vaos[0:len(vaos)] = []
 
     def destroy(self):
         '''Release the context.
@@ -379,6 +388,25 @@ class Context(object):
         else:
             self.object_space._doomed_buffers.append(buffer_id)
 
+    def delete_vao(self, vao_id):
+        '''Safely delete a vertex array object belonging to this context.
+
+        Vertex array objects are not shared between contexts, so unless this
+        context is current the deletion is deferred until it is next made
+        current.
+
+        :Parameters:
+            `vao_id` : int
+                The OpenGL name of the vertex array object to delete.
+
+        :since: pyglet 1.2
+        '''
+        if gl.current_context is self:
+            id = gl.GLuint(vao_id)
+            gl.glDeleteVertexArrays(1, id)
+        else:
+            self._doomed_vaos.append(vao_id)
+
     def get_info(self):
         '''Get the OpenGL information for this context.
 
@@ -0,0 +1,271 @@
+# ----------------------------------------------------------------------------
+# pyglet
+# Copyright (c) 2006-2008 Alex Holkner
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions 
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of pyglet nor the names of its
+#    contributors may be used to endorse or promote products
+#    derived from this software without specific prior written
+#    permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# ----------------------------------------------------------------------------
+
+
+'''Counts of OpenGL calls made by the application.
+
+Usage::
+
+    from pyglet.gl import gl_stats
+
+    gl_stats.enable()
+
+    # ... draw a frame ...
+
+    stats = gl_stats.end_frame()
+    print stats.draw_calls, stats.vertices, stats.texture_binds
+
+When enabled, every linked GL and GLU function counts its calls, and the
+functions that draw primitives, bind textures or upload buffer data also
+update the totals in `GLStats`.  The counts cover one frame at a time: call
+`end_frame` after each buffer flip (`pyglet.window.GLStatsDisplay` does this
+automatically) to move the current counts to `get_frame_stats` and start
+counting the next frame.
+
+Counting is implemented with the ctypes ``errcheck`` hook of each function
+(chaining to the error check installed when ``pyglet.options['debug_gl']``
+is set), so it is only present between `enable` and `disable` and costs
+nothing otherwise.
+
+:since: pyglet 1.2
+'''
+
+__docformat__ = 'restructuredtext'
+__version__ = '$Id: $'
+
+from pyglet.gl import lib
+
+class GLStats(object):
+    '''Counts of the GL calls made during one frame.
+
+    :Ivariables:
+        `calls` : dict
+            Mapping of GL function name to the number of calls.
+        `draw_calls` : int
+            Number of calls that draw primitives (``glDrawArrays``,
+            ``glDrawElements`` and their variants, and ``glBegin``).
+        `vertices` : int
+            Number of vertices (or indices, for indexed drawing) submitted by
+            draw calls and ``glVertex`` calls, including all instances of
+            instanced draws.
+        `texture_binds` : int
+            Number of ``glBindTexture`` calls.
+        `buffer_bytes` : int
+            Number of bytes passed to ``glBufferData`` and
+            ``glBufferSubData``.
+
+    '''
+    def __init__(self):
+        self.calls = {}
+        self.draw_calls = 0
+        self.vertices = 0
+        self.texture_binds = 0
+        self.buffer_bytes = 0
+
+    def _get_total_calls(self):
+        return sum(self.calls.values())
+
+    total_calls = property(_get_total_calls,
+                           doc='''Total number of GL calls.
+
+    :type: int
+    ''')
+
+    def __repr__(self):
+        return ('%s(calls=%d, draw_calls=%d, vertices=%d, texture_binds=%d, '
+                'buffer_bytes=%d)') % (self.__class__.__name__,
+                    self.total_calls, self.draw_calls, self.vertices,
+                    self.texture_binds, self.buffer_bytes)
+
+def _value(arg):
+    # Arguments are passed to errcheck as given by the caller, which may be
+    # ctypes instances.
+    return getattr(arg, 'value', arg)
+
+def _sum_counts(counts, primcount):
+    primcount = _value(primcount)
+    return sum([counts[i] for i in range(primcount)])
+
+def _draw(index, instances=None):
+    def count(stats, args):
+        stats.draw_calls += 1
+        vertices = _value(args[index])
+        if instances is not None:
+            vertices *= _value(args[instances])
+        stats.vertices += vertices
+    return count
+
+def _multi_draw(counts, primcount):
+    def count(stats, args):
+        stats.draw_calls += 1
+        stats.vertices += _sum_counts(args[counts], args[primcount])
+    return count
+
+def _count_begin(stats, args):
+    stats.draw_calls += 1
+
+def _count_vertex(stats, args):
+    stats.vertices += 1
+
+def _count_bind_texture(stats, args):
+    stats.texture_binds += 1
+
+def _buffer_data(index):
+    def count(stats, args):
+        stats.buffer_bytes += _value(args[index])
+    return count
+
+# Mapping of function name to a function(stats, arguments) that updates the
+# detailed counters.
+_counters = {
+    'glBegin': _count_begin,
+    'glBindTexture': _count_bind_texture,
+    'glBindTextureEXT': _count_bind_texture,
+}
+for _name, _count in [
+        ('glDrawArrays', _draw(2)),
+        ('glDrawElements', _draw(1)),
+        ('glDrawRangeElements', _draw(3)),
+        ('glDrawArraysInstanced', _draw(2, 3)),
+        ('glDrawElementsInstanced', _draw(1, 4)),
+        ('glMultiDrawArrays', _multi_draw(2, 3)),
+        ('glMultiDrawElements', _multi_draw(1, 4)),
+        ('glBufferData', _buffer_data(1)),
+        ('glBufferSubData', _buffer_data(2))]:
+    _counters[_name] = _count
+    for _suffix in ('ARB', 'EXT'):
+        _counters[_name + _suffix] = _count
+for _size in '234':
+    for _type in 'dfis':
+        _counters['glVertex%s%s' % (_size, _type)] = _count_vertex
+        _counters['glVertex%s%sv' % (_size, _type)] = _count_vertex
+del _name, _count, _suffix, _size, _type
+
+_enabled = False
+_current = GLStats()
+_frame = GLStats()
+_frame_count = 0
+
+# Mapping of function name to (func, errcheck) for each instrumented function,
+# where errcheck is the function's errcheck before counting was enabled (None
+# if it had none).
+_instrumented = {}
+
+def _create_errcheck(name, original):
+    counter = _counters.get(name)
+    def errcheck(result, func, arguments):
+        stats = _current
+        calls = stats.calls
+        calls[name] = calls.get(name, 0) + 1
+        if counter:
+            counter(stats, arguments)
+        if original:
+            return original(result, func, arguments)
+        return result
+    return errcheck
+
+def _instrument(func, name):
+    if name in _instrumented and _instrumented[name][0] is func:
+        return
+    _instrumented[name] = func, func.errcheck
+    func.errcheck = _create_errcheck(name, func.errcheck)
+
+def enable():
+    '''Start counting GL calls.
+
+    Counting applies to all GL functions, including those linked after this
+    call.
+    '''
+    global _enabled
+    if _enabled:
+        return
+    for name, func in lib._linked_functions.items():
+        _instrument(func, name)
+    lib._link_hook = _instrument
+    _enabled = True
+
+def disable():
+    '''Stop counting GL calls, removing the counting hooks.'''
+    global _enabled
+    if not _enabled:
+        return
+    lib._link_hook = None
+    for func, original in _instrumented.values():
+        if original:
+            func.errcheck = original
+        else:
+            del func.errcheck
+    _instrumented.clear()
+    _enabled = False
+
+def is_enabled():
+    '''Determine if GL calls are being counted.
+
+    :rtype: bool
+    '''
+    return _enabled
+
+def end_frame():
+    '''Finish counting the current frame and start a new one.
+
+    :rtype: `GLStats`
+    :return: the counts of the finished frame, which are also returned by
+        `get_frame_stats` until the next call.
+    '''
+    global _current, _frame, _frame_count
+    _frame = _current
+    _current = GLStats()
+    _frame_count += 1
+    return _frame
+
+def get_frame_stats():
+    '''Get the counts of the last finished frame.
+
+    :rtype: `GLStats`
+    '''
+    return _frame
+
+def get_current_stats():
+    '''Get the counts of the frame in progress.
+
+    :rtype: `GLStats`
+    '''
+    return _current
+
+def get_frame_count():
+    '''Get the number of frames finished with `end_frame`.
+
+    :rtype: int
+    '''
+    return _frame_count
@@ -46,6 +46,7 @@ import pyglet
 __all__ = ['link_GL', 'link_GLU', 'link_AGL', 'link_GLX', 'link_WGL']
 
 _debug_gl = pyglet.options['debug_gl']
+_debug_gl_per_frame = pyglet.options['debug_gl_per_frame']
 _debug_gl_trace = pyglet.options['debug_gl_trace']
 _debug_gl_trace_args = pyglet.options['debug_gl_trace_args']
 
@@ -105,6 +106,26 @@ def errcheck(result, func, arguments):
             raise GLException(msg)
         return result
 
+def check_error():
+    '''Raise an exception if OpenGL has recorded an error.
+
+    Any further errors recorded are cleared.  This is called by the event
+    loop after each window is flipped when
+    ``pyglet.options['debug_gl_per_frame']`` is set; applications with
+    their own loop must call it themselves.  It may also be called directly
+    to check for errors in release mode.
+
+    :raise GLException: if ``glGetError`` reports an error.
+    :since: pyglet 1.2
+    '''
+    from pyglet import gl
+    error = gl.glGetError()
+    if error:
+        while gl.glGetError():
+            pass
+        msg = ctypes.cast(gl.gluErrorString(error), ctypes.c_char_p).value
+        raise GLException(msg)
+
 def errcheck_glbegin(result, func, arguments):
     from pyglet import gl
     context = gl.current_context
@@ -121,8 +142,16 @@ def errcheck_glend(result, func, arguments):
     context._gl_begin = False
     return errcheck(result, func, arguments)
 
+# Mapping of function name to every linked ctypes function, so that
+# instrumentation such as `pyglet.gl.gl_stats` can be installed and removed
+# at runtime.
+_linked_functions = {}
+
+# Called as _link_hook(func, name) for each function linked while set.
+_link_hook = None
+
 def decorate_function(func, name):
-    if _debug_gl:
+    if _debug_gl and not _debug_gl_per_frame:
         if name == 'glBegin':
             func.errcheck = errcheck_glbegin
         elif name == 'glEnd':
@@ -130,6 +159,9 @@ def decorate_function(func, name):
         elif name not in ('glGetError', 'gluErrorString') and \
              name[:3] not in ('glX', 'agl', 'wgl'):
             func.errcheck = errcheck
+    _linked_functions[name] = func
+    if _link_hook:
+        _link_hook(func, name)
 
 link_AGL = None
 link_GLX = None
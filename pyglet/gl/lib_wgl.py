@@ -40,6 +40,7 @@ __version__ = '$Id: lib_glx.py 597 2007-02-03 16:13:07Z Alex.Holkner $'
 
 import ctypes
 from ctypes import *
+import sys
 
 import pyglet
 from pyglet.gl.lib import missing_function, decorate_function
@@ -68,14 +69,15 @@ except AttributeError:
     _have_get_proc_address = False
 
 class WGLFunctionProxy(object):
-    __slots__ = ['name', 'requires', 'suggestions', 'ftype', 'func']
-    def __init__(self, name, ftype, requires, suggestions):
+    __slots__ = ['name', 'requires', 'suggestions', 'ftype', 'func', 'module']
+    def __init__(self, name, ftype, requires, suggestions, module=None):
         assert _have_get_proc_address
         self.name = name
         self.ftype = ftype
         self.requires = requires
         self.suggestions = suggestions
         self.func = None
+        self.module = module
 
     def __call__(self, *args, **kwargs):
         if self.func:
@@ -89,12 +91,29 @@ class WGLFunctionProxy(object):
         if cast(address, POINTER(c_int)):  # check cast because address is func
             self.func = cast(address, self.ftype)
             decorate_function(self.func, self.name)
+            self._rebind()
         else:
             self.func = missing_function(
                 self.name, self.requires, self.suggestions)
         result = self.func(*args, **kwargs) 
         return result
 
+    def _rebind(self):
+        # Replace the proxy with the resolved function in the module that
+        # linked it and in pyglet.gl, which re-exports it, so that later
+        # calls through those modules go directly to ctypes.  Copies made by
+        # "from pyglet.gl import *" before the function was resolved still
+        # call through the proxy.
+        for name in (self.module, 'pyglet.gl'):
+            module = sys.modules.get(name)
+            if module is not None and module.__dict__.get(self.name) is self:
+                setattr(module, self.name, self.func)
+
+def _caller_module():
+    # Name of the module calling the link function, which will hold the
+    # function it returns.
+    return sys._getframe(2).f_globals.get('__name__')
+
 def link_GL(name, restype, argtypes, requires=None, suggestions=None):
     try:
         func = getattr(gl_lib, name)
@@ -117,7 +136,8 @@ def link_GL(name, restype, argtypes, requires=None, suggestions=None):
                         return func
                 else:
                     # Insert proxy until we have a context
-                    return WGLFunctionProxy(name, ftype, requires, suggestions)
+                    return WGLFunctionProxy(name, ftype, requires,
+                                            suggestions, _caller_module())
         except:
             pass
 
@@ -145,7 +165,8 @@ def link_GLU(name, restype, argtypes, requires=None, suggestions=None):
                         return func
                 else:
                     # Insert proxy until we have a context
-                    return WGLFunctionProxy(name, ftype, requires, suggestions)
+                    return WGLFunctionProxy(name, ftype, requires,
+                                            suggestions, _caller_module())
         except:
             pass
 
@@ -161,7 +161,10 @@ video drivers, and requires indexed vertex lists.
 __docformat__ = 'restructuredtext'
 __version__ = '$Id: $'
 
+import bisect
 import ctypes
+import itertools
+import weakref
 
 import pyglet
 from pyglet.gl import *
@@ -316,9 +319,47 @@ class Batch(object):
     sent to the graphics card in a single operation.
 
     Call `VertexList.delete` to remove a vertex list from the batch.
+
+    Sibling groups are kept sorted as they are added, and only subtrees that
+    have changed are revisited when the draw list is updated.  The default
+    `Group.__lt__` compares hashes, so groups that define ``__hash__`` from
+    mutable attributes (such as `OrderedGroup.order`) change position when
+    those attributes change.  Call `invalidate` after changing anything that
+    affects the ordering of groups already in the batch; otherwise they are
+    drawn in their old order.
+
+    A batch created with ``state_sorting=True`` also reorders sibling groups
+    that have a `Group.state_key` (for example, `TextureGroup` and
+    `pyglet.sprite.SpriteGroup`) so that groups with similar state are drawn
+    one after the other.  Where a group provides a `Group.get_transition`
+    from the sibling drawn before it, the ``unset_state``/``set_state`` calls
+    between them are replaced by that transition; for example, consecutive
+    texture groups only rebind the texture.  Groups with children are never
+    joined to their siblings.  Groups without a state key, such as
+    `OrderedGroup`, keep their position, and groups with state keys are not
+    moved past them.
     '''
-    def __init__(self):
-        '''Create a graphics batch.'''
+
+    #: Number of ``unset_state``/``set_state`` pairs replaced by transitions
+    #: in the current draw list by state sorting.  Updated whenever the draw
+    #: list is rebuilt.
+    #:
+    #: :type: int
+    #: :since: pyglet 1.2
+    state_changes_saved = 0
+
+    def __init__(self, state_sorting=False):
+        '''Create a graphics batch.
+
+        :Parameters:
+            `state_sorting` : bool
+                If True, reorder sibling groups by their state key and
+                replace state changes between them by transitions.  Since
+                pyglet 1.2.
+
+        '''
+        self.state_sorting = state_sorting
+
         # Mapping to find domain.  
         # group -> (attributes, mode, indexed) -> domain
         self.group_map = {}
@@ -329,6 +370,21 @@ class Batch(object):
         # List of top-level groups
         self.top_groups = []
 
+        # Mapping of group to the draw list of the subtree rooted at that
+        # group.  Groups whose subtree has changed are removed, and rebuilt by
+        # the next _update_draw_list.
+        self._group_draw_lists = {}
+
+        # Draw lists of top-level groups, in the same order as top_groups.
+        self._top_draw_lists = []
+
+        # Set of top-level groups whose subtree has changed.
+        self._dirty_top_groups = set()
+
+        # Mapping of group to the number of state changes omitted from its
+        # cached draw list by state sorting.
+        self._group_states_saved = {}
+
         self._draw_list = []
         self._draw_list_dirty = False
 
@@ -340,6 +396,24 @@ class Batch(object):
 
         :since: pyglet 1.2
         '''
+        self.top_groups.sort()
+        for children in self.group_children.values():
+            children.sort()
+        self._group_draw_lists.clear()
+        self._group_states_saved.clear()
+        self._top_draw_lists = [[] for group in self.top_groups]
+        self._dirty_top_groups.update(self.top_groups)
+        self._draw_list_dirty = True
+
+    def _invalidate_group(self, group):
+        # Mark the draw lists of group and its ancestors for rebuilding.
+        self._group_draw_lists.pop(group, None)
+        self._group_states_saved.pop(group, None)
+        while group.parent is not None:
+            group = group.parent
+            self._group_draw_lists.pop(group, None)
+            self._group_states_saved.pop(group, None)
+        self._dirty_top_groups.add(group)
         self._draw_list_dirty = True
 
     def add(self, count, mode, group, *data):
@@ -450,29 +524,70 @@ class Batch(object):
             else:
                 domain = vertexdomain.create_domain(*formats)
             domain.__formats = formats
+            domain._batch = weakref.ref(self)
+            domain._group = group
             domain_map[key] = domain
-            self._draw_list_dirty = True 
+            self._invalidate_group(group)
 
         return domain
 
     def _add_group(self, group):
+        # Sibling lists are kept sorted, so that only changed subtrees need
+        # visiting when the draw list is updated.
         self.group_map[group] = {}
         if group.parent is None:
-            self.top_groups.append(group)
+            i = bisect.bisect_right(self.top_groups, group)
+            self.top_groups.insert(i, group)
+            self._top_draw_lists.insert(i, [])
+            self._dirty_top_groups.add(group)
         else:
             if group.parent not in self.group_map:
                 self._add_group(group.parent)
             if group.parent not in self.group_children:
                 self.group_children[group.parent] = []
-            self.group_children[group.parent].append(group)
+            bisect.insort(self.group_children[group.parent], group)
+            self._invalidate_group(group.parent)
         self._draw_list_dirty = True
 
+    def _top_group_index(self, group):
+        # Search near the sorted position first; fall back to a linear search
+        # if the ordering of groups changed without `invalidate` being called.
+        # Groups are compared by equality, as in group_map, since a group's
+        # parent can be a distinct but equal instance.
+        top_groups = self.top_groups
+        i = bisect.bisect_left(top_groups, group)
+        while i < len(top_groups) and not group < top_groups[i]:
+            if top_groups[i] == group:
+                return i
+            i += 1
+        for i, other in enumerate(top_groups):
+            if other == group:
+                return i
+        raise ValueError('Group is not a top-level group of this batch')
+
     def _update_draw_list(self):
         '''Visit group tree in preorder and create a list of bound methods
         to call.
+
+        Only subtrees that have changed since the last update are visited;
+        the draw lists of other groups are reused.  Empty domains and groups
+        are removed from the batch when their subtree is visited; domains
+        mark their group as changed when they become empty.
+
+        With state sorting, sibling groups are visited in state order and the
+        draw lists of consecutive siblings without children are joined by
+        their transitions, if any, in place of the intermediate
+        ``unset_state``/``set_state`` calls.
         '''
+        state_sorting = self.state_sorting
+        states_saved = self._group_states_saved
 
         def visit(group):
+            try:
+                return self._group_draw_lists[group]
+            except KeyError:
+                pass
+
             draw_list = []
 
             # Draw domains using this group
@@ -485,15 +600,26 @@ class Batch(object):
                 draw_list.append(
                     (lambda d, m: lambda: d.draw(m))(domain, mode))
 
-            # Sort and visit child groups of this group
+            # Visit child groups of this group, already in sort order
             children = self.group_children.get(group)
+            saved = 0
             if children:
-                children.sort()
-                for child in list(children):
-                    draw_list.extend(visit(child))
-
-            if children or domain_map:
-                return [group.set_state] + draw_list + [group.unset_state]
+                if state_sorting:
+                    children = _sort_by_state(children)
+                    child_lists = [(child, visit(child)) for child in children]
+                    saved = _join_draw_lists(draw_list, child_lists,
+                                             self.group_children)
+                    for child, _ in child_lists:
+                        saved += states_saved.get(child, 0)
+                else:
+                    for child in list(children):
+                        draw_list.extend(visit(child))
+
+            if self.group_children.get(group) or domain_map:
+                draw_list = [group.set_state] + draw_list + [group.unset_state]
+                self._group_draw_lists[group] = draw_list
+                states_saved[group] = saved
+                return draw_list
             else:
                 # Remove unused group from batch
                 del self.group_map[group]
@@ -503,17 +629,36 @@ class Batch(object):
                     del self.group_children[group]
                 except KeyError:
                     pass
-                try:
-                    self.top_groups.remove(group)
-                except ValueError:
-                    pass
+                if group.parent is None:
+                    i = self._top_group_index(group)
+                    del self.top_groups[i]
+                    del self._top_draw_lists[i]
                 return []
 
-        self._draw_list = []
-
-        self.top_groups.sort()
-        for group in list(self.top_groups):
-            self._draw_list.extend(visit(group))
+        for group in self._dirty_top_groups:
+            if group in self.group_map:
+                # Visit the instance stored in top_groups, which may be
+                # distinct from the equal group that was marked.
+                group = self.top_groups[self._top_group_index(group)]
+                draw_list = visit(group)
+                if draw_list:
+                    self._top_draw_lists[self._top_group_index(group)] = \
+                        draw_list
+        self._dirty_top_groups.clear()
+
+        if state_sorting:
+            top_lists = zip(self.top_groups, self._top_draw_lists)
+            draw_list = []
+            saved = _join_draw_lists(draw_list,
+                _sort_by_state(top_lists, key=lambda item: item[0]),
+                self.group_children)
+            for group in self.top_groups:
+                saved += states_saved.get(group, 0)
+            self._draw_list = draw_list
+            self.state_changes_saved = saved
+        else:
+            self._draw_list = list(
+                itertools.chain.from_iterable(self._top_draw_lists))
 
         self._draw_list_dirty = False
 
@@ -579,19 +724,66 @@ class Batch(object):
                     if list.domain is domain:
                         list.draw(mode)
 
-            # Sort and visit child groups of this group
+            # Visit child groups of this group, already in sort order
             children = self.group_children.get(group)
             if children:
-                children.sort()
                 for child in children:
                     visit(child)
 
             group.unset_state()
 
-        self.top_groups.sort()
         for group in self.top_groups:
             visit(group)
 
+def _sort_by_state(items, key=None):
+    # Stable sort of runs of consecutive groups that have a state key, by that
+    # key.  Groups without a state key stay in place.  key returns the group
+    # of each item.
+    if key is None:
+        key = lambda item: item
+    state_key = lambda item: key(item).state_key
+    result = []
+    run = []
+    for item in items:
+        if state_key(item) is None:
+            run.sort(key=state_key)
+            result.extend(run)
+            result.append(item)
+            run = []
+        else:
+            run.append(item)
+    run.sort(key=state_key)
+    result.extend(run)
+    return result
+
+def _join_draw_lists(draw_list, group_lists, group_children):
+    # Append the draw lists of sibling groups given as (group, draw_list)
+    # pairs, replacing unset_state/set_state between consecutive groups by
+    # the later group's transition where it has one.  Groups with children
+    # are not joined, as a child's unset_state can undo state of its parent
+    # that the transition relies on.  Returns the number of pairs replaced.
+    saved = 0
+    previous = None
+    for group, group_list in group_lists:
+        if not group_list:
+            continue
+        has_children = bool(group_children.get(group))
+        transition = None
+        if previous is not None and not has_children:
+            transition = group.get_transition(previous)
+        if transition is not None:
+            draw_list.pop()
+            draw_list.append(transition)
+            draw_list.extend(group_list[1:])
+            saved += 1
+        else:
+            draw_list.extend(group_list)
+        if has_children:
+            previous = None
+        else:
+            previous = group
+    return saved
+
 class Group(object):
     '''Group of common OpenGL state.
 
@@ -600,6 +792,15 @@ class Group(object):
     subclasses; the default state change has no effect, and groups vertex
     lists only in the order in which they are drawn.
     '''
+
+    #: Hashable, orderable description of the OpenGL state set by this
+    #: group, or None.  Batches with state sorting enabled order sibling
+    #: groups by their state keys, so that groups which can switch between
+    #: each other with `get_transition` are drawn consecutively.
+    #:
+    #: :type: tuple
+    #: :since: pyglet 1.2
+    state_key = None
     def __init__(self, parent=None):
         '''Create a group.
 
@@ -626,6 +827,28 @@ class Group(object):
         The default implementation does nothing.'''
         pass
 
+    def get_transition(self, previous):
+        '''Get a function changing the state of a sibling group to the state
+        of this group.
+
+        Batches with state sorting enabled call the returned function in
+        place of ``previous.unset_state`` followed by ``self.set_state``,
+        when `previous` is drawn immediately before this group and neither
+        group has children.  Afterwards, this group's `unset_state` must
+        restore the state from before ``previous.set_state``.
+
+        The default implementation returns None, meaning no transition is
+        possible.
+
+        :Parameters:
+            `previous` : `Group`
+                Sibling group drawn before this group.
+
+        :rtype: callable
+        :since: pyglet 1.2
+        '''
+        return None
+
     def set_state_recursive(self):
         '''Set this group and its ancestry.
 
@@ -685,6 +908,19 @@ class TextureGroup(Group):
     def unset_state(self):
         glDisable(self.texture.target)
 
+    def _bind_texture(self):
+        glBindTexture(self.texture.target, self.texture.id)
+
+    def get_transition(self, previous):
+        # Both groups enable the same target; only the binding differs.
+        if (previous.__class__ is self.__class__ and
+            previous.texture.target == self.texture.target):
+            return self._bind_texture
+        return None
+
+    state_key = property(
+        lambda self: (self.texture.target, self.texture.id))
+
     def __hash__(self):
         return hash((self.texture.target, self.texture.id, self.parent))
 
@@ -41,7 +41,9 @@ by `pyglet.graphics.vertexbuffer`.
  
 The allocator will at times request more space from the buffers. The current
 policy is to double the buffer size when there is not enough room to fulfil an
-allocation.  The buffer is never resized smaller.
+allocation.  The allocator never shrinks the buffer itself; a vertex domain
+may compact its buffers and replace the allocator (see
+`pyglet.graphics.vertexdomain.VertexDomain.compact`).
 
 The allocator maintains references to free space only; it is the caller's
 responsibility to maintain the allocated regions.
@@ -58,7 +60,8 @@ __version__ = '$Id: $'
 # Optimise for:
 # -keeping regions adjacent, reduce the number of entries in glMultiDrawArrays
 # -finding large blocks of allocated regions quickly (for drawing)
-# -finding block of unallocated space is the _uncommon_ case!
+# -alloc and dealloc staying cheap when a domain holds tens of thousands of
+#  regions
 #
 # Decisions:
 # -don't over-allocate regions to any alignment -- this would require more
@@ -70,8 +73,20 @@ __version__ = '$Id: $'
 # -allocator does not track individual allocated regions.  Trusts caller
 #  to provide accurate (start, size) tuple, which completely describes
 #  a region from the allocator's point of view.
-# -this means that compacting is probably not feasible, or would be hideously
-#  expensive
+# -free blocks are indexed by start and end (so a freed region is coalesced
+#  with its neighbours in constant time) and segregated by size (so an
+#  allocation is a bisect over the distinct free sizes, best fit).  Among
+#  free blocks of the best size the lowest is used, so placement is
+#  deterministic and regions stay packed towards the start of the buffer.
+# -the aggregate allocated regions needed for drawing are kept as sorted
+#  lists and updated in place by each change (a bisect and at most one list
+#  insertion or deletion); they also let dealloc check that the whole region
+#  is allocated.
+# -this means the allocator cannot compact by itself; the domain, which knows
+#  its vertex lists, does it (see `VertexDomain.compact`) and then replaces
+#  the allocator.
+
+import bisect
 
 class AllocatorMemoryException(Exception):
     '''The buffer is not large enough to fulfil an allocation.
@@ -97,24 +112,115 @@ class Allocator(object):
         '''
         self.capacity = capacity
 
-        # Allocated blocks.  Start index and size in parallel lists.
+        # Free blocks.
         #
         # # = allocated, - = free
         #
         #  0  3 5        15   20  24                    40
         # |###--##########-----####----------------------|
         #
-        # starts = [0, 5, 20]
-        # sizes = [3, 10, 4]
+        # _free_starts = {3: 2, 15: 5, 24: 16}
+        # _free_ends = {5: 3, 20: 15, 40: 24}
+        # _free_sizes = [2, 5, 16]
+        # _free_lists = {2: [3], 5: [15], 16: [24]}
+        # _starts = [0, 5, 20]
+        # _sizes = [3, 10, 4]
         #
-        # To calculate free blocks:
-        # for i in range(0, len(starts)):
-        #   free_start[i] = starts[i] + sizes[i]
-        #   free_size[i] =  starts[i+1] - free_start[i]
-        # free_size[i+1] = self.capacity - free_start[-1]
-
-        self.starts = []
-        self.sizes = []
+        # Free blocks are always maximal: no two are adjacent.  The start
+        # lists in _free_lists are sorted.  _starts and _sizes are the
+        # allocated blocks, also maximal.
+
+        self._free_starts = {}
+        self._free_ends = {}
+        self._free_sizes = []
+        self._free_lists = {}
+        self._free_size = 0
+
+        self._starts = []
+        self._sizes = []
+
+        # Copy of (_starts, _sizes) returned by get_allocated_regions, or
+        # None if it must be copied again.
+        self._regions = None
+
+        if capacity:
+            self._insert_free(0, capacity)
+
+    def _insert_free(self, start, size):
+        # Add a free block known not to be adjacent to another free block.
+        self._free_starts[start] = size
+        self._free_ends[start + size] = start
+        starts = self._free_lists.get(size)
+        if starts is None:
+            starts = self._free_lists[size] = []
+            bisect.insort(self._free_sizes, size)
+        bisect.insort(starts, start)
+        self._free_size += size
+
+    def _remove_free(self, start, size):
+        del self._free_starts[start]
+        del self._free_ends[start + size]
+        starts = self._free_lists[size]
+        del starts[bisect.bisect_left(starts, start)]
+        if not starts:
+            del self._free_lists[size]
+            del self._free_sizes[bisect.bisect_left(self._free_sizes, size)]
+        self._free_size -= size
+
+    def _add_free(self, start, size):
+        # Add a free block, coalescing with any free neighbours.
+        end = start + size
+        prev_start = self._free_ends.get(start)
+        if prev_start is not None:
+            self._remove_free(prev_start, start - prev_start)
+            start = prev_start
+        next_size = self._free_starts.get(end)
+        if next_size is not None:
+            self._remove_free(end, next_size)
+            end += next_size
+        self._insert_free(start, end - start)
+
+    def _add_allocated(self, start, size):
+        # Add a block that was free to the allocated blocks, joining it to
+        # the blocks before and after it if they are adjacent.
+        starts = self._starts
+        sizes = self._sizes
+        end = start + size
+        i = bisect.bisect_left(starts, start)
+        if i and starts[i - 1] + sizes[i - 1] == start:
+            i -= 1
+            sizes[i] += size
+        else:
+            starts.insert(i, start)
+            sizes.insert(i, size)
+        if i + 1 < len(starts) and starts[i + 1] == end:
+            sizes[i] += sizes[i + 1]
+            del starts[i + 1]
+            del sizes[i + 1]
+        self._regions = None
+
+    def _remove_allocated(self, start, size):
+        # Remove a block from the allocated blocks, splitting the block
+        # containing it if necessary.
+        starts = self._starts
+        sizes = self._sizes
+        end = start + size
+        i = bisect.bisect_right(starts, start) - 1
+        assert i >= 0 and end <= starts[i] + sizes[i], 'Region not allocated'
+        block_start = starts[i]
+        block_end = block_start + sizes[i]
+        if block_start < start:
+            sizes[i] = start - block_start
+            if end < block_end:
+                starts.insert(i + 1, end)
+                sizes.insert(i + 1, block_end - end)
+        elif end < block_end:
+            starts[i] = end
+            sizes[i] = block_end - end
+        else:
+            del starts[i]
+            del sizes[i]
+        self._regions = None
 
     def set_capacity(self, size):
         '''Resize the maximum buffer size.
@@ -127,6 +233,7 @@ class Allocator(object):
 
         '''
         assert size > self.capacity
+        self._add_free(self.capacity, size - self.capacity)
         self.capacity = size
 
     def alloc(self, size):
@@ -150,44 +257,23 @@ class Allocator(object):
         # return start
         # or raise AllocatorMemoryException
 
-        if not self.starts:
-            if size <= self.capacity:
-                self.starts.append(0)
-                self.sizes.append(size)
-                return 0
-            else:
-                raise AllocatorMemoryException(size)
-
-        # Allocate in a free space
-        free_start = self.starts[0] + self.sizes[0]
-        for i, (alloc_start, alloc_size) in \
-                enumerate(zip(self.starts[1:], self.sizes[1:])):
-            # Danger!  
-            # i is actually index - 1 because of slicing above...
-            # starts[i]   points to the block before this free space
-            # starts[i+1] points to the block after this free space, and is
-            #             always valid.
-            free_size = alloc_start - free_start
-            if free_size == size:
-                # Merge previous block with this one (removing this free space)
-                self.sizes[i] += free_size + alloc_size
-                del self.starts[i+1]
-                del self.sizes[i+1]
-                return free_start
-            elif free_size > size:
-                # Increase size of previous block to intrude into this free
-                # space.
-                self.sizes[i] += size
-                return free_start
-            free_start = alloc_start + alloc_size
-        
-        # Allocate at end of capacity
-        free_size = self.capacity - free_start
-        if free_size >= size:
-            self.sizes[-1] += size
-            return free_start
-        
-        raise AllocatorMemoryException(self.capacity + size - free_size)
+        # Smallest free block that fits
+        i = bisect.bisect_left(self._free_sizes, size)
+        if i == len(self._free_sizes):
+            # Only the free space at the end of capacity can be extended
+            free_start = self._free_ends.get(self.capacity, self.capacity)
+            free_size = self.capacity - free_start
+            raise AllocatorMemoryException(self.capacity + size - free_size)
+
+        # Lowest free block of that size
+        free_size = self._free_sizes[i]
+        free_start = self._free_lists[free_size][0]
+        self._remove_free(free_start, free_size)
+        if free_size > size:
+            # Remainder is bounded by allocated space on both sides
+            self._insert_free(free_start + size, free_size - size)
+        self._add_allocated(free_start, size)
+        return free_start
 
     def realloc(self, start, size, new_size):
         '''Reallocate a region of the buffer.
@@ -223,42 +309,19 @@ class Allocator(object):
         if new_size < size:
             self.dealloc(start + new_size, size - new_size)
             return start
-            
-        # Find which block it lives in
-        for i, (alloc_start, alloc_size) in \
-                enumerate(zip(*(self.starts, self.sizes))):
-            p = start - alloc_start
-            if p >= 0 and size <= alloc_size - p:
-                break
-        if not (p >= 0 and size <= alloc_size - p):
-            print zip(self.starts, self.sizes)
-            print start, size, new_size
-            print p, alloc_start, alloc_size
-        assert p >= 0 and size <= alloc_size - p, 'Region not allocated'
-
-        if size == alloc_size - p:
-            # Region is at end of block.  Find how much free space is after
-            # it.
-            is_final_block = i == len(self.starts) - 1
-            if not is_final_block:
-                free_size = self.starts[i + 1] - (start + size)
-            else:
-                free_size = self.capacity - (start + size)
-
-            # TODO If region is an entire block being an island in free space, 
-            # can possibly extend in both directions.
-
-            if free_size == new_size - size and not is_final_block:
-                # Merge block with next (region is expanded in place to
-                # exactly fill the free space)
-                self.sizes[i] += free_size + self.sizes[i + 1]
-                del self.starts[i + 1]
-                del self.sizes[i + 1]
-                return start
-            elif free_size > new_size - size:
-                # Expand region in place
-                self.sizes[i] += new_size - size
-                return start
+
+        assert start + size <= self.capacity, 'Region not allocated'
+
+        # Expand in place if the free space after the region is big enough
+        end = start + size
+        free_size = self._free_starts.get(end)
+        if free_size is not None and free_size >= new_size - size:
+            self._remove_free(end, free_size)
+            if free_size > new_size - size:
+                self._insert_free(start + new_size,
+                                  free_size - (new_size - size))
+            self._add_allocated(end, new_size - size)
+            return start
 
         # The block must be repositioned.  Dealloc then alloc.
         
@@ -267,10 +330,7 @@ class Allocator(object):
         #   self.dealloc(start, size)
         #   return self.alloc(new_size)
 
-        # It must be alloc'd first.  We're not missing an optimisation 
-        # here, because if freeing the block would've allowed for the block to 
-        # be placed in the resulting free space, one of the above in-place
-        # checks would've found it.
+        # It must be alloc'd first.
         result = self.alloc(new_size)
         self.dealloc(start, size)
         return result
@@ -290,62 +350,28 @@ class Allocator(object):
         if size == 0:
             return
 
-        assert self.starts
-        
-        # Find which block needs to be split
-        for i, (alloc_start, alloc_size) in \
-                enumerate(zip(*(self.starts, self.sizes))):
-            p = start - alloc_start
-            if p >= 0 and size <= alloc_size - p:
-                break
-        
-        # Assert we left via the break
-        assert p >= 0 and size <= alloc_size - p, 'Region not allocated'
-
-        if p == 0 and size == alloc_size:
-            # Remove entire block
-            del self.starts[i]
-            del self.sizes[i]
-        elif p == 0:
-            # Truncate beginning of block
-            self.starts[i] += size
-            self.sizes[i] -= size
-        elif size == alloc_size - p:
-            # Truncate end of block
-            self.sizes[i] -= size
-        else:
-            # Reduce size of left side, insert block at right side
-            #   $ = dealloc'd block, # = alloc'd region from same block
-            #
-            #   <------8------>
-            #   <-5-><-6-><-7->
-            #   1    2    3    4
-            #   #####$$$$$#####
-            #
-            #   1 = alloc_start
-            #   2 = start
-            #   3 = start + size
-            #   4 = alloc_start + alloc_size
-            #   5 = start - alloc_start = p
-            #   6 = size
-            #   7 = {8} - ({5} + {6}) = alloc_size - (p + size)
-            #   8 = alloc_size
-            #
-            self.sizes[i] = p
-            self.starts.insert(i + 1, start + size)
-            self.sizes.insert(i + 1, alloc_size - (p + size))
+        assert start >= 0 and start + size <= self.capacity, \
+            'Region not allocated'
+
+        # Fails if any part of the region is free, such as when a region
+        # overlapping it was already freed.
+        self._remove_allocated(start, size)
+        self._add_free(start, size)
 
     def get_allocated_regions(self):
         '''Get a list of (aggregate) allocated regions.
 
         The result of this method is ``(starts, sizes)``, where ``starts`` is
         a list of starting indices of the regions and ``sizes`` their
-        corresponding lengths.
+        corresponding lengths.  The lists are cached until the next
+        allocation change and must not be modified.
 
         :rtype: (list, list)
         '''
         # return (starts, sizes); len(starts) == len(sizes)
-        return (self.starts, self.sizes)
+        if self._regions is None:
+            self._regions = (self._starts[:], self._sizes[:])
+        return self._regions
 
     def get_fragmented_free_size(self):
         '''Returns the amount of space unused, not including the final
@@ -353,29 +379,17 @@ class Allocator(object):
 
         :rtype: int
         '''
-        if not self.starts:
-            return 0
-
-        # Variation of search for free block.
-        total_free = 0
-        free_start = self.starts[0] + self.sizes[0]
-        for i, (alloc_start, alloc_size) in \
-                enumerate(zip(self.starts[1:], self.sizes[1:])):
-            total_free += alloc_start - free_start
-            free_start = alloc_start + alloc_size
-
-        return total_free
+        free_start = self._free_ends.get(self.capacity)
+        if free_start is None:
+            return self._free_size
+        return self._free_size - (self.capacity - free_start)
 
     def get_free_size(self):
         '''Return the amount of space unused.
         
         :rtype: int
         '''
-        if not self.starts:
-            return self.capacity
-
-        free_end = self.capacity - (self.starts[-1] + self.sizes[-1])
-        return self.get_fragmented_free_size() + free_end
+        return self._free_size
 
     def get_usage(self):
         '''Return fraction of capacity currently allocated.
@@ -395,10 +409,10 @@ class Allocator(object):
         return self.get_fragmented_free_size() / float(self.get_free_size())
 
     def _is_empty(self):
-        return not self.starts
+        return self._free_size == self.capacity
 
     def __str__(self):
-        return 'allocs=' + repr(zip(self.starts, self.sizes))
+        return 'allocs=' + repr(zip(*self.get_allocated_regions()))
 
     def __repr__(self):
         return '<%s %s>' % (self.__class__.__name__, str(self))
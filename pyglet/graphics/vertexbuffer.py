@@ -42,18 +42,29 @@ Buffers can optionally be created "mappable" (incorporating the
 `AbstractMappable` mix-in).  In this case the buffer provides a ``get_region``
 method which provides the most efficient path for updating partial data within
 the buffer.
+
+Mappable VBOs keep a list of the byte ranges changed since they were last
+bound, and upload only those ranges when bound.  Ranges separated by small
+gaps are merged into a single upload (see
+`MappableVertexBufferObject.dirty_merge_gap`).  The number of bytes and calls
+used to upload buffer data are counted by `pyglet.gl.gl_stats`.
+
+Mappable buffers created with ``GL_STREAM_DRAW`` usage are
+`StreamingVertexBufferObject` instances, which upload their entire contents
+into fresh storage each time they change, so that writes never wait on the
+GPU still reading the previous frame's data.
 '''
 
 __docformat__ = 'restructuredtext'
 __version__ = '$Id: $'
 
 import ctypes
-import sys
 
 import pyglet
 from pyglet.gl import *
 
 _enable_vbo = pyglet.options['graphics_vbo']
+_stream_buffer_count = pyglet.options['graphics_stream_buffers']
 
 # Enable workaround permanently if any VBO is created on a context that has
 # this workaround.  (On systems with multiple contexts where one is
@@ -61,6 +72,39 @@ _enable_vbo = pyglet.options['graphics_vbo']
 # contexts anyway.  This is completely unlikely anyway).
 _workaround_vbo_finish = False
 
+def _coalesce_ranges(ranges, merge_gap, max_ranges):
+    # Sort and merge a list of (start, end) byte ranges.  Ranges overlapping
+    # or separated by no more than merge_gap bytes are merged; if more than
+    # max_ranges remain, the ranges separated by the smallest gaps are merged
+    # until max_ranges remain.
+    ranges.sort()
+    merged = []
+    cur_start, cur_end = ranges[0]
+    for start, end in ranges:
+        if start - cur_end <= merge_gap:
+            if end > cur_end:
+                cur_end = end
+        else:
+            merged.append((cur_start, cur_end))
+            cur_start, cur_end = start, end
+    merged.append((cur_start, cur_end))
+
+    if len(merged) > max_ranges:
+        # Split only at the largest max_ranges - 1 gaps
+        gaps = [merged[i + 1][0] - merged[i][1]
+                for i in range(len(merged) - 1)]
+        splits = set(sorted(range(len(gaps)), key=gaps.__getitem__,
+                            reverse=True)[:max_ranges - 1])
+        ranges = merged
+        merged = []
+        cur_start = ranges[0][0]
+        for i, (start, end) in enumerate(ranges):
+            if i in splits:
+                merged.append((cur_start, end))
+                cur_start = ranges[i + 1][0]
+        merged.append((cur_start, ranges[-1][1]))
+    return merged
+
 def create_buffer(size,
                   target=GL_ARRAY_BUFFER,
                   usage=GL_DYNAMIC_DRAW,
@@ -113,6 +157,9 @@ def create_mappable_buffer(size,
         gl_info.have_version(1, 5) and
         _enable_vbo and
         not gl.current_context._workaround_vbo):
+        if usage == GL_STREAM_DRAW:
+            return StreamingVertexBufferObject(size, target, usage,
+                                               _stream_buffer_count)
         return MappableVertexBufferObject(size, target, usage)
     else:
         return VertexArray(size)
@@ -377,41 +424,73 @@ class MappableVertexBufferObject(VertexBufferObject, AbstractMappable):
     There may also be less performance penalty for resizing this buffer.
 
     Updates to data via `map` are committed immediately.
+
+    Changed byte ranges are recorded separately and coalesced when the buffer
+    is bound, so that changes at opposite ends of a large buffer do not
+    require uploading everything in between.
     '''
+
+    #: Changed ranges separated by at most this many bytes are uploaded
+    #: together in one call.
+    dirty_merge_gap = 4096
+
+    #: Maximum number of upload calls made in one `bind`; if there are more
+    #: changed ranges, the closest ones are merged.
+    dirty_max_ranges = 16
+
+    # Number of changed ranges recorded before they are coalesced early (to
+    # bound memory use and the cost of coalescing when the buffer is bound).
+    _dirty_ranges_limit = 64
+
     def __init__(self, size, target, usage):
         super(MappableVertexBufferObject, self).__init__(size, target, usage)
         self.data = (ctypes.c_byte * size)()
         self.data_ptr = ctypes.cast(self.data, ctypes.c_void_p).value
-        self._dirty_min = sys.maxint
-        self._dirty_max = 0
+
+        # List of (start, end) byte ranges changed since the last upload.
+        self._dirty_ranges = []
+
+    def _invalidate_range(self, start, end):
+        ranges = self._dirty_ranges
+        if ranges:
+            # Most changes are near the previous one (such as vertex lists
+            # updated in order); extend it rather than adding another.
+            last_start, last_end = ranges[-1]
+            gap = self.dirty_merge_gap
+            if start - last_end <= gap and last_start - end <= gap:
+                ranges[-1] = (min(start, last_start), max(end, last_end))
+                return
+        ranges.append((start, end))
+        if len(ranges) > self._dirty_ranges_limit:
+            self._dirty_ranges = _coalesce_ranges(
+                ranges, self.dirty_merge_gap, self.dirty_max_ranges)
 
     def bind(self):
         # Commit pending data
         super(MappableVertexBufferObject, self).bind()
-        size = self._dirty_max - self._dirty_min
-        if size > 0:
-            if size == self.size:
+        if self._dirty_ranges:
+            ranges = _coalesce_ranges(self._dirty_ranges,
+                self.dirty_merge_gap, self.dirty_max_ranges)
+            self._dirty_ranges = []
+            if ranges[0][1] - ranges[0][0] == self.size:
                 glBufferData(self.target, self.size, self.data, self.usage)
             else:
-                glBufferSubData(self.target, self._dirty_min, size,
-                    self.data_ptr + self._dirty_min)
-            self._dirty_min = sys.maxint
-            self._dirty_max = 0
+                for start, end in ranges:
+                    glBufferSubData(self.target, start, end - start,
+                        self.data_ptr + start)
 
     def set_data(self, data):
         super(MappableVertexBufferObject, self).set_data(data)
         ctypes.memmove(self.data, data, self.size)
-        self._dirty_min = 0
-        self._dirty_max = self.size
+        # Already uploaded by the superclass
+        self._dirty_ranges = []
 
     def set_data_region(self, data, start, length):
         ctypes.memmove(self.data_ptr + start, data, length)
-        self._dirty_min = min(start, self._dirty_min)
-        self._dirty_max = max(start + length, self._dirty_max)
+        self._invalidate_range(start, start + length)
 
     def map(self, invalidate=False):
-        self._dirty_min = 0
-        self._dirty_max = self.size
+        self._dirty_ranges = [(0, self.size)]
         return self.data
 
     def unmap(self):
@@ -433,8 +512,104 @@ class MappableVertexBufferObject(VertexBufferObject, AbstractMappable):
         glBufferData(self.target, self.size, self.data, self.usage)
         glPopClientAttrib()
 
-        self._dirty_min = sys.maxint
-        self._dirty_max = 0
+        self._dirty_ranges = []
+
+class StreamingVertexBufferObject(MappableVertexBufferObject):
+    '''A system-memory backed VBO for data that is rewritten every frame.
+
+    Rather than updating the changed ranges of a buffer the GPU may still be
+    reading from, the whole buffer is uploaded into new storage whenever it
+    has changed.  With one buffer object this is done by orphaning:
+    ``glBufferData`` re-specifies the buffer, letting the driver allocate new
+    storage while the old storage is still in use.  With more than one, the
+    buffer cycles round-robin through that many buffer objects, each
+    uploaded in full with ``glBufferSubData``.
+
+    This suits data where most of the buffer changes every frame, such as
+    particles and projectiles; for data that changes sparsely use
+    `MappableVertexBufferObject`.
+    '''
+    def __init__(self, size, target, usage, buffer_count=1):
+        '''Create a streaming buffer.
+
+        :Parameters:
+            `size` : int
+                Size of the buffer, in bytes
+            `target` : int
+                OpenGL target buffer
+            `usage` : int
+                OpenGL usage constant
+            `buffer_count` : int
+                Number of buffer objects to cycle through.  If 1, the
+                buffer is orphaned instead.
+
+        '''
+        super(StreamingVertexBufferObject, self).__init__(size, target, usage)
+        self.ids = [self.id]
+        if buffer_count > 1:
+            ids = (GLuint * (buffer_count - 1))()
+            glGenBuffers(buffer_count - 1, ids)
+            glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+            for id in ids:
+                glBindBuffer(target, id)
+                glBufferData(target, self.size, None, self.usage)
+            glPopClientAttrib()
+            self.ids.extend(ids)
+        self._index = 0
+
+    def bind(self):
+        if self._dirty_ranges:
+            self._dirty_ranges = []
+            if len(self.ids) == 1:
+                glBindBuffer(self.target, self.id)
+                glBufferData(self.target, self.size, self.data, self.usage)
+            else:
+                self._index = (self._index + 1) % len(self.ids)
+                self.id = self.ids[self._index]
+                glBindBuffer(self.target, self.id)
+                glBufferSubData(self.target, 0, self.size, self.data)
+        else:
+            glBindBuffer(self.target, self.id)
+
+    def set_data(self, data):
+        ctypes.memmove(self.data, data, self.size)
+        self._invalidate_range(0, self.size)
+
+    def _invalidate_range(self, start, end):
+        # The whole buffer is uploaded anyway; just record that it changed.
+        if not self._dirty_ranges:
+            self._dirty_ranges.append((start, end))
+
+    def __del__(self):
+        try:
+            for id in self.ids:
+                if id is not None:
+                    self._context.delete_buffer(id)
+        except:
+            pass
+
+    def delete(self):
+        if self.id is not None:
+            ids = (GLuint * len(self.ids))(*self.ids)
+            glDeleteBuffers(len(self.ids), ids)
+            self.ids = [None] * len(self.ids)
+            self.id = None
+
+    def resize(self, size):
+        data = (ctypes.c_byte * size)()
+        ctypes.memmove(data, self.data, min(size, self.size))
+        self.data = data
+        self.data_ptr = ctypes.cast(self.data, ctypes.c_void_p).value
+
+        self.size = size
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+        for id in self.ids:
+            glBindBuffer(self.target, id)
+            glBufferData(self.target, self.size, None, self.usage)
+        glPopClientAttrib()
+
+        # Upload to the current buffer on next bind
+        self._dirty_ranges = [(0, self.size)]
 
 class AbstractBufferRegion(object):
     '''A mapped region of a buffer.
@@ -464,9 +639,7 @@ class VertexBufferObjectRegion(AbstractBufferRegion):
         self.array = array
 
     def invalidate(self):
-        buffer = self.buffer
-        buffer._dirty_min = min(buffer._dirty_min, self.start)
-        buffer._dirty_max = max(buffer._dirty_max, self.end)
+        self.buffer._invalidate_range(self.start, self.end)
 
 class VertexArrayRegion(AbstractBufferRegion):
     '''A mapped region of a vertex array.
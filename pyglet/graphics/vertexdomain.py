@@ -54,6 +54,12 @@ buffers automatically.
 The entire domain can be efficiently drawn in one step with the
 `VertexDomain.draw` method, assuming all the vertices comprise primitives of
 the same OpenGL primitive mode.
+
+Deleting vertex lists leaves holes in the domain's buffers.
+`VertexDomain.compact` moves the remaining vertex lists down to be contiguous
+and shrinks the buffers.  This changes the ``start`` of the moved vertex
+lists, so it is only done automatically if `VertexDomain.compact_threshold`
+is set.
 '''
 
 __docformat__ = 'restructuredtext'
@@ -61,10 +67,20 @@ __version__ = '$Id: $'
 
 import ctypes
 import re
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
+import pyglet
+from pyglet import gl
 from pyglet.gl import *
 from pyglet.graphics import allocation, vertexattribute, vertexbuffer
 
+_enable_vao = pyglet.options['graphics_vao']
+
 _usage_format_re = re.compile(r'''
     (?P<attribute>[^/]*)
     (/ (?P<usage> static|dynamic|stream|none))?
@@ -88,6 +104,43 @@ def _nearest_pow2(v):
     v |= v >> 16
     return v + 1
 
+def _move_regions(buffer, element_size, moves):
+    # Move regions of elements within a mappable buffer.  moves is a list of
+    # (old_start, new_start, count), sorted by old_start, with each
+    # new_start <= old_start, so regions can be moved in order.
+    if not moves:
+        return
+    old_start, new_start, count = moves[-1]
+    size = (old_start + count) * element_size
+    region = buffer.get_region(0, size, ctypes.POINTER(ctypes.c_byte * size))
+    base = ctypes.addressof(region.array)
+    for old_start, new_start, count in moves:
+        ctypes.memmove(base + new_start * element_size,
+                       base + old_start * element_size,
+                       count * element_size)
+    region.invalidate()
+
+def _pack_regions(items, start_attr, count_attr):
+    # Assign contiguous new starts to the regions of items, in order of their
+    # current start.  Returns (moves, used), where moves is as for
+    # _move_regions and only contains regions that change position.
+    items = sorted(items, key=lambda item: getattr(item, start_attr))
+    moves = []
+    used = 0
+    for item in items:
+        start = getattr(item, start_attr)
+        count = getattr(item, count_attr)
+        if start != used:
+            if moves and moves[-1][0] + moves[-1][2] == start:
+                # Extend the previous move
+                old_start, new_start, old_count = moves[-1]
+                moves[-1] = (old_start, new_start, old_count + count)
+            else:
+                moves.append((start, used, count))
+            setattr(item, start_attr, used)
+        used += count
+    return moves, used
+
 def create_attribute_usage(format):
     '''Create an attribute and usage pair from a format string.  The
     format string is as documented in `pyglet.graphics.vertexattribute`, with
@@ -155,9 +208,41 @@ class VertexDomain(object):
     _version = 0
     _initial_count = 16
 
+    #: Fraction of a buffer's capacity that must be unusable holes before
+    #: the domain is compacted automatically when a vertex list is deleted,
+    #: or None (the default) to only compact when `compact` is called.
+    #: Automatic compaction moves vertex lists, so it must only be enabled
+    #: if nothing keeps a vertex list's ``start`` or attribute arrays.
+    compact_threshold = None
+
+    #: Domains with buffers smaller than this many elements are never
+    #: compacted automatically.
+    compact_min_capacity = 256
+
+    # Vertex array object recording the attribute setup, 0 if unsupported,
+    # or None if not yet created; and the context it belongs to.
+    _vao = None
+    _vao_context = None
+
+    # Buffer (id, ptr) pairs the vertex array object's pointers refer to.
+    _vao_key = None
+
+    # Allocated regions last drawn, and the ctypes arrays built from them.
+    _draw_regions = None
+    _draw_arrays = None
+
+    # Weak reference to the batch owning this domain, and the group the
+    # domain is drawn in; the batch is told when the domain becomes empty so
+    # that it can be removed.
+    _batch = None
+    _group = None
+
     def __init__(self, attribute_usages):
         self.allocator = allocation.Allocator(self._initial_count)
 
+        # Live vertex lists, needed to move them during compaction.
+        self._vertex_lists = weakref.WeakSet()
+
         # If there are any MultiTexCoord attributes, then a TexCoord attribute
         # must be converted.
         have_multi_texcoord = False
@@ -240,6 +325,78 @@ class VertexDomain(object):
             except AttributeError:
                 pass
 
+        try:
+            if self._vao:
+                self._vao_context.delete_vao(self._vao)
+        except:
+            pass
+
+    def _get_vao(self):
+        # Return the vertex array object to draw with on the current context,
+        # or 0 if one cannot be used.
+        # Domains with multitexture coordinates are excluded, as the client
+        # active texture they select is not vertex array object state.
+        context = gl.current_context
+        if self._vao is None:
+            info = context.get_info()
+            multi_tex_coords = 'multi_tex_coords' in self.attribute_names
+            if (_enable_vao and info and not multi_tex_coords and
+                (info.have_version(3) or
+                 info.have_extension('GL_ARB_vertex_array_object'))):
+                vao = GLuint()
+                glGenVertexArrays(1, vao)
+                self._vao = vao.value
+                self._vao_context = context
+            else:
+                self._vao = 0
+        if context is not self._vao_context:
+            return 0
+        return self._vao
+
+    def _bind_attributes(self):
+        # Bind buffers (committing any pending data) and set up the attribute
+        # pointers for drawing.  If a vertex array object is used, the
+        # pointers are only set again if a buffer has moved since.
+        vao = self._get_vao()
+        if vao:
+            glBindVertexArray(vao)
+            for buffer, _ in self.buffer_attributes:
+                buffer.bind()
+            key = [(getattr(buffer, 'id', None), buffer.ptr)
+                   for buffer, _ in self.buffer_attributes]
+            if key == self._vao_key:
+                return vao
+            self._vao_key = key
+        else:
+            glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+
+        for buffer, attributes in self.buffer_attributes:
+            buffer.bind()
+            for attribute in attributes:
+                attribute.enable()
+                attribute.set_pointer(attribute.buffer.ptr)
+        return vao
+
+    def _unbind_attributes(self, vao):
+        for buffer, _ in self.buffer_attributes:
+            buffer.unbind()
+        if vao:
+            glBindVertexArray(0)
+        else:
+            glPopClientAttrib()
+
+    def _get_draw_arrays(self):
+        # Return the allocated regions as ctypes arrays, rebuilt only when
+        # the allocation has changed.
+        regions = self.allocator.get_allocated_regions()
+        if regions is not self._draw_regions:
+            starts, sizes = regions
+            primcount = len(starts)
+            self._draw_arrays = ((GLint * primcount)(*starts),
+                                 (GLsizei * primcount)(*sizes))
+            self._draw_regions = regions
+        return self._draw_arrays
+
     def _safe_alloc(self, count):
         '''Allocate vertices, resizing the buffers if necessary.'''
         try:
@@ -274,7 +431,54 @@ class VertexDomain(object):
         :rtype: `VertexList`
         '''
         start = self._safe_alloc(count)
-        return VertexList(self, start, count)
+        vertex_list = VertexList(self, start, count)
+        self._vertex_lists.add(vertex_list)
+        return vertex_list
+
+    def _should_compact(self, allocator):
+        if self.compact_threshold is None:
+            return False
+        capacity = allocator.capacity
+        return (capacity >= self.compact_min_capacity and
+                allocator.get_fragmented_free_size() >
+                    self.compact_threshold * capacity)
+
+    def _check_compact(self):
+        if self._should_compact(self.allocator):
+            self.compact()
+
+    def _compact_vertices(self):
+        # Returns list of (vertex_list, diff) for moved vertex lists.
+        lists = self._vertex_lists
+        old_starts = dict((vertex_list, vertex_list.start)
+                          for vertex_list in lists)
+        moves, used = _pack_regions(lists, 'start', 'count')
+        for buffer, _ in self.buffer_attributes:
+            _move_regions(buffer, buffer.element_size, moves)
+
+        capacity = max(_nearest_pow2(used), self._initial_count)
+        if capacity < self.allocator.capacity:
+            for buffer, _ in self.buffer_attributes:
+                buffer.resize(capacity * buffer.element_size)
+        else:
+            capacity = self.allocator.capacity
+        self.allocator = allocation.Allocator(capacity)
+        self.allocator.alloc(used)
+
+        self._version += 1
+        return [(vertex_list, vertex_list.start - old_starts[vertex_list])
+                for vertex_list in lists
+                if vertex_list.start != old_starts[vertex_list]]
+
+    def compact(self):
+        '''Move all vertex lists in the domain to be contiguous, and shrink
+        the buffers to fit.
+
+        The ``start`` of each moved `VertexList` is updated.  Arrays
+        previously obtained from a vertex list's attribute properties (for
+        example, `VertexList.vertices`) are no longer valid afterwards.
+        '''
+        self._compact_vertices()
 
     def draw(self, mode, vertex_list=None):
         '''Draw vertices in the domain.
@@ -292,12 +496,7 @@ class VertexDomain(object):
                 Vertex list to draw, or ``None`` for all lists in this domain.
 
         '''
-        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
-        for buffer, attributes in self.buffer_attributes:
-            buffer.bind()
-            for attribute in attributes:
-                attribute.enable()
-                attribute.set_pointer(attribute.buffer.ptr)
+        vao = self._bind_attributes()
         if vertexbuffer._workaround_vbo_finish:
             glFinish()
 
@@ -312,19 +511,22 @@ class VertexDomain(object):
                 # Common case
                 glDrawArrays(mode, starts[0], sizes[0])
             elif gl_info.have_version(1, 4):
-                starts = (GLint * primcount)(*starts)
-                sizes = (GLsizei * primcount)(*sizes)
+                starts, sizes = self._get_draw_arrays()
                 glMultiDrawArrays(mode, starts, sizes, primcount)
             else:
                 for start, size in zip(starts, sizes):
                     glDrawArrays(mode, start, size)
 
-        for buffer, _ in self.buffer_attributes:
-            buffer.unbind()
-        glPopClientAttrib()
+        self._unbind_attributes(vao)
 
     def _is_empty(self):
-        return not self.allocator.starts
+        return self.allocator._is_empty()
+
+    def _check_empty(self):
+        if self._batch is not None and self._is_empty():
+            batch = self._batch()
+            if batch is not None:
+                batch._invalidate_group(self._group)
 
     def __repr__(self):
         return '<%s@%x %s>' % (self.__class__.__name__, id(self),
@@ -334,12 +536,37 @@ class VertexList(object):
     '''A list of vertices within a `VertexDomain`.  Use
     `VertexDomain.create` to construct this list.
     '''
+    # Vertex lists are created in large numbers (one per sprite, glyph run,
+    # etc.), so they have no instance dictionary.  They are weakly
+    # referenced by their domain.
+    __slots__ = ['domain', 'start', 'count', '__weakref__',
+                 '_colors_cache', '_colors_cache_version',
+                 '_fog_coords_cache', '_fog_coords_cache_version',
+                 '_edge_flags_cache', '_edge_flags_cache_version',
+                 '_normals_cache', '_normals_cache_version',
+                 '_secondary_colors_cache', '_secondary_colors_cache_version',
+                 '_tex_coords_cache', '_tex_coords_cache_version',
+                 '_vertices_cache', '_vertices_cache_version']
 
     def __init__(self, domain, start, count):
         # TODO make private
         self.domain = domain
         self.start = start
         self.count = count
+        self._colors_cache = None
+        self._colors_cache_version = None
+        self._fog_coords_cache = None
+        self._fog_coords_cache_version = None
+        self._edge_flags_cache = None
+        self._edge_flags_cache_version = None
+        self._normals_cache = None
+        self._normals_cache_version = None
+        self._secondary_colors_cache = None
+        self._secondary_colors_cache_version = None
+        self._tex_coords_cache = None
+        self._tex_coords_cache_version = None
+        self._vertices_cache = None
+        self._vertices_cache_version = None
 
     def get_size(self):
         '''Get the number of vertices in the list.
@@ -397,6 +624,9 @@ class VertexList(object):
     def delete(self):
         '''Delete this group.'''
         self.domain.allocator.dealloc(self.start, self.count)
+        self.domain._vertex_lists.discard(self)
+        self.domain._check_compact()
+        self.domain._check_empty()
 
     def migrate(self, domain):
         '''Move this group from its current domain and add to the specified
@@ -421,9 +651,14 @@ class VertexList(object):
             new.array[:] = old.array[:]
             new.invalidate()
 
-        self.domain.allocator.dealloc(self.start, self.count)
+        old_domain = self.domain
+        old_domain.allocator.dealloc(self.start, self.count)
+        old_domain._vertex_lists.discard(self)
         self.domain = domain
         self.start = new_start
+        domain._vertex_lists.add(self)
+        old_domain._check_compact()
+        old_domain._check_empty()
 
         self._colors_cache_version = None
         self._fog_coords_cache_version = None
@@ -457,8 +692,6 @@ class VertexList(object):
     def _set_colors(self, data):
         self._get_colors()[:] = data
 
-    _colors_cache = None
-    _colors_cache_version = None
     colors = property(_get_colors, _set_colors,
                       doc='''Array of color data.''')
 
@@ -479,8 +712,6 @@ class VertexList(object):
     def _set_fog_coords(self, data):
         self._get_fog_coords()[:] = data
 
-    _fog_coords_cache = None
-    _fog_coords_cache_version = None
     fog_coords = property(_get_fog_coords, _set_fog_coords,
                           doc='''Array of fog coordinate data.''')
 
@@ -501,8 +732,6 @@ class VertexList(object):
     def _set_edge_flags(self, data):
         self._get_edge_flags()[:] = data
 
-    _edge_flags_cache = None
-    _edge_flags_cache_version = None
     edge_flags = property(_get_edge_flags, _set_edge_flags,
                           doc='''Array of edge flag data.''')
 
@@ -523,8 +752,6 @@ class VertexList(object):
     def _set_normals(self, data):
         self._get_normals()[:] = data
 
-    _normals_cache = None
-    _normals_cache_version = None
     normals = property(_get_normals, _set_normals,
                        doc='''Array of normal vector data.''')
 
@@ -545,16 +772,11 @@ class VertexList(object):
     def _set_secondary_colors(self, data):
         self._get_secondary_colors()[:] = data
 
-    _secondary_colors_cache = None
-    _secondary_colors_cache_version = None
     secondary_colors = property(_get_secondary_colors, _set_secondary_colors,
                                 doc='''Array of secondary color data.''')
 
     # ---
 
-    _tex_coords_cache = None
-    _tex_coords_cache_version = None
-
     def _get_tex_coords(self):
         if (self._tex_coords_cache_version != self.domain._version):
             domain = self.domain
@@ -575,9 +797,6 @@ class VertexList(object):
 
     # ---
 
-    _vertices_cache = None
-    _vertices_cache_version = None
-
     def _get_vertices(self):
         if (self._vertices_cache_version != self.domain._version):
             domain = self.domain
@@ -650,7 +869,53 @@ class IndexedVertexDomain(VertexDomain):
         '''
         start = self._safe_alloc(count)
         index_start = self._safe_index_alloc(index_count)
-        return IndexedVertexList(self, start, count, index_start, index_count)
+        vertex_list = IndexedVertexList(
+            self, start, count, index_start, index_count)
+        self._vertex_lists.add(vertex_list)
+        return vertex_list
+
+    def _check_compact(self):
+        if (self._should_compact(self.allocator) or
+            self._should_compact(self.index_allocator)):
+            self.compact()
+
+    def compact(self):
+        '''Move all vertex lists in the domain to be contiguous, and shrink
+        the vertex and index buffers to fit.
+
+        Indices of moved vertex lists are rewritten to refer to the new
+        vertex positions.
+        '''
+        # Compact indices first, then rewrite them in their new positions.
+        lists = self._vertex_lists
+        moves, used = _pack_regions(lists, 'index_start', 'index_count')
+        _move_regions(self.index_buffer, self.index_element_size, moves)
+
+        capacity = max(_nearest_pow2(used), self._initial_index_count)
+        if capacity < self.index_allocator.capacity:
+            self.index_buffer.resize(capacity * self.index_element_size)
+        else:
+            capacity = self.index_allocator.capacity
+        self.index_allocator = allocation.Allocator(capacity)
+        self.index_allocator.alloc(used)
+
+        moved = self._compact_vertices()
+        if not moved:
+            return
+        region = self.get_index_region(0, used)
+        if numpy is not None:
+            indices = numpy.ctypeslib.as_array(region.array)
+            for vertex_list, diff in moved:
+                start = vertex_list.index_start
+                moved_indices = indices[start:start + vertex_list.index_count]
+                numpy.add(moved_indices, diff, moved_indices, casting='unsafe')
+        else:
+            indices = region.array
+            for vertex_list, diff in moved:
+                start = vertex_list.index_start
+                end = start + vertex_list.index_count
+                indices[start:end] = [i + diff for i in indices[start:end]]
+        region.invalidate()
 
     def get_index_region(self, start, count):
         '''Get a region of the index buffer.
@@ -684,12 +949,7 @@ class IndexedVertexDomain(VertexDomain):
                 Vertex list to draw, or ``None`` for all lists in this domain.
 
         '''
-        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
-        for buffer, attributes in self.buffer_attributes:
-            buffer.bind()
-            for attribute in attributes:
-                attribute.enable()
-                attribute.set_pointer(attribute.buffer.ptr)
+        vao = self._bind_attributes()
         self.index_buffer.bind()
         if vertexbuffer._workaround_vbo_finish:
             glFinish()
@@ -706,12 +966,11 @@ class IndexedVertexDomain(VertexDomain):
             elif primcount == 1:
                 # Common case
                 glDrawElements(mode, sizes[0], self.index_gl_type,
-                    self.index_buffer.ptr + starts[0])
+                    self.index_buffer.ptr +
+                        starts[0] * self.index_element_size)
             elif gl_info.have_version(1, 4):
-                starts = [s * self.index_element_size + self.index_buffer.ptr for s in starts]
-                starts = ctypes.cast((GLuint * primcount)(*starts), ctypes.POINTER(ctypes.c_void_p))
-                sizes = (GLsizei * primcount)(*sizes)
-                glMultiDrawElements(mode, sizes, GL_UNSIGNED_INT, starts,
+                starts, sizes = self._get_index_draw_arrays()
+                glMultiDrawElements(mode, sizes, self.index_gl_type, starts,
                                     primcount)
             else:
                 for start, size in zip(starts, sizes):
@@ -720,19 +979,38 @@ class IndexedVertexDomain(VertexDomain):
                             start * self.index_element_size)
 
         self.index_buffer.unbind()
-        for buffer, _ in self.buffer_attributes:
-            buffer.unbind()
-        glPopClientAttrib()
+        self._unbind_attributes(vao)
+
+    def _get_index_draw_arrays(self):
+        # As for _get_draw_arrays, but giving index buffer pointers; these
+        # also change if the index buffer is a vertex array that moved.
+        regions = self.index_allocator.get_allocated_regions()
+        ptr = self.index_buffer.ptr
+        if (regions, ptr) != self._draw_regions:
+            starts, sizes = regions
+            primcount = len(starts)
+            starts = [s * self.index_element_size + ptr for s in starts]
+            self._draw_arrays = (
+                ctypes.cast((ctypes.c_void_p * primcount)(*starts),
+                            ctypes.POINTER(ctypes.c_void_p)),
+                (GLsizei * primcount)(*sizes))
+            self._draw_regions = (regions, ptr)
+        return self._draw_arrays
 
 class IndexedVertexList(VertexList):
     '''A list of vertices within an `IndexedVertexDomain` that are indexed.
     Use `IndexedVertexDomain.create` to construct this list.
     '''
+    __slots__ = ['index_start', 'index_count',
+                 '_indices_cache', '_indices_cache_version']
+
     def __init__(self, domain, start, count, index_start, index_count):
         super(IndexedVertexList, self).__init__(domain, start, count)
 
         self.index_start = index_start
         self.index_count = index_count
+        self._indices_cache = None
+        self._indices_cache_version = None
 
     def draw(self, mode):
         self.domain.draw(mode, self)
@@ -771,8 +1049,8 @@ class IndexedVertexList(VertexList):
 
     def delete(self):
         '''Delete this group.'''
-        super(IndexedVertexList, self).delete()
         self.domain.index_allocator.dealloc(self.index_start, self.index_count)
+        super(IndexedVertexList, self).delete()
 
     def _set_index_data(self, data):
         # TODO without region
@@ -797,7 +1075,5 @@ class IndexedVertexList(VertexList):
     def _set_indices(self, data):
         self._get_indices()[:] = data
 
-    _indices_cache = None
-    _indices_cache_version = None
     indices = property(_get_indices, _set_indices,
                        doc='''Array of index data.''')
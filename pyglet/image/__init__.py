@@ -97,6 +97,19 @@ form).  To use a texture with pyglet.gl::
     glBindTexture(texture.target, texture.id)
     # ... draw with the texture
 
+Streaming textures
+------------------
+
+Uploading a large image in one go can stall a frame.  A `TextureStreamer`
+uploads images a few rows at a time, within a per-frame byte budget, through
+a pixel buffer object where available::
+
+    streamer = image.TextureStreamer(bytes_per_frame=1 << 20)
+    pyglet.clock.schedule(streamer.update)
+
+    upload = streamer.stream(pic)
+    upload.add_done_callback(lambda upload: show(upload.texture))
+
 Pixel access
 ------------
 
@@ -607,14 +620,13 @@ class ImageData(AbstractImage):
     `format` and `pitch` to obtain the current encoding is not deprecated).
     '''
 
-    _swap1_pattern = re.compile(asbytes('(.)'), re.DOTALL)
-    _swap2_pattern = re.compile(asbytes('(.)(.)'), re.DOTALL)
-    _swap3_pattern = re.compile(asbytes('(.)(.)(.)'), re.DOTALL)
-    _swap4_pattern = re.compile(asbytes('(.)(.)(.)(.)'), re.DOTALL)
-
     _current_texture = None
     _current_mipmap_texture = None
 
+    # (data, format, pitch, converted format, converted pitch, converted
+    # data) for the most recent conversion.
+    _convert_cache = None
+
     def __init__(self, width, height, format, data, pitch=None):
         '''Initialise image data.
 
@@ -684,6 +696,7 @@ class ImageData(AbstractImage):
         self._current_pitch = self.pitch
         self._current_texture = None
         self._current_mipmapped_texture = None
+        self._convert_cache = None
 
     data = property(_get_data, _set_data, 
         doc='''The byte data of the image.  Read-write.
@@ -730,6 +743,7 @@ class ImageData(AbstractImage):
         self._current_data = data
         self._current_texture = None
         self._current_mipmapped_texture = None
+        self._convert_cache = None
 
     def set_mipmap_image(self, level, image):
         '''Set a mipmap image for a particular level.
@@ -990,6 +1004,9 @@ class ImageData(AbstractImage):
     def _convert(self, format, pitch):
         '''Return data in the desired format; does not alter this instance's
         current format or pitch.
+
+        The most recent conversion is kept until the image data is replaced,
+        so repeated requests for the same encoding are free.
         '''
         if format == self._current_format and pitch == self._current_pitch:
             if type(self._current_data) is str:
@@ -997,68 +1014,25 @@ class ImageData(AbstractImage):
             return self._current_data
 
         self._ensure_string_data()
-        data = self._current_data
-        current_pitch = self._current_pitch
-        current_format = self._current_format
-        sign_pitch = current_pitch // abs(current_pitch)
-        if format != self._current_format:
-            # Create replacement string, e.g. r'\4\1\2\3' to convert RGBA to
-            # ARGB
-            repl = asbytes('')
-            for c in format:
-                try:
-                    idx = current_format.index(c) + 1
-                except ValueError:
-                    idx = 1
-                repl += asbytes(r'\%d' % idx)
-
-            if len(current_format) == 1:
-                swap_pattern = self._swap1_pattern
-            elif len(current_format) == 2:
-                swap_pattern = self._swap2_pattern
-            elif len(current_format) == 3:
-                swap_pattern = self._swap3_pattern
-            elif len(current_format) == 4:
-                swap_pattern = self._swap4_pattern
-            else:
-                raise ImageException(
-                    'Current image format is wider than 32 bits.')
-
-            packed_pitch = self.width * len(current_format)
-            if abs(self._current_pitch) != packed_pitch:
-                # Pitch is wider than pixel data, need to go row-by-row.
-                rows = re.findall(
-                    asbytes('.') * abs(self._current_pitch), data, re.DOTALL)
-                rows = [swap_pattern.sub(repl, r[:packed_pitch]) for r in rows]
-                data = asbytes('').join(rows)
-            else:
-                # Rows are tightly packed, apply regex over whole image.
-                data = swap_pattern.sub(repl, data)
-
-            # After conversion, rows will always be tightly packed
-            current_pitch = sign_pitch * (len(format) * self.width)
-
-        if pitch != current_pitch:
-            diff = abs(current_pitch) - abs(pitch)
-            if diff > 0:
-                # New pitch is shorter than old pitch, chop bytes off each row
-                pattern = re.compile(
-                    asbytes('(%s)%s' % ('.' * abs(pitch), '.' * diff)), re.DOTALL)
-                data = pattern.sub(asbytes(r'\1'), data)    
-            elif diff < 0:
-                # New pitch is longer than old pitch, add '0' bytes to each row
-                pattern = re.compile(
-                    asbytes('(%s)' % ('.' * abs(current_pitch))), re.DOTALL)
-                pad = '.' * -diff
-                data = pattern.sub(asbytes(r'\1%s' % pad), data)
-
-            if current_pitch * pitch < 0:
-                # Pitch differs in sign, swap row order
-                rows = re.findall(asbytes('.') * abs(pitch), data, re.DOTALL)
-                rows.reverse()
-                data = asbytes('').join(rows)
-
-        return asbytes(data)
+        cache = self._convert_cache
+        if (cache is not None and
+            cache[0] is self._current_data and
+            cache[1] == self._current_format and
+            cache[2] == self._current_pitch and
+            cache[3] == format and
+            cache[4] == pitch):
+            return cache[5]
+
+        if format != self._current_format and len(self._current_format) > 4:
+            raise ImageException(
+                'Current image format is wider than 32 bits.')
+
+        data = _convert_data(self._current_data, self.width,
+                             self._current_format, self._current_pitch,
+                             format, pitch)
+        self._convert_cache = (self._current_data, self._current_format,
+                               self._current_pitch, format, pitch, data)
+        return data
 
     def _ensure_string_data(self):
         if type(self._current_data) is not bytes_type:
@@ -1116,6 +1090,62 @@ class ImageData(AbstractImage):
             return GL_INTENSITY
         return GL_RGBA
 
+def _swizzle_indices(current_format, format):
+    # Index of each component of `format` within `current_format`.  Missing
+    # components are taken from the first component.
+    indices = []
+    for c in format:
+        idx = current_format.find(c)
+        if idx < 0:
+            idx = 0
+        indices.append(idx)
+    return indices
+
+def _convert_data(data, width, current_format, current_pitch, format, pitch):
+    # Convert image data using strided slices, which copy each component
+    # plane in a single operation, and a row split and join for pitch
+    # changes.
+    rows = len(data) // abs(current_pitch)
+    if format != current_format:
+        components = len(current_format)
+        packed_pitch = width * components
+        if abs(current_pitch) != packed_pitch:
+            # Pitch is wider than pixel data, strip the row padding.
+            step = abs(current_pitch)
+            data = asbytes('').join([data[i:i + packed_pitch]
+                                     for i in range(0, rows * step, step)])
+        else:
+            data = data[:rows * packed_pitch]
+
+        converted = bytearray(rows * width * len(format))
+        indices = _swizzle_indices(current_format, format)
+        for i, idx in enumerate(indices):
+            converted[i::len(format)] = data[idx::components]
+        data = asbytes(converted)
+
+        # After conversion, rows will always be tightly packed.
+        current_pitch = (current_pitch // abs(current_pitch) *
+                         width * len(format))
+
+    if pitch != current_pitch:
+        step = abs(current_pitch)
+        data_rows = [data[i:i + step] for i in range(0, rows * step, step)]
+        diff = abs(pitch) - step
+        if diff < 0:
+            # New pitch is shorter than old pitch, chop bytes off each row
+            data_rows = [row[:abs(pitch)] for row in data_rows]
+        elif diff > 0:
+            # New pitch is longer than old pitch, add '0' bytes to each row
+            pad = asbytes('\0') * diff
+            data_rows = [row + pad for row in data_rows]
+
+        if current_pitch * pitch < 0:
+            # Pitch differs in sign, swap row order
+            data_rows.reverse()
+        data = asbytes('').join(data_rows)
+
+    return asbytes(data)
+
 class ImageDataRegion(ImageData):
     def __init__(self, x, y, width, height, image_data):
         super(ImageDataRegion, self).__init__(width, height,
@@ -1433,7 +1463,8 @@ class Texture(AbstractImage):
 
     @classmethod
     def create(cls, width, height, internalformat=GL_RGBA, 
-               rectangle=False, force_rectangle=False, min_filter=GL_LINEAR, mag_filter=GL_LINEAR):
+               rectangle=False, force_rectangle=False, min_filter=GL_LINEAR, mag_filter=GL_LINEAR,
+               blank=True):
         '''Create an empty Texture.
 
         If `rectangle` is ``False`` or the appropriate driver extensions are
@@ -1461,6 +1492,11 @@ class Texture(AbstractImage):
                 The minifaction filter used for this texture, commonly ``GL_LINEAR`` or ``GL_NEAREST``
             `mag_filter` : int
                 The magnification filter used for this texture, commonly ``GL_LINEAR`` or ``GL_NEAREST``
+            `blank` : bool
+                If ``True`` the texture is cleared; otherwise its contents
+                are undefined, which avoids uploading a blank image.
+
+                **Since:** pyglet 1.2
 
         :rtype: `Texture`
         
@@ -1496,7 +1532,10 @@ class Texture(AbstractImage):
         glTexParameteri(target, GL_TEXTURE_MIN_FILTER, min_filter)
         glTexParameteri(target, GL_TEXTURE_MAG_FILTER, mag_filter)
 
-        blank = (GLubyte * (texture_width * texture_height * 4))()
+        if blank:
+            blank = (GLubyte * (texture_width * texture_height * 4))()
+        else:
+            blank = None
         glTexImage2D(target, 0,
                      internalformat,
                      texture_width, texture_height,
@@ -1768,6 +1807,9 @@ class TextureRegion(Texture):
         y += self.y
         region = self.region_class(x, y, self.z, width, height, self.owner)
         region._set_tex_coords_order(*self.tex_coords_order)
+        # Keep this region alive, so a texture atlas does not reuse its
+        # area while the new region is in use.
+        region._parent = self
         return region
 
     def blit_into(self, source, x, y, z):
@@ -1925,6 +1967,255 @@ class DepthTexture(Texture):
         glBindTexture(self.target, self.id)
         source.blit_to_texture(self.level, x, y, z)
 
+class TextureUpload(object):
+    '''An image being uploaded to a texture by a `TextureStreamer`.
+
+    The interface follows that of a future: `done` reports whether the
+    upload has completed, `add_done_callback` registers a function to call
+    when it does, and `result` completes it immediately.
+
+    :Ivariables:
+        `texture` : `Texture`
+            The texture being uploaded to.  It can be used straight away, but
+            its contents are undefined until the upload is done.
+
+    :since: pyglet 1.2
+    '''
+    _fence = None
+
+    def __init__(self, streamer, texture, data, format, type, row_bytes):
+        self.texture = texture
+        self._streamer = streamer
+        self._data = data
+        if isinstance(data, bytes_type):
+            self._address = cast(c_char_p(data), c_void_p).value
+        else:
+            self._address = addressof(data)
+        self._format = format
+        self._type = type
+        self._row_bytes = row_bytes
+        self._row = 0
+        self._done = False
+        self._callbacks = []
+
+    def done(self):
+        '''Determine if the upload has completed.
+
+        :rtype: bool
+        '''
+        if not self._done and self._row == self.texture.height:
+            if self._fence:
+                status = glClientWaitSync(self._fence, 0, 0)
+                if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                    return False
+                glDeleteSync(self._fence)
+                self._fence = None
+            self._done = True
+            self._data = None
+            callbacks, self._callbacks = self._callbacks, []
+            for callback in callbacks:
+                callback(self)
+        return self._done
+
+    def add_done_callback(self, callback):
+        '''Call a function when the upload has completed.
+
+        The function is called with this upload as its only argument, during
+        `TextureStreamer.update`.  If the upload has already completed it is
+        called immediately.
+
+        :Parameters:
+            `callback` : callable
+                Function to call.
+
+        '''
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def result(self):
+        '''Upload the rest of the image immediately.
+
+        :rtype: `Texture`
+        :return: The uploaded texture.
+        '''
+        if self._row < self.texture.height:
+            self._upload(self._row_bytes * self.texture.height)
+            self._streamer._remove(self)
+        if self._fence:
+            glClientWaitSync(self._fence, GL_SYNC_FLUSH_COMMANDS_BIT,
+                             GL_TIMEOUT_IGNORED)
+        self.done()
+        return self.texture
+
+    def _upload(self, max_bytes):
+        # Upload as many rows as fit within max_bytes (at least one); return
+        # the number of bytes uploaded.
+        texture = self.texture
+        rows = max(1, min(texture.height - self._row,
+                          max_bytes // self._row_bytes))
+        offset = self._row * self._row_bytes
+        size = rows * self._row_bytes
+
+        glBindTexture(texture.target, texture.id)
+        glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        buffer = self._streamer._get_buffer()
+        if buffer:
+            # Orphan the previous contents of the buffer, so this doesn't
+            # wait for the driver to finish reading them.
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_UNPACK_BUFFER, size, None, GL_STREAM_DRAW)
+            pointer = glMapBuffer(GL_PIXEL_UNPACK_BUFFER, GL_WRITE_ONLY)
+            memmove(pointer, self._address + offset, size)
+            glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+            pixels = None
+        else:
+            pixels = c_void_p(self._address + offset)
+        glTexSubImage2D(texture.target, 0,
+                        texture.x, texture.y + self._row,
+                        texture.width, rows,
+                        self._format, self._type,
+                        pixels)
+        if buffer:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        glPopClientAttrib()
+
+        self._row += rows
+        if (self._row == texture.height and
+            (gl_info.have_version(3, 2) or
+             gl_info.have_extension('GL_ARB_sync'))):
+            self._fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        return size
+
+class TextureStreamer(object):
+    '''Upload images to textures over several frames.
+
+    Each call to `update` uploads queued images, in the order they were
+    queued, until `bytes_per_frame` bytes have been uploaded.  Rows are
+    staged through a pixel buffer object when OpenGL 2.1 or
+    ``GL_ARB_pixel_buffer_object`` is available, so the driver can transfer
+    them to the texture asynchronously.
+
+    `update` is typically scheduled to run every frame::
+
+        streamer = TextureStreamer()
+        pyglet.clock.schedule(streamer.update)
+
+    :Ivariables:
+        `bytes_per_frame` : int
+            Maximum number of bytes to upload in each call to `update`.  At
+            least one row of an image is always uploaded.
+
+    :since: pyglet 1.2
+    '''
+    _buffer = None
+
+    def __init__(self, bytes_per_frame=1 << 20):
+        '''Create a texture streamer.
+
+        :Parameters:
+            `bytes_per_frame` : int
+                Maximum number of bytes to upload in each call to `update`.
+
+        '''
+        self.bytes_per_frame = bytes_per_frame
+        self._queue = []
+        self._pending = []
+
+    def stream(self, image, rectangle=False):
+        '''Queue an image to be uploaded to a new texture.
+
+        The texture is created immediately, without clearing it.
+
+        :Parameters:
+            `image` : `AbstractImage`
+                The image to upload.
+            `rectangle` : bool
+                ``True`` if a rectangular texture is permitted.  See
+                `AbstractImage.get_texture`.
+
+        :rtype: `TextureUpload`
+        '''
+        image_data = image.get_image_data()
+        data_format = image_data.format
+        format, type = image_data._get_gl_format_and_type(data_format)
+        if format is None:
+            data_format = {
+                1: 'L',
+                2: 'LA',
+                3: 'RGB',
+                4: 'RGBA'}.get(len(data_format))
+            format, type = image_data._get_gl_format_and_type(data_format)
+        row_bytes = image_data.width * len(data_format)
+        data = image_data.get_data(data_format, row_bytes)
+
+        texture = Texture.create(image_data.width, image_data.height,
+                                 image_data._get_internalformat(data_format),
+                                 rectangle, blank=False)
+        if image_data.anchor_x or image_data.anchor_y:
+            texture.anchor_x = image_data.anchor_x
+            texture.anchor_y = image_data.anchor_y
+
+        upload = TextureUpload(self, texture, data, format, type, row_bytes)
+        self._queue.append(upload)
+        return upload
+
+    def update(self, dt=None):
+        '''Upload queued images, up to `bytes_per_frame` bytes.
+
+        :Parameters:
+            `dt` : float
+                Ignored; allows the method to be scheduled with
+                `pyglet.clock`.
+
+        '''
+        self._pending = [upload for upload in self._pending
+                         if not upload.done()]
+
+        budget = self.bytes_per_frame
+        while self._queue:
+            upload = self._queue[0]
+            if budget < upload._row_bytes and budget < self.bytes_per_frame:
+                break
+            budget -= upload._upload(budget)
+            if upload._row == upload.texture.height:
+                del self._queue[0]
+                if not upload.done():
+                    self._pending.append(upload)
+
+    def flush(self):
+        '''Upload all queued images immediately.'''
+        while self._queue:
+            self._queue[0].result()
+        for upload in self._pending:
+            upload.result()
+        self._pending = []
+
+    def delete(self):
+        '''Delete the pixel buffer object used for uploads.
+
+        Queued images will continue to be uploaded, without it.
+        '''
+        if self._buffer:
+            glDeleteBuffers(1, byref(GLuint(self._buffer)))
+        self._buffer = 0
+
+    def _get_buffer(self):
+        if self._buffer is None:
+            self._buffer = 0
+            if (gl_info.have_version(2, 1) or
+                gl_info.have_extension('GL_ARB_pixel_buffer_object')):
+                buffer = GLuint()
+                glGenBuffers(1, byref(buffer))
+                self._buffer = buffer.value
+        return self._buffer
+
+    def _remove(self, upload):
+        if upload in self._queue:
+            self._queue.remove(upload)
+
 class BufferManager(object):
     '''Manages the set of framebuffers for a context.
 
@@ -2307,14 +2598,21 @@ class TextureGrid(TextureRegion, UniformTextureSequence):
 
         super(TextureGrid, self).__init__(
             image.x, image.y, image.z, image.width, image.height, owner)
+        # Keep the source region alive, as for `get_region`.  The items
+        # refer to it rather than to this grid, as a reference cycle of
+        # objects with __del__ would never be collected.
+        self._parent = image
         
         items = []
         y = 0
         for row in range(grid.rows):
             x = 0
             for col in range(grid.columns):
-                items.append(
-                    self.get_region(x, y, grid.item_width, grid.item_height))
+                item = self.region_class(x + self.x, y + self.y, self.z,
+                    grid.item_width, grid.item_height, owner)
+                item._set_tex_coords_order(*self.tex_coords_order)
+                item._parent = image
+                items.append(item)
                 x += grid.item_width + grid.column_padding
             y += grid.item_height + grid.row_padding
 
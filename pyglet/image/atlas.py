@@ -49,18 +49,50 @@ Example usage::
     car_texture = bin.add(car_image)
     boat_texture = bin.add(boat_image)
 
+Images are placed by an allocator.  The default `Allocator` packs images
+into horizontal strips, which is fast and works well for images of similar
+height.  `MaxRectsAllocator` packs images of mixed sizes more densely, at
+some cost in allocation time; select it with the `allocator_class` argument
+of `TextureAtlas` or `TextureBin`::
+
+    bin = TextureBin(allocator_class=MaxRectsAllocator)
+
 The result of `TextureBin.add` is a `TextureRegion` containing the image.
-Once added, an image cannot be removed from a bin (or an atlas); nor can a
-list of images be obtained from a given bin or atlas -- it is the
+A list of images cannot be obtained from a given bin or atlas -- it is the
 application's responsibility to keep track of the regions returned by the
 ``add`` methods.
 
+Reclaiming space
+^^^^^^^^^^^^^^^^
+
+A region can be removed explicitly with `TextureAtlas.remove`, after which
+it must no longer be drawn.
+
+If an atlas or bin is created with ``reclaim=True``, the area of a region
+returned by ``add`` also becomes free for later images once the region is
+garbage collected.  Regions obtained from it with ``get_region`` or
+``get_transform``, and a `TextureGrid` created from it, keep it alive.  Any
+other object that copies its texture ``id`` and ``tex_coords`` does not, and
+must not be used after the region is collected, so reclaiming is off by
+default.
+
+An image can be added with a `key`.  When a keyed region is no longer
+referenced its contents are kept, and `TextureBin.get` (or
+`TextureAtlas.get`) returns a new region for it without uploading the
+image again.  With ``reclaim=True``, such unreferenced regions are evicted,
+least recently released first, only when an atlas needs their space::
+
+    region = bin.get('explosion') or bin.add(explosion_image, 'explosion')
+
 :since: pyglet 1.1
 '''
 
 __docformat__ = 'restructuredtext'
 __version__ = '$Id: $'
 
+import collections
+import weakref
+
 import pyglet
 
 class AllocatorException(Exception):
@@ -84,6 +116,10 @@ class _Strip(object):
         self.y2 = max(self.y + height, self.y2)
         return x, y
 
+    def remove(self, x, width):
+        if x + width == self.x:
+            self.x = x
+
     def compact(self):
         self.max_height = self.y2 - self.y
 
@@ -145,6 +181,37 @@ class Allocator(object):
         raise AllocatorException('No more space in %r for box %dx%d' % (
                 self, width, height))
 
+    def dealloc(self, x, y, width, height):
+        '''Free an area previously returned by `alloc`.
+
+        The strips algorithm only reuses the area if it is at the end of
+        its strip, in which case the end of the strip moves back to its
+        start; areas freed before it in the same strip are not reused.  All
+        space is reused once every area has been freed.  Use
+        `MaxRectsAllocator` if areas are freed in arbitrary order.
+
+        :Parameters:
+            `x` : int
+                X coordinate of the area, as returned by `alloc`.
+            `y` : int
+                Y coordinate of the area, as returned by `alloc`.
+            `width` : int
+                Width of the area.
+            `height` : int
+                Height of the area.
+
+        :since: pyglet 1.2
+        '''
+        self.used_area -= width * height
+        if not self.used_area:
+            self.strips = [_Strip(0, self.height)]
+            return
+
+        for strip in self.strips:
+            if strip.y == y:
+                strip.remove(x, width)
+                break
+
     def get_usage(self):
         '''Get the fraction of area already allocated.
 
@@ -168,10 +235,210 @@ class Allocator(object):
         possible_area = self.strips[-1].y2 * self.width
         return 1.0 - self.used_area / float(possible_area)
 
+class MaxRectsAllocator(object):
+    '''Rectangular area allocation using the maximal rectangles algorithm.
+
+    The allocator keeps a list of the maximal free rectangles of the area
+    (which may overlap) and places each request in the free rectangle that
+    leaves the shortest leftover side ("best short side fit").  This packs
+    rectangles of mixed sizes considerably more densely than `Allocator`,
+    regardless of the order they are allocated in, but allocation time grows
+    with the number of free rectangles.
+
+    The interface is the same as for `Allocator`.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, width, height):
+        '''Create a `MaxRectsAllocator` of the given size.
+
+        :Parameters:
+            `width` : int
+                Width of the allocation region.
+            `height` : int
+                Height of the allocation region.
+
+        '''
+        assert width > 0 and height > 0
+        self.width = width
+        self.height = height
+        # List of (x1, y1, x2, y2) free rectangles, none of which is
+        # contained in another.
+        self.free_rects = [(0, 0, width, height)]
+        self.used_area = 0
+
+    def alloc(self, width, height):
+        '''Get a free area in the allocator of the given size.
+
+        After calling `alloc`, the requested area will no longer be used.
+        If there is not enough room to fit the given area `AllocatorException`
+        is raised.
+
+        :Parameters:
+            `width` : int
+                Width of the area to allocate.
+            `height` : int
+                Height of the area to allocate.
+
+        :rtype: int, int
+        :return: The X and Y coordinates of the bottom-left corner of the
+            allocated region.
+        '''
+        assert width > 0 and height > 0
+        best = None
+        best_fit = None
+        for rect in self.free_rects:
+            leftover_x = rect[2] - rect[0] - width
+            leftover_y = rect[3] - rect[1] - height
+            if leftover_x >= 0 and leftover_y >= 0:
+                if leftover_x < leftover_y:
+                    fit = leftover_x, leftover_y
+                else:
+                    fit = leftover_y, leftover_x
+                if best_fit is None or fit < best_fit:
+                    best = rect
+                    best_fit = fit
+                    if fit == (0, 0):
+                        break
+
+        if best is None:
+            raise AllocatorException('No more space in %r for box %dx%d' % (
+                    self, width, height))
+
+        x, y = best[:2]
+        self._split(x, y, x + width, y + height)
+        self.used_area += width * height
+        return x, y
+
+    def _split(self, x1, y1, x2, y2):
+        # Remove the given area from the free rectangles, replacing each
+        # free rectangle it overlaps with the (up to four) maximal
+        # rectangles of that free rectangle that lie outside it.
+        kept = []
+        split = set()
+        for rect in self.free_rects:
+            fx1, fy1, fx2, fy2 = rect
+            if x1 >= fx2 or x2 <= fx1 or y1 >= fy2 or y2 <= fy1:
+                kept.append(rect)
+                continue
+            if x1 > fx1:
+                split.add((fx1, fy1, x1, fy2))
+            if x2 < fx2:
+                split.add((x2, fy1, fx2, fy2))
+            if y1 > fy1:
+                split.add((fx1, fy1, fx2, y1))
+            if y2 < fy2:
+                split.add((fx1, y2, fx2, fy2))
+
+        # No kept rectangle is contained in another, nor in any new
+        # rectangle (which are all within some previous free rectangle), so
+        # only the new rectangles need to be checked.
+        free_rects = list(kept)
+        for rect in split:
+            if not _contained(rect, kept) and not _contained(rect, split):
+                free_rects.append(rect)
+        self.free_rects = free_rects
+
+    def dealloc(self, x, y, width, height):
+        '''Free an area previously returned by `alloc`.
+
+        The area is merged with the free rectangles it adjoins.  The result
+        is not always the maximal set of free rectangles, so some space may
+        not be reusable until neighbouring areas are freed too.
+
+        :Parameters:
+            `x` : int
+                X coordinate of the area, as returned by `alloc`.
+            `y` : int
+                Y coordinate of the area, as returned by `alloc`.
+            `width` : int
+                Width of the area.
+            `height` : int
+                Height of the area.
+
+        :since: pyglet 1.2
+        '''
+        self.used_area -= width * height
+        if not self.used_area:
+            self.free_rects = [(0, 0, self.width, self.height)]
+            return
+
+        # Grow the area over free rectangles spanning its full height or
+        # width.
+        x1, y1, x2, y2 = x, y, x + width, y + height
+        grown = True
+        while grown:
+            grown = False
+            for fx1, fy1, fx2, fy2 in self.free_rects:
+                if (fy1 <= y1 and fy2 >= y2 and fx1 <= x2 and fx2 >= x1 and
+                    (fx1 < x1 or fx2 > x2)):
+                    x1 = min(x1, fx1)
+                    x2 = max(x2, fx2)
+                    grown = True
+                if (fx1 <= x1 and fx2 >= x2 and fy1 <= y2 and fy2 >= y1 and
+                    (fy1 < y1 or fy2 > y2)):
+                    y1 = min(y1, fy1)
+                    y2 = max(y2, fy2)
+                    grown = True
+
+        # Extend adjoining free rectangles across the area.
+        added = set([(x1, y1, x2, y2)])
+        for fx1, fy1, fx2, fy2 in self.free_rects:
+            if fy1 >= y1 and fy2 <= y2 and fx1 <= x2 and fx2 >= x1:
+                added.add((min(x1, fx1), fy1, max(x2, fx2), fy2))
+            if fx1 >= x1 and fx2 <= x2 and fy1 <= y2 and fy2 >= y1:
+                added.add((fx1, min(y1, fy1), fx2, max(y2, fy2)))
+
+        free_rects = [rect for rect in self.free_rects
+                      if not _contained(rect, added)]
+        for rect in added:
+            if (not _contained(rect, free_rects) and
+                not _contained(rect, added)):
+                free_rects.append(rect)
+        self.free_rects = free_rects
+
+    def get_usage(self):
+        '''Get the fraction of area already allocated.
+
+        This method is useful for debugging and profiling only.
+
+        :rtype: float
+        '''
+        return self.used_area / float(self.width * self.height)
+
+    def get_fragmentation(self):
+        '''Get the fraction of free area that cannot be allocated as a
+        single rectangle.
+
+        This is 0 when the free area is one rectangle, and approaches 1 as
+        the free area is broken into many small pieces.
+
+        This method is useful for debugging and profiling only.
+
+        :rtype: float
+        '''
+        free_area = self.width * self.height - self.used_area
+        if not free_area:
+            return 0.
+        largest = max([(x2 - x1) * (y2 - y1)
+                       for x1, y1, x2, y2 in self.free_rects])
+        return 1.0 - largest / float(free_area)
+
+def _contained(rect, rects):
+    # Return True if `rect` lies within any other of `rects`; all are given
+    # as (x1, y1, x2, y2).
+    x1, y1, x2, y2 = rect
+    for ox1, oy1, ox2, oy2 in rects:
+        if x1 >= ox1 and y1 >= oy1 and x2 <= ox2 and y2 <= oy2:
+            if (ox1, oy1, ox2, oy2) != rect:
+                return True
+    return False
+
 class TextureAtlas(object):
     '''Collection of images within a texture.
     '''
-    def __init__(self, width=256, height=256):
+    def __init__(self, width=256, height=256, allocator_class=Allocator,
+                 reclaim=False):
         '''Create a texture atlas of the given size.
 
         :Parameters:
@@ -179,42 +446,160 @@ class TextureAtlas(object):
                 Width of the underlying texture.
             `height` : int
                 Height of the underlying texture.
+            `allocator_class` : class
+                Allocator used to place images, `Allocator` or
+                `MaxRectsAllocator`.  **Since:** pyglet 1.2
+            `reclaim` : bool
+                If True, the area of each region is freed when it is
+                garbage collected.  **Since:** pyglet 1.2
 
         '''
+        self.reclaim = reclaim
         self.texture = pyglet.image.Texture.create(
             width, height, pyglet.gl.GL_RGBA, rectangle=True)
-        self.allocator = Allocator(width, height)
+        self.allocator = allocator_class(width, height)
 
-    def add(self, img):
+        # Map weak reference to each region handed out to (key, x, y,
+        # width, height).
+        self._regions = {}
+
+        # Map key to the region handed out for it.
+        self._keys = weakref.WeakValueDictionary()
+
+        # Areas of collected regions without a key, to be freed.
+        self._collected = []
+
+        # Map key to (x, y, width, height) of collected regions with a key,
+        # least recently released first.
+        self._unreferenced = collections.OrderedDict()
+
+    def add(self, img, key=None):
         '''Add an image to the atlas.
 
         This method will fail if the given image cannot be transferred
         directly to a texture (for example, if it is another texture).
         `ImageData` is the usual image type for this method.
 
-        `AllocatorException` will be raised if there is no room in the atlas
-        for the image.
+        If there is no room in the atlas and it reclaims space, unreferenced
+        keyed regions are evicted until there is.  `AllocatorException` will
+        be raised if there is still no room in the atlas for the image.
 
         :Parameters:
             `img` : `AbstractImage`
                 The image to add.
+            `key` : hashable
+                Key to retrieve the region with `get`, including after it
+                is no longer referenced (until it is evicted).
+                **Since:** pyglet 1.2
 
         :rtype: `TextureRegion`
         :return: The region of the atlas containing the newly added image.
         '''
-        
-        x, y = self.allocator.alloc(img.width, img.height)
+        self._free_collected()
+        try:
+            x, y = self.allocator.alloc(img.width, img.height)
+        except AllocatorException:
+            if not self.reclaim:
+                raise
+            x, y = self._evict_for(img.width, img.height)
         self.texture.blit_into(img, x, y, 0)
-        region = self.texture.get_region(x, y, img.width, img.height)
+        return self._track(key, x, y, img.width, img.height)
+
+    def get(self, key):
+        '''Get the region previously added with the given key.
+
+        :Parameters:
+            `key` : hashable
+                Key given to `add`.
+
+        :rtype: `TextureRegion`
+        :return: The region, or None if no image was added with this key or
+            it has been evicted.
+
+        :since: pyglet 1.2
+        '''
+        region = self._keys.get(key)
+        if region is None and key in self._unreferenced:
+            x, y, width, height = self._unreferenced.pop(key)
+            region = self._track(key, x, y, width, height)
         return region
 
+    def remove(self, region):
+        '''Free the area of a region returned by `add` or `get`.
+
+        The region, and any region obtained from it, must not be used
+        afterwards.
+
+        :Parameters:
+            `region` : `TextureRegion`
+                The region to remove.
+
+        :since: pyglet 1.2
+        '''
+        key, x, y, width, height = self._regions.pop(weakref.ref(region))
+        if key is not None and self._keys.get(key) is region:
+            del self._keys[key]
+        self.allocator.dealloc(x, y, width, height)
+
+    def evict_unreferenced(self):
+        '''Free the areas of all regions that are no longer referenced,
+        including those that could be retrieved with `get`.
+
+        This frees keyed regions even if the atlas does not reclaim space,
+        so textures that copied their ``id`` and ``tex_coords`` must no
+        longer be drawn.
+
+        :since: pyglet 1.2
+        '''
+        self._free_collected()
+        while self._unreferenced:
+            key, rect = self._unreferenced.popitem(last=False)
+            self.allocator.dealloc(*rect)
+
+    def _track(self, key, x, y, width, height):
+        region = self.texture.get_region(x, y, width, height)
+        self._regions[weakref.ref(region, self._region_collected)] = \
+            (key, x, y, width, height)
+        if key is not None:
+            self._keys[key] = region
+        return region
+
+    def _region_collected(self, ref):
+        try:
+            key, x, y, width, height = self._regions.pop(ref)
+        except KeyError:
+            # Removed explicitly
+            return
+        if (key is None or key in self._keys or key in self._unreferenced):
+            if self.reclaim:
+                self._collected.append((x, y, width, height))
+        else:
+            self._unreferenced[key] = (x, y, width, height)
+
+    def _free_collected(self):
+        while self._collected:
+            self.allocator.dealloc(*self._collected.pop())
+
+    def _evict_for(self, width, height):
+        # Evict unreferenced regions, least recently released first, until
+        # the given area can be allocated.
+        while self._unreferenced:
+            key, rect = self._unreferenced.popitem(last=False)
+            self.allocator.dealloc(*rect)
+            try:
+                return self.allocator.alloc(width, height)
+            except AllocatorException:
+                pass
+        return self.allocator.alloc(width, height)
+
 class TextureBin(object):
     '''Collection of texture atlases.
 
     `TextureBin` maintains a collection of texture atlases, and creates new
     ones as necessary to accommodate images added to the bin.
     '''
-    def __init__(self, texture_width=256, texture_height=256):
+    def __init__(self, texture_width=256, texture_height=256,
+                 allocator_class=Allocator, reclaim=False):
         '''Create a texture bin for holding atlases of the given size.
 
         :Parameters:
@@ -222,13 +607,21 @@ class TextureBin(object):
                 Width of texture atlases to create.
             `texture_height` : int
                 Height of texture atlases to create.
+            `allocator_class` : class
+                Allocator used by the atlases to place images, `Allocator` or
+                `MaxRectsAllocator`.  **Since:** pyglet 1.2
+            `reclaim` : bool
+                If True, the atlases free the area of each region when it is
+                garbage collected.  **Since:** pyglet 1.2
 
         '''
         self.atlases = []
         self.texture_width = texture_width
         self.texture_height = texture_height
+        self.allocator_class = allocator_class
+        self.reclaim = reclaim
 
-    def add(self, img):
+    def add(self, img, key=None):
         '''Add an image into this texture bin.
 
         This method calls `TextureAtlas.add` for the first atlas that has room
@@ -240,13 +633,16 @@ class TextureBin(object):
         :Parameters:
             `img` : `AbstractImage`
                 The image to add.
+            `key` : hashable
+                Key to retrieve the region with `get`.
+                **Since:** pyglet 1.2
 
         :rtype: `TextureRegion`
         :return: The region of an atlas containing the newly added image.
         '''
         for atlas in list(self.atlases):
             try:
-                return atlas.add(img)
+                return atlas.add(img, key)
             except AllocatorException:
                 # Remove atlases that are no longer useful (this is so their
                 # textures can later be freed if the images inside them get
@@ -254,6 +650,35 @@ class TextureBin(object):
                 if img.width < 64 and img.height < 64:
                     self.atlases.remove(atlas)
 
-        atlas = TextureAtlas(self.texture_width, self.texture_height)
+        atlas = TextureAtlas(self.texture_width, self.texture_height,
+                             self.allocator_class, self.reclaim)
         self.atlases.append(atlas)
-        return atlas.add(img)
+        return atlas.add(img, key)
+
+    def get(self, key):
+        '''Get the region previously added with the given key.
+
+        :Parameters:
+            `key` : hashable
+                Key given to `add`.
+
+        :rtype: `TextureRegion`
+        :return: The region, or None if no image was added with this key or
+            it has been evicted.
+
+        :since: pyglet 1.2
+        '''
+        for atlas in self.atlases:
+            region = atlas.get(key)
+            if region is not None:
+                return region
+        return None
+
+    def evict_unreferenced(self):
+        '''Free the areas of all regions that are no longer referenced in
+        each atlas.
+
+        :since: pyglet 1.2
+        '''
+        for atlas in self.atlases:
+            atlas.evict_unreferenced()
@@ -32,9 +32,22 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # ----------------------------------------------------------------------------
 
-'''DDS texture loader.
+'''DDS texture loader and DXT1/DXT5 encoder.
 
 Reference: http://msdn2.microsoft.com/en-us/library/bb172993.aspx
+
+Images can be compressed ahead of time from the command line; each file is
+written alongside the original with a ``.dds`` extension::
+
+    python -m pyglet.image.codecs.dds [--dxt1 | --dxt5] image.png ...
+
+Without an option, images with any transparency are compressed to DXT5 and
+opaque images to DXT1.  Encoding requires NumPy.
+
+Rows are stored bottom-up, as this module's decoder expects.  Compressed
+textures must have power of 2 dimensions, so other images are padded by
+repeating their edges; the original size is recorded in the header, and
+textures created from the decoded image are regions of that size.
 '''
 
 __docformat__ = 'restructuredtext'
@@ -44,7 +57,7 @@ from ctypes import *
 import struct
 
 from pyglet.gl import *
-from pyglet.image import CompressedImageData
+from pyglet.image import CompressedImageData, _nearest_pow2
 from pyglet.image import codecs
 from pyglet.image.codecs import s3tc
 from pyglet.compat import izip_longest as compat_izip_longest
@@ -52,6 +65,9 @@ from pyglet.compat import izip_longest as compat_izip_longest
 class DDSException(codecs.ImageDecodeException):
     exception_priority = 0
 
+class DDSEncodeException(codecs.ImageEncodeException):
+    pass
+
 # dwFlags of DDSURFACEDESC2
 DDSD_CAPS           = 0x00000001
 DDSD_HEIGHT         = 0x00000002
@@ -151,6 +167,37 @@ _compression_formats = {
     ('DXT5', True):  (GL_COMPRESSED_RGBA_S3TC_DXT5_EXT, s3tc.decode_dxt5),
 }
 
+# Tag in dwReserved1 followed by the width and height of the image before it
+# was padded to power of 2 dimensions.
+_content_size_tag = 'PYGL'
+
+class _PaddedCompressedImageData(CompressedImageData):
+    # Compressed image padded to power of 2 dimensions, whose textures are
+    # regions of the original size.
+    _current_region = None
+    _current_mipmap_region = None
+
+    def __init__(self, content_width, content_height, *args):
+        super(_PaddedCompressedImageData, self).__init__(*args)
+        self.content_width = content_width
+        self.content_height = content_height
+
+    def get_texture(self, rectangle=False, force_rectangle=False):
+        if not self._current_region:
+            texture = super(_PaddedCompressedImageData, self).get_texture(
+                rectangle, force_rectangle)
+            self._current_region = texture.get_region(0, 0,
+                self.content_width, self.content_height)
+        return self._current_region
+
+    def get_mipmapped_texture(self):
+        if not self._current_mipmap_region:
+            texture = super(_PaddedCompressedImageData,
+                            self).get_mipmapped_texture()
+            self._current_mipmap_region = texture.get_region(0, 0,
+                self.content_width, self.content_height)
+        return self._current_mipmap_region
+
 def _check_error():
     e = glGetError()
     if e != 0:
@@ -213,8 +260,15 @@ class DDSImageDecoder(codecs.ImageDecoder):
             w >>= 1
             h >>= 1
 
-        image = CompressedImageData(width, height, format, datas[0],
-            'GL_EXT_texture_compression_s3tc', decoder)
+        args = (width, height, format, datas[0],
+                'GL_EXT_texture_compression_s3tc', decoder)
+        if desc.dwReserved1.startswith(_content_size_tag):
+            content_width, content_height = struct.unpack('<II',
+                desc.dwReserved1[len(_content_size_tag):][:8])
+            image = _PaddedCompressedImageData(content_width, content_height,
+                                               *args)
+        else:
+            image = CompressedImageData(*args)
         level = 0
         for data in datas[1:]:
             level += 1
@@ -222,8 +276,100 @@ class DDSImageDecoder(codecs.ImageDecoder):
 
         return image
 
+class DDSImageEncoder(codecs.ImageEncoder):
+    '''Encoder compressing images to DXT1 or DXT5.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, compression=None):
+        '''Create an encoder.
+
+        :Parameters:
+            `compression` : str
+                ``'DXT1'`` or ``'DXT5'``.  If None, DXT5 is used for images
+                with any transparency and DXT1 otherwise.
+
+        '''
+        self.compression = compression
+
+    def get_file_extensions(self):
+        return ['.dds']
+
+    def encode(self, image, file, filename):
+        if s3tc.numpy is None:
+            raise DDSEncodeException('DDS encoding requires NumPy')
+
+        numpy = s3tc.numpy
+        image = image.get_image_data()
+        content_width = image.width
+        content_height = image.height
+        data = image.get_data('RGBA', content_width * 4)
+
+        compression = self.compression
+        if compression is None:
+            alpha = numpy.frombuffer(data, numpy.uint8)[3::4]
+            if alpha.min() < 255:
+                compression = 'DXT5'
+            else:
+                compression = 'DXT1'
+
+        width = _nearest_pow2(content_width)
+        height = _nearest_pow2(content_height)
+        reserved = ''
+        if width != content_width or height != content_height:
+            pixels = numpy.frombuffer(data, numpy.uint8)
+            pixels = pixels.reshape(content_height, content_width, 4)
+            pixels = numpy.pad(pixels, ((0, height - content_height),
+                                        (0, width - content_width),
+                                        (0, 0)), 'edge')
+            data = pixels.tostring()
+            reserved = _content_size_tag + struct.pack('<II',
+                content_width, content_height)
+
+        if compression == 'DXT1':
+            data = s3tc.encode_dxt1(data, width, height)
+            alpha_mask = 0
+        elif compression == 'DXT5':
+            data = s3tc.encode_dxt5(data, width, height)
+            alpha_mask = 0xff000000
+        else:
+            raise DDSEncodeException(
+                'Unsupported texture compression %s' % compression)
+
+        pixel_format = struct.pack(DDPIXELFORMAT.get_format(),
+            32, DDPF_FOURCC | (alpha_mask and DDPF_ALPHAPIXELS),
+            compression, 0, 0, 0, 0, alpha_mask)
+        header = struct.pack(DDSURFACEDESC2.get_format(),
+            'DDS ', 124,
+            DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT |
+            DDSD_LINEARSIZE,
+            height, width, len(data), 0, 0, reserved, pixel_format,
+            DDSCAPS_TEXTURE, 0, '', 0)
+        file.write(header)
+        file.write(data)
+
 def get_decoders():
     return [DDSImageDecoder()]
 
 def get_encoders():
-    return []
+    return [DDSImageEncoder()]
+
+if __name__ == '__main__':
+    import os
+    import sys
+    import pyglet
+
+    compression = None
+    filenames = sys.argv[1:]
+    if filenames and filenames[0] in ('--dxt1', '--dxt5'):
+        compression = filenames.pop(0)[2:].upper()
+    if not filenames:
+        print 'Usage: %s [--dxt1 | --dxt5] image ...' % sys.argv[0]
+        sys.exit(1)
+
+    encoder = DDSImageEncoder(compression)
+    for filename in filenames:
+        output = os.path.splitext(filename)[0] + '.dds'
+        pyglet.image.load(filename).save(output, encoder=encoder)
+        print '%s -> %s (%d bytes)' % (filename, output,
+                                       os.path.getsize(output))
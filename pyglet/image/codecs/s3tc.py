@@ -33,14 +33,21 @@
 # ----------------------------------------------------------------------------
 # $Id:$
 
-'''Software decoder for S3TC compressed texture (i.e., DDS).
+'''Software decoder and encoder for S3TC compressed texture (i.e., DDS).
 
 http://oss.sgi.com/projects/ogl-sample/registry/EXT/texture_compression_s3tc.txt
+
+The encoder requires NumPy.
 '''
 
 import ctypes
 import re
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from pyglet.gl import *
 from pyglet.gl import gl_info
 from pyglet.image import AbstractImage, Texture
@@ -385,3 +392,144 @@ def decode_dxt5(data, width, height):
         image_offset += pitch * 3 * advance_row + 16
 
     return PackedImageData(width, height, GL_RGBA, GL_UNSIGNED_BYTE, out)
+
+def _get_blocks(data, width, height):
+    # Split tightly packed RGBA data into 4x4 blocks, returning an array of
+    # shape (blocks, 16, 4) of float32, in the order blocks are stored.
+    # Images are padded to a multiple of 4 by repeating the last row and
+    # column.
+    pixels = numpy.frombuffer(data, numpy.uint8, width * height * 4)
+    pixels = pixels.reshape(height, width, 4)
+    padded_width = (width + 3) & ~3
+    padded_height = (height + 3) & ~3
+    if padded_width != width or padded_height != height:
+        pixels = numpy.pad(pixels, ((0, padded_height - height),
+                                    (0, padded_width - width),
+                                    (0, 0)), 'edge')
+    blocks = pixels.reshape(padded_height // 4, 4, padded_width // 4, 4, 4)
+    blocks = blocks.transpose(0, 2, 1, 3, 4).reshape(-1, 16, 4)
+    return blocks.astype(numpy.float32)
+
+def _pack_565(colors):
+    # Quantise (n, 3) colors to 5:6:5, returning the packed values and the
+    # colors they expand to.
+    colors = numpy.clip(numpy.rint(colors), 0, 255).astype(numpy.uint32)
+    r = colors[:, 0] >> 3
+    g = colors[:, 1] >> 2
+    b = colors[:, 2] >> 3
+    packed = r << 11 | g << 5 | b
+    expanded = numpy.column_stack((r << 3 | r >> 2,
+                                   g << 2 | g >> 4,
+                                   b << 3 | b >> 2))
+    return packed, expanded.astype(numpy.float32)
+
+def _encode_color_blocks(blocks):
+    # Encode the RGB components of (n, 16, 4) blocks as DXT1 color blocks in
+    # four-color mode, returning an array of n uint64.
+    colors = blocks[:, :, :3]
+
+    # End points are the extremes of the colors projected onto their
+    # principal axis, found by power iteration on the covariance.
+    mean = colors.mean(axis=1)
+    centered = colors - mean[:, numpy.newaxis]
+    covariance = numpy.einsum('nki,nkj->nij', centered, centered)
+    axis = numpy.ones((len(blocks), 3), numpy.float32)
+    for i in range(4):
+        axis = numpy.einsum('nij,nj->ni', covariance, axis)
+        norm = numpy.sqrt((axis * axis).sum(axis=1))
+        norm[norm == 0] = 1
+        axis /= norm[:, numpy.newaxis]
+    projection = numpy.einsum('nki,ni->nk', centered, axis)
+    low = mean + projection.min(axis=1)[:, numpy.newaxis] * axis
+    high = mean + projection.max(axis=1)[:, numpy.newaxis] * axis
+
+    color0, expanded0 = _pack_565(high)
+    color1, expanded1 = _pack_565(low)
+
+    # Four-color mode requires color0 > color1.
+    swap = color0 < color1
+    color0[swap], color1[swap] = color1[swap], color0[swap]
+    expanded0[swap], expanded1[swap] = expanded1[swap], expanded0[swap]
+
+    palette = numpy.empty((len(blocks), 4, 3), numpy.float32)
+    palette[:, 0] = expanded0
+    palette[:, 1] = expanded1
+    palette[:, 2] = (2 * expanded0 + expanded1) / 3
+    palette[:, 3] = (expanded0 + 2 * expanded1) / 3
+    distance = ((colors[:, :, numpy.newaxis] -
+                 palette[:, numpy.newaxis]) ** 2).sum(axis=3)
+    indices = distance.argmin(axis=2).astype(numpy.uint64)
+
+    # Blocks of a single 5:6:5 color can only use index 0.
+    indices[color0 == color1] = 0
+
+    shifts = numpy.arange(0, 32, 2, dtype=numpy.uint64)
+    bits = (indices << shifts).sum(axis=1, dtype=numpy.uint64)
+    return (color0.astype(numpy.uint64) |
+            color1.astype(numpy.uint64) << numpy.uint64(16) |
+            bits << numpy.uint64(32))
+
+def _encode_alpha_blocks(blocks):
+    # Encode the alpha component of (n, 16, 4) blocks as DXT5 alpha blocks
+    # in eight-alpha mode, returning an array of n uint64.
+    alpha = blocks[:, :, 3]
+    alpha0 = alpha.max(axis=1)
+    alpha1 = alpha.min(axis=1)
+
+    palette = numpy.empty((len(blocks), 8), numpy.float32)
+    palette[:, 0] = alpha0
+    palette[:, 1] = alpha1
+    for i in range(1, 7):
+        palette[:, i + 1] = ((7 - i) * alpha0 + i * alpha1) // 7
+    distance = abs(alpha[:, :, numpy.newaxis] - palette[:, numpy.newaxis])
+    indices = distance.argmin(axis=2).astype(numpy.uint64)
+    indices[alpha0 == alpha1] = 0
+
+    shifts = numpy.arange(0, 48, 3, dtype=numpy.uint64)
+    bits = (indices << shifts).sum(axis=1, dtype=numpy.uint64)
+    return (alpha0.astype(numpy.uint64) |
+            alpha1.astype(numpy.uint64) << numpy.uint64(8) |
+            bits << numpy.uint64(16))
+
+def encode_dxt1(data, width, height):
+    '''Compress RGBA image data to opaque DXT1.
+
+    :Parameters:
+        `data` : str
+            Tightly packed RGBA data, bottom row first.  Alpha is ignored.
+        `width` : int
+            Width of the image.
+        `height` : int
+            Height of the image.
+
+    :rtype: str
+    :return: The compressed blocks, bottom row of blocks first, as pyglet's
+        DDS decoder expects.
+
+    :since: pyglet 1.2
+    '''
+    blocks = _get_blocks(data, width, height)
+    return _encode_color_blocks(blocks).astype('<u8').tostring()
+
+def encode_dxt5(data, width, height):
+    '''Compress RGBA image data to DXT5.
+
+    :Parameters:
+        `data` : str
+            Tightly packed RGBA data, bottom row first.
+        `width` : int
+            Width of the image.
+        `height` : int
+            Height of the image.
+
+    :rtype: str
+    :return: The compressed blocks, bottom row of blocks first, as pyglet's
+        DDS decoder expects.
+
+    :since: pyglet 1.2
+    '''
+    blocks = _get_blocks(data, width, height)
+    encoded = numpy.empty((len(blocks), 2), '<u8')
+    encoded[:, 0] = _encode_alpha_blocks(blocks)
+    encoded[:, 1] = _encode_color_blocks(blocks)
+    return encoded.tostring()
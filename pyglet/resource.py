@@ -73,27 +73,104 @@ script home.  Some examples::
     # by the `res/images` directory.
     path = ['@levels.level1', 'res/images']
 
+Directories on the path are not searched up front.  Each directory is listed
+the first time a resource within it is requested, so the size of the asset
+tree does not affect startup time.  If a decoded image cache directory is
+set (see below), directory listings are also stored there and reused by
+later runs for as long as the directory's modification time is unchanged.
+
 Paths are always case-sensitive and forward slashes are always used as path
 separators, even in cases when the filesystem or platform does not do this.
 This avoids a common programmer error when porting applications between
-platforms.
+platforms.  Resource names cannot be absolute or contain ``..`` components,
+so they never refer to files outside the path.
 
 The default path is ``['.']``.  If you modify the path, you must call
 `reindex`.
 
+Lazy images
+^^^^^^^^^^^
+
+Applications often load many more images than any one scene draws.  Passing
+``lazy=True`` to `image` returns a `LazyImage` whose dimensions are read
+from the file header; the image is only decoded and uploaded when its
+texture is first needed, for example when a sprite is created with it::
+
+    explosion = pyglet.resource.image('explosion.png', lazy=True)
+    explosion.anchor_x = explosion.width // 2   # Nothing is loaded yet
+
+Preloading
+^^^^^^^^^^
+
+Loading many images one at a time with `image` decodes them serially.
+`preload` takes a list of image names, decodes them on a pool of worker
+threads (or processes) and uploads the results to OpenGL on the calling
+thread, reporting progress as it goes::
+
+    def on_progress(name, loaded, total):
+        loading_label.text = 'Loading %d/%d' % (loaded, total)
+        window.dispatch_events()
+        window.clear()
+        loading_label.draw()
+        window.flip()
+
+    images = pyglet.resource.preload(['player.png', 'invader.png'],
+                                     callback=on_progress)
+
+Later calls to `image` with the same names return the preloaded images for
+as long as they are referenced.
+
+Decoded image cache
+^^^^^^^^^^^^^^^^^^^
+
+Decoding image files can dominate application startup.  If `cache_dir` (or
+`Loader.cache_dir`) is set to a writable directory, images loaded with
+`image` and `texture` are stored there after decoding, already in the
+format and pitch they are uploaded to OpenGL with.  Subsequent runs map the
+cached data into memory and upload it directly, skipping the decoder::
+
+    pyglet.resource.cache_dir = pyglet.resource.get_settings_path('MyGame')
+
+Cache entries are keyed by the source file's path and validated against
+its modification time and size, so modified images are decoded again.
+Images within ZIP archives are cached too; other locations are not.
+
+Compressed textures
+^^^^^^^^^^^^^^^^^^^
+
+S3TC compressed textures use a quarter to an eighth of the video memory of
+uncompressed ones and are uploaded without decoding.  DDS variants of
+images can be created with the converter in `pyglet.image.codecs.dds`::
+
+    python -m pyglet.image.codecs.dds player.png invader.png
+
+If `prefer_compressed` (or `Loader.prefer_compressed`) is True and the
+OpenGL driver supports S3TC, `image` and `texture` load ``player.dds`` in
+place of ``player.png`` whenever it is present in the same location.
+Compressed textures are never placed in a texture atlas.
+
 :since: pyglet 1.1
 '''
 
 __docformat__ = 'restructuredtext'
 __version__ = '$Id: $'
 
+import atexit
+import ctypes
 import os
 import weakref
 import sys
 import zipfile
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.pool
+import mmap
+import struct
+import time
 
 import pyglet
-from pyglet.compat import BytesIO
+from pyglet.compat import BytesIO, asbytes, asstr
 
 class ResourceNotFoundException(Exception):
     '''The named resource was not found on the search path.'''
@@ -258,6 +335,117 @@ class URLLocation(Location):
         url = urlparse.urljoin(self.base, filename)
         return urllib2.urlopen(url)
 
+class LazyImage(object):
+    '''An image that is loaded the first time it is used.
+
+    Returned by `Loader.image` when `lazy` is True.  The width and height
+    are read from the image file's header.  The image is loaded into a
+    texture the first time its texture or image data is requested, it is
+    drawn, or any other texture attribute is accessed.
+
+    Each call to `Loader.image` returns a new `LazyImage`, and each one
+    loads into its own `TextureRegion` of the shared texture, so its
+    anchor is private to it.  Anchor changes made before loading are
+    applied to that region.
+
+    `LazyImage` supports the `AbstractImage` interface, but is not a
+    subclass of it, as this module cannot depend on `pyglet.image` at
+    import time, so ``isinstance(img, AbstractImage)`` is False.  Call
+    `get_texture` where a real image object is required.
+
+    :since: pyglet 1.2
+    '''
+    _image = None
+    _anchor_x = None
+    _anchor_y = None
+
+    def __init__(self, loader, name, width, height,
+                 flip_x=False, flip_y=False, rotate=0, atlas=True):
+        self.width = width
+        self.height = height
+        self._loader = loader
+        self._name = name
+        self._args = (flip_x, flip_y, rotate, atlas)
+
+    def __repr__(self):
+        return '<%s %r %dx%d%s>' % (self.__class__.__name__, self._name,
+            self.width, self.height, self._image and ' (loaded)' or '')
+
+    def _get_image(self):
+        if self._image is None:
+            flip_x, flip_y, rotate, atlas = self._args
+            img = self._loader.image(self._name, flip_x, flip_y, rotate,
+                                     atlas)
+            if not (flip_x or flip_y or rotate):
+                # The untransformed image is shared by every holder of the
+                # name; give this proxy its own region to anchor.
+                img = img.get_region(0, 0, img.width, img.height)
+            if self._anchor_x is not None:
+                img.anchor_x = self._anchor_x
+            if self._anchor_y is not None:
+                img.anchor_y = self._anchor_y
+            self._image = img
+            self._loader = None
+        return self._image
+
+    is_loaded = property(lambda self: self._image is not None,
+        doc='''True if the image has been loaded.  Read-only.
+
+        :type: bool
+        ''')
+
+    def _get_anchor(self, attr):
+        value = getattr(self, '_' + attr)
+        if self._image is None and value is not None:
+            return value
+        if self._image is None and not any(self._args[:3]):
+            return 0
+        # Transformed images have anchors computed when they are loaded.
+        return getattr(self._get_image(), attr)
+
+    def _set_anchor(self, attr, value):
+        setattr(self, '_' + attr, value)
+        if self._image is not None:
+            setattr(self._image, attr, value)
+
+    anchor_x = property(lambda self: self._get_anchor('anchor_x'),
+                        lambda self, value: self._set_anchor('anchor_x', value))
+    anchor_y = property(lambda self: self._get_anchor('anchor_y'),
+                        lambda self, value: self._set_anchor('anchor_y', value))
+
+    def get_image_data(self):
+        return self._get_image().get_image_data()
+
+    def get_texture(self, rectangle=False, force_rectangle=False):
+        return self._get_image().get_texture(rectangle, force_rectangle)
+
+    def get_mipmapped_texture(self):
+        return self._get_image().get_mipmapped_texture()
+
+    def get_region(self, x, y, width, height):
+        return self._get_image().get_region(x, y, width, height)
+
+    def get_transform(self, flip_x=False, flip_y=False, rotate=0):
+        return self._get_image().get_transform(flip_x, flip_y, rotate)
+
+    def save(self, filename=None, file=None, encoder=None):
+        self._get_image().save(filename, file, encoder)
+
+    def blit(self, x, y, z=0, width=None, height=None):
+        self._get_image().blit(x, y, z, width, height)
+
+    def blit_into(self, source, x, y, z):
+        self._get_image().blit_into(source, x, y, z)
+
+    def blit_to_texture(self, target, level, x, y, z=0):
+        self._get_image().blit_to_texture(target, level, x, y, z)
+
+    def __getattr__(self, name):
+        # Forward texture attributes such as id, target and tex_coords.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._get_image(), name)
+
 class Loader(object):
     '''Load program resource files from disk.
 
@@ -271,9 +459,21 @@ class Loader(object):
         `script_home` : str
             Base resource location, defaulting to the location of the
             application script.
+        `cache_dir` : str
+            Directory to store decoded images in, or None to disable the
+            decoded image cache.  See the module documentation.
+
+            **Since:** pyglet 1.2
+        `prefer_compressed` : bool
+            If True, images are loaded from a DDS file of the same name when
+            one is present and S3TC is supported.  See the module
+            documentation.
+
+            **Since:** pyglet 1.2
 
     '''
-    def __init__(self, path=None, script_home=None):
+    def __init__(self, path=None, script_home=None, cache_dir=None,
+                 prefer_compressed=False):
         '''Create a loader for the given path.
 
         If no path is specified it defaults to ``['.']``; that is, just the
@@ -287,6 +487,12 @@ class Loader(object):
             `script_home` : str
                 Base location of relative files.  Defaults to the result of
                 `get_script_home`.
+            `cache_dir` : str
+                Directory to store decoded images in.  Defaults to None,
+                disabling the decoded image cache.
+            `prefer_compressed` : bool
+                If True, load compressed DDS variants of images when
+                available.
 
         '''
         if path is None:
@@ -298,6 +504,11 @@ class Loader(object):
             script_home = get_script_home()
         self._script_home = script_home
         self._index = None
+        self._stored_index = None
+        self._stored_index_changes = {}
+        self._store_index_registered = False
+        self.cache_dir = cache_dir
+        self.prefer_compressed = prefer_compressed
 
         # Map bin size to list of atlases
         self._texture_atlas_bins = {}
@@ -316,8 +527,20 @@ class Loader(object):
         self._cached_textures = weakref.WeakValueDictionary()
         self._cached_images = weakref.WeakValueDictionary()
         self._cached_animations = weakref.WeakValueDictionary()
+        self._lazy_image_sizes = {}
 
+        # Map name to location, filled in as names are looked up.
         self._index = {}
+
+        # List of (location, names) in search order.  names is the set of
+        # file names within a ZIP location, or None for a directory, which
+        # is listed on demand by _list_directory.
+        self._locations = []
+
+        # Map directory to set of names in that directory, for directories
+        # listed (or validated against the stored index) since reindexing.
+        self._directories = {}
+
         for path in self.path:
             if path.startswith('@'):
                 # Module
@@ -344,19 +567,7 @@ class Loader(object):
             if os.path.isdir(path):
                 # Filesystem directory
                 path = path.rstrip(os.path.sep)
-                location = FileLocation(path)
-                for dirpath, dirnames, filenames in os.walk(path):
-                    dirpath = dirpath[len(path) + 1:]
-                    # Force forward slashes for index
-                    if dirpath:
-                        parts = filter(None, dirpath.split(os.sep))
-                        dirpath = '/'.join(parts)
-                    for filename in filenames:
-                        if dirpath:
-                            index_name = dirpath + '/' + filename
-                        else:
-                            index_name = filename
-                        self._index_file(index_name, location)
+                self._locations.append((FileLocation(path), None))
             else:
                 # Find path component that is the ZIP file.
                 dir = ''
@@ -375,6 +586,7 @@ class Loader(object):
                 if path and zipfile.is_zipfile(path):
                     zip = zipfile.ZipFile(path, 'r')
                     location = ZIPLocation(zip, dir)
+                    names = set()
                     for zip_name in zip.namelist():
                         #zip_name_dir, zip_name = os.path.split(zip_name)
                         #assert '\\' not in name_dir
@@ -382,11 +594,89 @@ class Loader(object):
                         if zip_name.startswith(dir):
                             if dir:
                                 zip_name = zip_name[len(dir)+1:]
-                            self._index_file(zip_name, location)
+                            names.add(zip_name)
+                    self._locations.append((location, names))
+
+    def _list_directory(self, path):
+        # Return the set of names in a directory, using the stored index if
+        # the directory has not been modified since it was stored.
+        try:
+            return self._directories[path]
+        except KeyError:
+            pass
 
-    def _index_file(self, name, location):
-        if name not in self._index:
-            self._index[name] = location
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            names = frozenset()
+        else:
+            stored = self._get_stored_index()
+            if path in stored and stored[path][0] == mtime:
+                names = stored[path][1]
+            else:
+                try:
+                    names = frozenset(os.listdir(path))
+                except OSError:
+                    names = frozenset()
+                if self.cache_dir:
+                    stored[path] = self._stored_index_changes[path] = \
+                        (mtime, names)
+                    self._store_index_at_exit()
+        self._directories[path] = names
+        return names
+
+    def _get_stored_index(self):
+        # Map directory to (mtime, names) stored by previous runs.
+        if self._stored_index is None:
+            self._stored_index = self._read_stored_index()
+        return self._stored_index
+
+    def _read_stored_index(self):
+        if self.cache_dir:
+            try:
+                file = open(os.path.join(self.cache_dir, 'index.json'), 'rb')
+                try:
+                    return _load_index(file)
+                finally:
+                    file.close()
+            except Exception:
+                pass
+        return {}
+
+    def _store_index_at_exit(self):
+        if not self._store_index_registered:
+            self._store_index_registered = True
+            atexit.register(self._store_index)
+
+    def _store_index(self):
+        # The index file is shared by every loader using the cache
+        # directory, so only the directories listed by this loader are
+        # replaced in it.
+        self._store_index_registered = False
+        if not self.cache_dir or not self._stored_index_changes:
+            return
+        index = self._read_stored_index()
+        index.update(self._stored_index_changes)
+        self._stored_index_changes = {}
+        filename = os.path.join(self.cache_dir, 'index.json')
+        temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            file = open(temp_filename, 'wb')
+            try:
+                _dump_index(index, file)
+            finally:
+                file.close()
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(temp_filename, filename)
+        except (EnvironmentError, ValueError):
+            # ValueError is raised for names that are not valid UTF-8.
+            try:
+                os.remove(temp_filename)
+            except EnvironmentError:
+                pass
 
     def file(self, name, mode='rb'):
         '''Load a resource.
@@ -400,12 +690,7 @@ class Loader(object):
 
         :rtype: file object
         '''
-        self._require_index()
-        try:
-            location = self._index[name]
-            return location.open(name, mode)
-        except KeyError:
-            raise ResourceNotFoundException(name)
+        return self.location(name).open(name, mode)
 
     def location(self, name):
         '''Get the location of a resource.
@@ -425,8 +710,28 @@ class Loader(object):
         try:
             return self._index[name]
         except KeyError:
+            pass
+
+        if not _is_relative_name(name):
+            raise ResourceNotFoundException(name)
+
+        dirname, _, filename = name.rpartition('/')
+        for location, names in self._locations:
+            if names is None:
+                dirpath = location.path
+                if dirname:
+                    dirpath = os.path.join(dirpath, *dirname.split('/'))
+                if (filename in self._list_directory(dirpath) and
+                    os.path.isfile(os.path.join(dirpath, filename))):
+                    break
+            elif name in names:
+                break
+        else:
             raise ResourceNotFoundException(name)
 
+        self._index[name] = location
+        return location
+
     def add_font(self, name):
         '''Add a font resource to the application.
 
@@ -448,14 +753,88 @@ class Loader(object):
         file = self.file(name)
         font.add_file(file)
 
-    def _alloc_image(self, name, atlas=True):
+    def _load_image(self, name):
+        variant = self._get_compressed_variant(name)
+        if variant:
+            file = self.file(variant)
+            try:
+                return pyglet.image.load(variant, file=file)
+            finally:
+                file.close()
+
+        source = self._get_cache_source(name)
+        if source:
+            img = _read_cached_image(self.cache_dir, *source)
+            if img:
+                return img
+
+        file = self.file(name)
         try:
-            file = self.file(name)
             img = pyglet.image.load(name, file=file)
         finally:
             file.close()
 
-        if not atlas:
+        if source and isinstance(img, pyglet.image.ImageData):
+            _write_cached_image(self.cache_dir, img, *source)
+        return img
+
+    def _get_compressed_variant(self, name):
+        # Return the name of the DDS variant of an image resource, or None
+        # if compressed variants are not preferred, not supported or not
+        # present in the same location.
+        if not self.prefer_compressed:
+            return None
+
+        base, ext = os.path.splitext(name)
+        if ext.lower() == '.dds':
+            return None
+
+        from pyglet.gl import gl_info
+        if not gl_info.have_extension('GL_EXT_texture_compression_s3tc'):
+            return None
+
+        variant = base + '.dds'
+        try:
+            if self.location(variant) is not self.location(name):
+                return None
+        except ResourceNotFoundException:
+            return None
+        return variant
+
+    def _get_cache_source(self, name):
+        # Return (path, mtime, size) identifying the source file of a
+        # resource for the decoded image cache, or None if the resource
+        # cannot be cached.
+        if not self.cache_dir:
+            return None
+
+        location = self.location(name)
+        if isinstance(location, FileLocation):
+            path = os.path.join(location.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            return os.path.abspath(path), stat.st_mtime, stat.st_size
+        elif isinstance(location, ZIPLocation):
+            if location.dir:
+                zip_name = location.dir + '/' + name
+            else:
+                zip_name = name
+            try:
+                info = location.zip.getinfo(zip_name)
+            except KeyError:
+                return None
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            path = os.path.abspath(location.zip.filename) + '/' + zip_name
+            return path, mtime, info.file_size
+        return None
+
+    def _alloc_image(self, name, atlas=True):
+        return self._upload_image(self._load_image(name), atlas)
+
+    def _upload_image(self, img, atlas=True):
+        if not atlas or isinstance(img, pyglet.image.CompressedImageData):
             return img.get_texture(True)
 
         # find an atlas suitable for the image
@@ -488,13 +867,19 @@ class Loader(object):
 
         return bin
 
-    def image(self, name, flip_x=False, flip_y=False, rotate=0, atlas=True):
+    def image(self, name, flip_x=False, flip_y=False, rotate=0, atlas=True,
+              lazy=False):
         '''Load an image with optional transformation.
 
         This is similar to `texture`, except the resulting image will be
         packed into a `TextureBin` if it is an appropriate size for packing.
         This is more efficient than loading images into separate textures.
 
+        If `lazy` is True and the image has not been loaded yet, a
+        `LazyImage` is returned instead, which loads the image when it is
+        first used.  Only PNG, GIF, BMP and JPEG files can be loaded lazily;
+        other formats are loaded immediately.
+
         :Parameters:
             `name` : str
                 Filename of the image source to load.
@@ -510,12 +895,22 @@ class Loader(object):
                 pyglet. If atlas loading is not appropriate for specific
                 texturing reasons (e.g. border control is required) then set
                 this argument to False.
+            `lazy` : bool
+                If True, defer loading the image until it is used.
+
+                **Since:** pyglet 1.2
 
         :rtype: `Texture`
         :return: A complete texture if the image is large or not in an atlas,
-            otherwise a `TextureRegion` of a texture atlas.
+            otherwise a `TextureRegion` of a texture atlas.  A `LazyImage`
+            if `lazy` is True and the image is not yet loaded.
         '''
         self._require_index()
+        if lazy and name not in self._cached_images:
+            img = self._lazy_image(name, flip_x, flip_y, rotate, atlas)
+            if img:
+                return img
+
         if name in self._cached_images:
             identity = self._cached_images[name]
         else:
@@ -527,6 +922,127 @@ class Loader(object):
 
         return identity.get_transform(flip_x, flip_y, rotate)
 
+    def _lazy_image(self, name, flip_x, flip_y, rotate, atlas):
+        if name in self._lazy_image_sizes:
+            size = self._lazy_image_sizes[name]
+        else:
+            file = self.file(name)
+            try:
+                size = _read_image_size(file)
+            finally:
+                file.close()
+            self._lazy_image_sizes[name] = size
+        if not size:
+            return None
+
+        width, height = size
+        if rotate % 180:
+            width, height = height, width
+        return LazyImage(self, name, width, height,
+                         flip_x, flip_y, rotate, atlas)
+
+    def preload(self, names, callback=None, workers=None, processes=False,
+                atlas=True):
+        '''Load several images, decoding them in parallel.
+
+        Image files are read and uploaded to OpenGL on the calling thread;
+        decoding, which is usually the most expensive step, is done on a
+        pool of workers.  Images found in the decoded image cache are not
+        decoded again, and compressed variants (see `prefer_compressed`)
+        are loaded on the calling thread.
+
+        The loaded images are cached as for `image`, so later calls to
+        `image` with the same names return them without loading.  As with
+        `image`, the cache does not keep the images alive; keep a
+        reference to the returned list for as long as they are needed.
+
+        :Parameters:
+            `names` : sequence of str
+                Filenames of the image sources to load.
+            `callback` : callable
+                Function called on the calling thread after each image is
+                loaded, as ``callback(name, loaded, total)``, where `loaded`
+                is the number of images loaded so far.  Can be used to
+                update a loading screen.
+            `workers` : int
+                Number of workers to decode with.  Defaults to the number of
+                CPUs.
+            `processes` : bool
+                If True, decode in worker processes rather than threads.
+                This avoids contention for the global interpreter lock in
+                pure-Python decoders, but requires the decoded data to be
+                copied back to this process.
+            `atlas` : bool
+                As for `image`.
+
+        :rtype: list of `Texture`
+        :return: The images, in the same order as `names`.
+
+        :since: pyglet 1.2
+        '''
+        self._require_index()
+        names = list(names)
+        total = len(set(names))
+        images = {}
+
+        def loaded(name, img):
+            images[name] = self._cached_images[name] = \
+                self._upload_image(img, atlas)
+            if callback:
+                callback(name, len(images), total)
+
+        # Read undecoded files here, so the workers need no access to the
+        # loader and files within ZIP archives are read from one thread.
+        pending = []
+        sources = {}
+        for name in names:
+            if name in images or name in sources:
+                continue
+            if name in self._cached_images:
+                images[name] = self._cached_images[name]
+                if callback:
+                    callback(name, len(images), total)
+                continue
+
+            if self._get_compressed_variant(name):
+                loaded(name, self._load_image(name))
+                continue
+
+            source = self._get_cache_source(name)
+            if source:
+                img = _read_cached_image(self.cache_dir, *source)
+                if img:
+                    loaded(name, img)
+                    continue
+
+            file = self.file(name)
+            try:
+                data = file.read()
+            finally:
+                file.close()
+            sources[name] = source
+            pending.append((name, data))
+
+        if pending:
+            if not workers:
+                workers = multiprocessing.cpu_count()
+            workers = min(workers, len(pending))
+            if processes:
+                pool = multiprocessing.Pool(workers)
+            else:
+                pool = multiprocessing.pool.ThreadPool(workers)
+            try:
+                for name, img in pool.imap_unordered(_decode_image, pending):
+                    source = sources[name]
+                    if source and isinstance(img, pyglet.image.ImageData):
+                        _write_cached_image(self.cache_dir, img, *source)
+                    loaded(name, img)
+            finally:
+                pool.terminate()
+                pool.join()
+
+        return [images[name] for name in names]
+
     def animation(self, name, flip_x=False, flip_y=False, rotate=0):
         '''Load an animation with optional transformation.
 
@@ -612,20 +1128,16 @@ class Loader(object):
 
         :rtype: `media.Source`
         '''
-        self._require_index()
         from pyglet import media
-        try:
-            location = self._index[name]
-            if isinstance(location, FileLocation):
-                # Don't open the file if it's streamed from disk -- AVbin
-                # needs to do it.
-                path = os.path.join(location.path, name)
-                return media.load(path, streaming=streaming)
-            else:
-                file = location.open(name)
-                return media.load(name, file=file, streaming=streaming)
-        except KeyError:
-            raise ResourceNotFoundException(name)
+        location = self.location(name)
+        if isinstance(location, FileLocation):
+            # Don't open the file if it's streamed from disk -- AVbin
+            # needs to do it.
+            path = os.path.join(location.path, name)
+            return media.load(path, streaming=streaming)
+        else:
+            file = location.open(name)
+            return media.load(name, file=file, streaming=streaming)
 
     def texture(self, name):
         '''Load a texture.
@@ -644,8 +1156,7 @@ class Loader(object):
         if name in self._cached_textures:
             return self._cached_textures[name]
 
-        file = self.file(name)
-        texture = pyglet.image.load(name, file=file).get_texture()
+        texture = self._load_image(name).get_texture()
         self._cached_textures[name] = texture
         return texture
 
@@ -698,6 +1209,165 @@ class Loader(object):
         self._require_index()
         return self._cached_textures.keys()
 
+def _is_relative_name(name):
+    # Return True if a resource name only refers to files within the
+    # locations it is looked up in: it must not be absolute, name a drive or
+    # contain empty, "." or ".." components or platform path separators.
+    for part in name.split('/'):
+        if part in ('', '.', '..'):
+            return False
+        if os.sep in part or (os.altsep and os.altsep in part):
+            return False
+        if os.path.isabs(part) or os.path.splitdrive(part)[0]:
+            return False
+    return True
+
+def _dump_index(index, file):
+    # Write a stored directory index, mapping directory to (mtime, names),
+    # as JSON.  The index is read back on later runs, so it must not be in a
+    # format that can execute code, such as a pickle.
+    data = dict((path, (mtime, sorted(names)))
+                for path, (mtime, names) in index.items())
+    file.write(asbytes(json.dumps(data)))
+
+def _load_index(file):
+    # Read a directory index written by _dump_index, raising an exception
+    # if it is malformed.
+    data = json.loads(asstr(file.read()))
+    index = {}
+    for path, (mtime, names) in data.items():
+        if str is bytes:
+            # Names were listed as byte strings on Python 2.
+            path = path.encode('utf-8')
+            names = [name.encode('utf-8') for name in names]
+        index[path] = (float(mtime), frozenset(names))
+    return index
+
+def _read_image_size(file):
+    # Return the (width, height) of an image from its file header, or None
+    # if the format is not recognised.
+    data = file.read(26)
+    if (data[:8] == asbytes('\x89PNG\r\n\x1a\n') and
+        data[12:16] == asbytes('IHDR')):
+        return struct.unpack('>II', data[16:24])
+    elif data[:6] in (asbytes('GIF87a'), asbytes('GIF89a')):
+        return struct.unpack('<HH', data[6:10])
+    elif data[:2] == asbytes('BM') and len(data) == 26:
+        if struct.unpack('<I', data[14:18])[0] == 12:
+            # OS/2 bitmap core header
+            return struct.unpack('<HH', data[18:22])
+        width, height = struct.unpack('<ii', data[18:26])
+        return width, abs(height)
+    elif data[:2] == asbytes('\xff\xd8'):
+        # Walk the JPEG segments up to the start of frame.
+        offset = 2
+        while True:
+            while len(data) < offset + 9:
+                more = file.read(4096)
+                if not more:
+                    return None
+                data += more
+            marker = ord(data[offset + 1:offset + 2])
+            if data[offset:offset + 1] != asbytes('\xff'):
+                return None
+            elif marker == 0xff:
+                # Fill byte
+                offset += 1
+            elif (0xc0 <= marker <= 0xcf and
+                  marker not in (0xc4, 0xc8, 0xcc)):
+                height, width = struct.unpack('>HH',
+                                              data[offset + 5:offset + 9])
+                return width, height
+            elif marker in (0xd9, 0xda):
+                return None
+            elif 0xd0 <= marker <= 0xd7 or marker == 0x01:
+                offset += 2
+            else:
+                offset += 2 + struct.unpack('>H',
+                                            data[offset + 2:offset + 4])[0]
+    return None
+
+def _decode_image(args):
+    # Decode an image from the contents of its file; run by preload workers.
+    name, data = args
+    return name, pyglet.image.load(name, file=BytesIO(data))
+
+# Header of a decoded image cache file: magic, source modification time,
+# source size, width, height, pitch and format.  The image data follows.
+_cache_header = struct.Struct('<8sdQIIi8s')
+_cache_magic = asbytes('pygimg01')
+
+def _get_cache_filename(cache_dir, path):
+    return os.path.join(cache_dir,
+                        hashlib.md5(path.encode('utf-8')).hexdigest() + '.img')
+
+def _read_cached_image(cache_dir, path, mtime, size):
+    # Return an ImageData whose data is mapped from the cache file for `path`,
+    # or None if there is no valid cache entry.
+    try:
+        file = open(_get_cache_filename(cache_dir, path), 'rb')
+    except IOError:
+        return None
+
+    try:
+        header = file.read(_cache_header.size)
+        if len(header) != _cache_header.size:
+            return None
+        magic, cached_mtime, cached_size, width, height, pitch, format = \
+            _cache_header.unpack(header)
+        if (magic != _cache_magic or
+            cached_mtime != mtime or cached_size != size):
+            return None
+
+        # Map the file copy-on-write so the data can be handed to OpenGL as
+        # a ctypes array without copying it.
+        length = abs(pitch) * height
+        try:
+            data = mmap.mmap(file.fileno(), _cache_header.size + length,
+                             access=mmap.ACCESS_COPY)
+        except (EnvironmentError, ValueError):
+            return None
+        data = (ctypes.c_ubyte * length).from_buffer(data, _cache_header.size)
+    finally:
+        file.close()
+
+    return pyglet.image.ImageData(width, height, asstr(format.rstrip(asbytes('\0'))), data,
+                                  pitch)
+
+def _write_cached_image(cache_dir, img, path, mtime, size):
+    # Store image data in the format and pitch it will be uploaded with.
+    # Failure to write the cache is not an error.
+    format = {
+        1: 'L',
+        2: 'LA',
+        3: 'RGB',
+        4: 'RGBA'}.get(len(img.format))
+    if not format:
+        return
+    pitch = img.width * len(format)
+    data = img.get_data(format, pitch)
+
+    filename = _get_cache_filename(cache_dir, path)
+    temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        file = open(temp_filename, 'wb')
+        try:
+            file.write(_cache_header.pack(_cache_magic, mtime, size,
+                img.width, img.height, pitch, asbytes(format)))
+            file.write(data)
+        finally:
+            file.close()
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(temp_filename, filename)
+    except EnvironmentError:
+        try:
+            os.remove(temp_filename)
+        except EnvironmentError:
+            pass
+
 #: Default resource search path.
 #:
 #: Locations in the search path are searched in order and are always
@@ -708,6 +1378,23 @@ class Loader(object):
 #: :type: list of str
 path = []
 
+#: Directory to store decoded images in, or None to disable the decoded image
+#: cache.
+#:
+#: See the module documentation for details.
+#:
+#: :type: str
+#: :since: pyglet 1.2
+cache_dir = None
+
+#: If True, images are loaded from compressed DDS variants when available.
+#:
+#: See the module documentation for details.
+#:
+#: :type: bool
+#: :since: pyglet 1.2
+prefer_compressed = False
+
 class _DefaultLoader(Loader):
     def _get_path(self):
         return path
@@ -718,12 +1405,32 @@ class _DefaultLoader(Loader):
 
     path = property(_get_path, _set_path)
 
+    def _get_cache_dir(self):
+        return cache_dir
+
+    def _set_cache_dir(self, value):
+        global cache_dir
+        cache_dir = value
+
+    cache_dir = property(_get_cache_dir, _set_cache_dir)
+
+    def _get_prefer_compressed(self):
+        return prefer_compressed
+
+    def _set_prefer_compressed(self, value):
+        global prefer_compressed
+        prefer_compressed = value
+
+    prefer_compressed = property(_get_prefer_compressed,
+                                 _set_prefer_compressed)
+
 _default_loader = _DefaultLoader()
 reindex = _default_loader.reindex
 file = _default_loader.file
 location = _default_loader.location
 add_font = _default_loader.add_font
 image = _default_loader.image
+preload = _default_loader.preload
 animation = _default_loader.animation
 get_cached_image_names = _default_loader.get_cached_image_names
 get_cached_animation_names = _default_loader.get_cached_animation_names
@@ -92,28 +92,79 @@ however a sprite can belong to at most one batch.  See the documentation for
 `pyglet.graphics` for more details on batched rendering, and grouping of
 sprites within batches.
 
+Many sprites
+============
+
+`CompactSprite` behaves like `Sprite` but has no instance dictionary and
+does not dispatch events, using considerably less memory per sprite.
+
+Moving many sprites at once
+---------------------------
+
+Setting ``x``, ``y``, ``rotation`` or ``scale`` recomputes that sprite's
+vertices immediately.  To move a large number of sprites every frame, wrap
+them in a `SpriteArray` and set all their transforms in one call; when NumPy
+is available the vertices are computed together and written directly into
+the vertex buffers::
+
+    balls = pyglet.sprite.SpriteArray(ball_sprites)
+    balls.set_transforms(x=xs, y=ys, rotation=angles)
+
+Instanced sprites
+-----------------
+
+Each `Sprite` owns four vertices with position, colour and texture
+coordinates, all of which are recomputed in Python when the sprite moves.
+For very large numbers of sprites sharing one texture (or texture atlas), an
+`InstancedSpriteBatch` stores a single compact record per sprite instead, and
+draws all of them with one instanced draw call, transforming a shared unit
+quad on the GPU::
+
+    batch = pyglet.sprite.InstancedSpriteBatch(ball_image.get_texture())
+    balls = [batch.add(ball_image, x=i * 10, y=50) for i in range(10000)]
+
+    @window.event
+    def on_draw():
+        batch.draw()
+
+`InstancedSprite` supports the same position, rotation, scale, opacity and
+colour properties as `Sprite`.  Instanced drawing requires OpenGL 3.3 or the
+``GL_ARB_instanced_arrays`` and ``GL_ARB_draw_instanced`` extensions;
+with only OpenGL 2.0 the batch falls back to one draw call per sprite, which
+is correct but slower than using `Sprite` in a `pyglet.graphics.Batch`.
+
 :since: pyglet 1.1
 '''
 
 __docformat__ = 'restructuredtext'
 __version__ = '$Id$'
 
+import ctypes
+from itertools import izip
 import math
 import sys
+import weakref
 
 from pyglet.gl import *
 from pyglet import clock
 from pyglet import event
 from pyglet import graphics
 from pyglet import image
+from pyglet.graphics import vertexbuffer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 _is_epydoc = hasattr(sys, 'is_epydoc') and sys.is_epydoc
 
 class SpriteGroup(graphics.Group):
     '''Shared sprite rendering group.
 
-    The group is automatically coalesced with other sprite groups sharing the
-    same parent group, texture and blend parameters.
+    Sprites share one group object for each combination of parent group,
+    texture and blend parameters; the group is also coalesced with any other
+    sprite group with the same state.
     '''
     def __init__(self, texture, blend_src, blend_dest, parent=None):
         '''Create a sprite group.
@@ -138,6 +189,8 @@ class SpriteGroup(graphics.Group):
         self.texture = texture
         self.blend_src = blend_src
         self.blend_dest = blend_dest
+        self._hash = hash((id(parent), texture.id, texture.target,
+                           blend_src, blend_dest))
 
     def set_state(self):
         glEnable(self.texture.target)
@@ -151,6 +204,28 @@ class SpriteGroup(graphics.Group):
         glPopAttrib()
         glDisable(self.texture.target)
 
+    def _bind_texture(self):
+        glBindTexture(self.texture.target, self.texture.id)
+
+    def _bind_texture_and_blend(self):
+        glBindTexture(self.texture.target, self.texture.id)
+        glBlendFunc(self.blend_src, self.blend_dest)
+
+    def get_transition(self, previous):
+        # The previous group enabled the same target and blending, and
+        # pushed the color buffer state that unset_state pops.
+        if (previous.__class__ is not self.__class__ or
+            previous.texture.target != self.texture.target):
+            return None
+        if (previous.blend_src == self.blend_src and
+            previous.blend_dest == self.blend_dest):
+            return self._bind_texture
+        return self._bind_texture_and_blend
+
+    state_key = property(
+        lambda self: (self.texture.target, self.texture.id,
+                      self.blend_src, self.blend_dest))
+
     def __repr__(self):
         return '%s(%r)' % (self.__class__.__name__, self.texture)
 
@@ -163,23 +238,28 @@ class SpriteGroup(graphics.Group):
                 self.blend_dest == other.blend_dest)
 
     def __hash__(self):
-        return hash((id(self.parent),
-                     self.texture.id, self.texture.target,
-                     self.blend_src, self.blend_dest))
-
-class Sprite(event.EventDispatcher):
-    '''Instance of an on-screen image.
-
-    See the module documentation for usage.
-    '''
-    _batch = None
-    _animation = None
-    _rotation = 0
-    _opacity = 255
-    _rgb = (255, 255, 255)
-    _scale = 1.0
-    _visible = True
-    _vertex_list = None
+        return self._hash
+
+_sprite_groups = weakref.WeakValueDictionary()
+
+def _get_sprite_group(texture, blend_src, blend_dest, parent):
+    # Return the shared SpriteGroup for the given state, creating it if
+    # no live sprite uses it.  Sharing groups saves an allocation per sprite
+    # and lets batches find the group's domains by identity.  The key holds
+    # ids so that the cache does not keep parent groups alive, so a cached
+    # group is checked to have the same parent object rather than trusting
+    # the id.
+    key = (texture.id, texture.target, blend_src, blend_dest, id(parent))
+    group = _sprite_groups.get(key)
+    if group is None or group.parent is not parent:
+        group = SpriteGroup(texture, blend_src, blend_dest, parent)
+        _sprite_groups[key] = group
+    return group
+
+class _BaseSprite(object):
+    # Implementation shared by Sprite and CompactSprite.  Subclasses provide
+    # the attribute storage and _animation_end.
+    __slots__ = ()
 
     def __init__(self,
                  img, x=0, y=0,
@@ -233,7 +313,8 @@ class Sprite(event.EventDispatcher):
         else:
             self._texture = img.get_texture()
 
-        self._group = SpriteGroup(self._texture, blend_src, blend_dest, group)
+        self._group = _get_sprite_group(self._texture,
+                                       blend_src, blend_dest, group)
         self._usage = usage
         self._subpixel = subpixel
         self._create_vertex_list()
@@ -265,12 +346,19 @@ class Sprite(event.EventDispatcher):
         self._frame_index += 1
         if self._frame_index >= len(self._animation.frames):
             self._frame_index = 0
-            self.dispatch_event('on_animation_end')
+            self._animation_end()
             if self._vertex_list is None:
                 return # Deleted in event handler.
 
         frame = self._animation.frames[self._frame_index]
-        self._set_texture(frame.image.get_texture())
+        texture = frame.image.get_texture()
+        previous = self._texture
+        self._set_texture(texture)
+        if (texture.width != previous.width or
+            texture.height != previous.height or
+            texture.anchor_x != previous.anchor_x or
+            texture.anchor_y != previous.anchor_y):
+            self._update_position()
 
         if frame.duration is not None:
             duration = frame.duration - (self._next_dt - dt)
@@ -278,7 +366,7 @@ class Sprite(event.EventDispatcher):
             clock.schedule_once(self._animate, duration)
             self._next_dt = duration
         else:
-            self.dispatch_event('on_animation_end')
+            self._animation_end()
 
     def _set_batch(self, batch):
         if self._batch == batch:
@@ -309,10 +397,10 @@ class Sprite(event.EventDispatcher):
         if self._group.parent == group:
             return
 
-        self._group = SpriteGroup(self._texture,
-                                  self._group.blend_src,
-                                  self._group.blend_dest,
-                                  group)
+        self._group = _get_sprite_group(self._texture,
+                                       self._group.blend_src,
+                                       self._group.blend_dest,
+                                       group)
 
         if self._batch is not None:
             self._batch.migrate(self._vertex_list, GL_QUADS, self._group,
@@ -354,23 +442,30 @@ class Sprite(event.EventDispatcher):
     image = property(_get_image, _set_image,
                      doc='''Image or animation to display.
 
+    Changing to an image in the same texture as the current image (for
+    example, another region of a `TextureAtlas` or `TextureGrid`) only
+    rewrites the sprite's texture coordinates.  Changing to an image in a
+    different texture moves the sprite's vertices to the rendering group of
+    that texture, so animations whose frames share one texture are cheaper
+    to play.
+
     :type: `AbstractImage` or `Animation`
     ''')
 
     def _set_texture(self, texture):
-        if texture.id is not self._texture.id:
-            self._group = SpriteGroup(texture,
-                                      self._group.blend_src,
-                                      self._group.blend_dest,
-                                      self._group.parent)
-            if self._batch is None:
-                self._vertex_list.tex_coords[:] = texture.tex_coords
-            else:
-                self._vertex_list.delete()
+        if (texture.id != self._texture.id or
+            texture.target != self._texture.target):
+            group = self._group
+            self._group = _get_sprite_group(texture,
+                                            group.blend_src,
+                                            group.blend_dest,
+                                            group.parent)
+            if self._batch is not None:
+                # Move the existing vertices to the new group's domain.
                 self._texture = texture
-                self._create_vertex_list()
-        else:
-            self._vertex_list.tex_coords[:] = texture.tex_coords
+                self._batch.migrate(self._vertex_list, GL_QUADS, self._group,
+                                    self._batch)
+        self._vertex_list.tex_coords[:] = texture.tex_coords
         self._texture = texture
 
     def _create_vertex_list(self):
@@ -583,6 +678,23 @@ class Sprite(event.EventDispatcher):
         self._vertex_list.draw(GL_QUADS)
         self._group.unset_state_recursive()
 
+class Sprite(_BaseSprite, event.EventDispatcher):
+    '''Instance of an on-screen image.
+
+    See the module documentation for usage.
+    '''
+    _batch = None
+    _animation = None
+    _rotation = 0
+    _opacity = 255
+    _rgb = (255, 255, 255)
+    _scale = 1.0
+    _visible = True
+    _vertex_list = None
+
+    def _animation_end(self):
+        self.dispatch_event('on_animation_end')
+
     if _is_epydoc:
         def on_animation_end(self):
             '''The sprite animation reached the final frame.
@@ -595,3 +707,727 @@ class Sprite(event.EventDispatcher):
             '''
 
 Sprite.register_event_type('on_animation_end')
+
+class CompactSprite(_BaseSprite):
+    '''A sprite with a smaller memory footprint.
+
+    `CompactSprite` has the same constructor, properties and methods as
+    `Sprite`, but stores its state in ``__slots__`` rather than an instance
+    dictionary and does not dispatch events.
+    Use it when creating very large numbers of sprites.
+
+    Compact sprites cannot be given new attributes, and so cannot be used as
+    a base class for game objects that add their own state without also
+    declaring ``__slots__``.
+
+    :since: pyglet 1.2
+    '''
+    __slots__ = ['_batch', '_animation', '_frame_index', '_next_dt',
+                 '_texture', '_group', '_usage', '_subpixel', '_vertex_list',
+                 '_x', '_y', '_rotation', '_opacity', '_rgb', '_scale',
+                 '_visible']
+
+    def __init__(self,
+                 img, x=0, y=0,
+                 blend_src=GL_SRC_ALPHA,
+                 blend_dest=GL_ONE_MINUS_SRC_ALPHA,
+                 batch=None,
+                 group=None,
+                 usage='dynamic',
+                 subpixel=False):
+        self._batch = None
+        self._animation = None
+        self._rotation = 0
+        self._opacity = 255
+        self._rgb = (255, 255, 255)
+        self._scale = 1.0
+        self._visible = True
+        self._vertex_list = None
+        super(CompactSprite, self).__init__(img, x, y, blend_src, blend_dest,
+                                            batch, group, usage, subpixel)
+
+    def _animation_end(self):
+        pass
+
+class SpriteArray(object):
+    '''A fixed sequence of sprites transformed together.
+
+    `set_transforms` updates the position, rotation and scale of every
+    sprite in the array and rewrites their vertices in bulk: the sprites are
+    grouped by vertex domain, and each domain's vertex buffer is mapped and
+    invalidated once.  If NumPy is installed the vertex computation is
+    vectorized; otherwise a plain Python loop is used, which still avoids the
+    per-sprite property overhead.
+
+    The sprites remain ordinary `Sprite` objects and can be modified
+    individually as usual.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, sprites):
+        '''Create a sprite array.
+
+        :Parameters:
+            `sprites` : sequence of `Sprite`
+                The sprites to transform.  The sequence is copied.
+
+        '''
+        self.sprites = list(sprites)
+        self._domains = None
+        self._groups = None
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def __iter__(self):
+        return iter(self.sprites)
+
+    def set_transforms(self, x=None, y=None, rotation=None, scale=None):
+        '''Set the transform of every sprite in the array.
+
+        Each argument is a sequence (or NumPy array) with one value per
+        sprite, in the order of `sprites`.  Arguments that are omitted leave
+        that property of the sprites unchanged.
+
+        :Parameters:
+            `x` : sequence of float
+                X coordinates of the sprites.
+            `y` : sequence of float
+                Y coordinates of the sprites.
+            `rotation` : sequence of float
+                Clockwise rotations of the sprites, in degrees.
+            `scale` : sequence of float
+                Scaling factors of the sprites.
+
+        '''
+        sprites = self.sprites
+        if x is not None:
+            for sprite, value in izip(sprites, _as_list(x, len(sprites))):
+                sprite._x = value
+        if y is not None:
+            for sprite, value in izip(sprites, _as_list(y, len(sprites))):
+                sprite._y = value
+        if rotation is not None:
+            for sprite, value in izip(sprites,
+                                      _as_list(rotation, len(sprites))):
+                sprite._rotation = value
+        if scale is not None:
+            for sprite, value in izip(sprites, _as_list(scale, len(sprites))):
+                sprite._scale = value
+        self.update()
+
+    def update(self):
+        '''Recompute the vertices of every sprite in the array.
+
+        This is called by `set_transforms`; call it directly after changing
+        the sprites' attributes by other means.  None of the sprites may
+        have been deleted.
+        '''
+        sprites = self.sprites
+        vertex_lists = [sprite._vertex_list for sprite in sprites]
+        domains = [vertex_list.domain for vertex_list in vertex_lists]
+        if domains != self._domains:
+            # Group sprite indices by vertex domain.
+            groups = {}
+            for i, domain in enumerate(domains):
+                if domain in groups:
+                    groups[domain].append(i)
+                else:
+                    groups[domain] = [i]
+            self._domains = domains
+            self._groups = groups.items()
+        starts = [vertex_list.start for vertex_list in vertex_lists]
+
+        for domain, indices in self._groups:
+            attribute = domain.attribute_names['vertices']
+            if attribute.stride != attribute.size:
+                # Interleaved (static) vertex data; no direct buffer access.
+                for i in indices:
+                    sprites[i]._update_position()
+                continue
+
+            group_starts = [starts[i] for i in indices]
+            first = min(group_starts)
+            region = attribute.get_region(attribute.buffer, first,
+                                          max(group_starts) + 4 - first)
+            region.invalidate()
+            offsets = [(start - first) * 2 for start in group_starts]
+            if len(indices) == len(sprites):
+                group = sprites
+            else:
+                group = [sprites[i] for i in indices]
+            if numpy is not None:
+                _update_vertices_numpy(group, offsets, region.array)
+            else:
+                _update_vertices(group, offsets, region.array)
+
+def _as_list(values, count):
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    assert len(values) == count, 'Expected %d values' % count
+    return values
+
+def _update_vertices_numpy(sprites, offsets, array):
+    # Compute the vertices of all sprites in one vertex domain together.
+    x, y, rotation, scale, visible = numpy.array(
+        [(sprite._x, sprite._y, sprite._rotation, sprite._scale,
+          sprite._visible) for sprite in sprites], dtype=float).T
+    anchor_x, anchor_y, width, height = numpy.array(
+        [(t.anchor_x, t.anchor_y, t.width, t.height)
+         for t in [sprite._texture for sprite in sprites]], dtype=float).T
+    scale = scale * visible
+
+    x1 = -anchor_x * scale
+    y1 = -anchor_y * scale
+    x2 = x1 + width * scale
+    y2 = y1 + height * scale
+    r = numpy.radians(-rotation)
+    cr = numpy.cos(r)
+    sr = numpy.sin(r)
+
+    vertices = numpy.empty((len(sprites), 8))
+    vertices[:, 0] = x1 * cr - y1 * sr + x
+    vertices[:, 1] = x1 * sr + y1 * cr + y
+    vertices[:, 2] = x2 * cr - y1 * sr + x
+    vertices[:, 3] = x2 * sr + y1 * cr + y
+    vertices[:, 4] = x2 * cr - y2 * sr + x
+    vertices[:, 5] = x2 * sr + y2 * cr + y
+    vertices[:, 6] = x1 * cr - y2 * sr + x
+    vertices[:, 7] = x1 * sr + y2 * cr + y
+    invisible = scale == 0
+    if invisible.any():
+        vertices[invisible] = 0
+
+    # Integer vertex types truncate on assignment, as int() does.
+    buffer = numpy.ctypeslib.as_array(array)
+    indices = numpy.array(offsets)[:, None] + numpy.arange(8)
+    buffer[indices] = vertices
+
+def _update_vertices(sprites, offsets, array):
+    # Pure Python equivalent of _update_vertices_numpy.
+    radians = math.radians
+    cos = math.cos
+    sin = math.sin
+    for sprite, i in zip(sprites, offsets):
+        if not sprite._visible:
+            array[i:i + 8] = [0, 0, 0, 0, 0, 0, 0, 0]
+            continue
+        img = sprite._texture
+        scale = sprite._scale
+        x = sprite._x
+        y = sprite._y
+        x1 = -img.anchor_x * scale
+        y1 = -img.anchor_y * scale
+        x2 = x1 + img.width * scale
+        y2 = y1 + img.height * scale
+        if sprite._rotation:
+            r = -radians(sprite._rotation)
+            cr = cos(r)
+            sr = sin(r)
+            vertices = [x1 * cr - y1 * sr + x, x1 * sr + y1 * cr + y,
+                        x2 * cr - y1 * sr + x, x2 * sr + y1 * cr + y,
+                        x2 * cr - y2 * sr + x, x2 * sr + y2 * cr + y,
+                        x1 * cr - y2 * sr + x, x1 * sr + y2 * cr + y]
+        else:
+            x1 += x
+            x2 += x
+            y1 += y
+            y2 += y
+            vertices = [x1, y1, x2, y1, x2, y2, x1, y2]
+        if not sprite._subpixel:
+            vertices = [int(v) for v in vertices]
+        array[i:i + 8] = vertices
+
+class _Instance(ctypes.Structure):
+    # Per-sprite record of an InstancedSpriteBatch.
+    _fields_ = [
+        ('x', GLfloat),
+        ('y', GLfloat),
+        ('rotation', GLfloat),
+        ('scale', GLfloat),
+        ('width', GLfloat),
+        ('height', GLfloat),
+        ('anchor_x', GLfloat),
+        ('anchor_y', GLfloat),
+        ('s0', GLfloat),
+        ('t0', GLfloat),
+        ('s1', GLfloat),
+        ('t1', GLfloat),
+        ('color', GLubyte * 4),
+    ]
+
+# Name, component count, GL type, normalized, field of each per-instance
+# attribute.
+_instance_attributes = [
+    ('transform', 4, GL_FLOAT, False, 'x'),
+    ('size_anchor', 4, GL_FLOAT, False, 'width'),
+    ('tex_region', 4, GL_FLOAT, False, 's0'),
+    ('color', 4, GL_UNSIGNED_BYTE, True, 'color'),
+]
+
+_instanced_vertex_source = '''
+#version 120
+attribute vec2 corner;
+attribute vec4 transform;
+attribute vec4 size_anchor;
+attribute vec4 tex_region;
+attribute vec4 color;
+
+void main() {
+    vec2 p = (corner * size_anchor.xy - size_anchor.zw) * transform.w;
+    float r = -radians(transform.z);
+    float cr = cos(r);
+    float sr = sin(r);
+    p = vec2(p.x * cr - p.y * sr, p.x * sr + p.y * cr) + transform.xy;
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(p, 0.0, 1.0);
+    gl_TexCoord[0] = vec4(mix(tex_region.xy, tex_region.zw, corner), 0.0, 1.0);
+    gl_FrontColor = color;
+}
+'''
+
+_instanced_fragment_source = '''
+#version 120
+uniform sampler2D texture;
+
+void main() {
+    gl_FragColor = texture2D(texture, gl_TexCoord[0].xy) * gl_Color;
+}
+'''
+
+def _compile_shader(shader_type, source):
+    shader = glCreateShader(shader_type)
+    source = ctypes.create_string_buffer(source)
+    source_ptr = ctypes.cast(source, ctypes.POINTER(GLchar))
+    glShaderSource(shader, 1, ctypes.byref(source_ptr), None)
+    glCompileShader(shader)
+
+    status = GLint()
+    glGetShaderiv(shader, GL_COMPILE_STATUS, status)
+    if not status.value:
+        log = ctypes.create_string_buffer(4096)
+        glGetShaderInfoLog(shader, len(log), None,
+                           ctypes.cast(log, ctypes.POINTER(GLchar)))
+        glDeleteShader(shader)
+        raise GLException('Sprite shader failed to compile: %s' % log.value)
+    return shader
+
+def _link_program(vertex_source, fragment_source):
+    program = glCreateProgram()
+    shaders = [_compile_shader(GL_VERTEX_SHADER, vertex_source),
+               _compile_shader(GL_FRAGMENT_SHADER, fragment_source)]
+    for shader in shaders:
+        glAttachShader(program, shader)
+    glLinkProgram(program)
+    for shader in shaders:
+        glDeleteShader(shader)
+
+    status = GLint()
+    glGetProgramiv(program, GL_LINK_STATUS, status)
+    if not status.value:
+        log = ctypes.create_string_buffer(4096)
+        glGetProgramInfoLog(program, len(log), None,
+                            ctypes.cast(log, ctypes.POINTER(GLchar)))
+        glDeleteProgram(program)
+        raise GLException('Sprite shader failed to link: %s' % log.value)
+    return program
+
+class _InstancedProgram(object):
+    # Shader program and instancing entry points shared by all
+    # InstancedSpriteBatch objects in an object space.
+    def __init__(self):
+        self.program = _link_program(_instanced_vertex_source,
+                                     _instanced_fragment_source)
+        self.corner = glGetAttribLocation(self.program, 'corner')
+        self.attributes = []
+        for name, count, gl_type, normalized, field in _instance_attributes:
+            location = glGetAttribLocation(self.program, name)
+            offset = getattr(_Instance, field).offset
+            self.attributes.append(
+                (location, count, gl_type, normalized, offset))
+        self.texture = glGetUniformLocation(self.program, 'texture')
+
+        if gl_info.have_version(3, 3):
+            self.draw_instanced = glDrawArraysInstanced
+            self.attrib_divisor = glVertexAttribDivisor
+        elif (gl_info.have_extension('GL_ARB_instanced_arrays') and
+              (gl_info.have_version(3, 1) or
+               gl_info.have_extension('GL_ARB_draw_instanced'))):
+            self.draw_instanced = glDrawArraysInstancedARB
+            self.attrib_divisor = glVertexAttribDivisorARB
+        else:
+            self.draw_instanced = None
+            self.attrib_divisor = None
+
+        # Unit quad, drawn as a triangle strip.
+        corners = (GLfloat * 8)(0, 0, 1, 0, 0, 1, 1, 1)
+        self.corner_buffer = vertexbuffer.create_buffer(
+            ctypes.sizeof(corners), usage=GL_STATIC_DRAW)
+        self.corner_buffer.set_data(corners)
+
+def _get_instanced_program():
+    from pyglet import gl
+    object_space = gl.current_context.object_space
+    try:
+        return object_space.pyglet_sprite_instanced_program
+    except AttributeError:
+        object_space.pyglet_sprite_instanced_program = _InstancedProgram()
+        return object_space.pyglet_sprite_instanced_program
+
+class InstancedSpriteBatch(object):
+    '''A set of sprites sharing one texture, drawn with instancing.
+
+    Each sprite in the batch is an `InstancedSprite`, created with `add`.
+    All images used by the sprites must be regions of the batch's texture,
+    for example images from the same `pyglet.image.atlas.TextureBin` atlas
+    or `pyglet.image.ImageGrid`.
+
+    Sprites are kept packed at the start of the instance buffer: deleting a
+    sprite moves the last sprite into its slot.
+
+    The sprites are transformed by a GLSL 1.20 vertex shader, so OpenGL 2.1
+    is required; check `is_supported` before creating a batch, and use
+    `Sprite` otherwise.  Drawing is instanced with OpenGL 3.3 or the
+    ``GL_ARB_instanced_arrays`` extension, and each sprite is drawn
+    separately without them.
+
+    :since: pyglet 1.2
+    '''
+
+    _initial_capacity = 16
+
+    @staticmethod
+    def is_supported():
+        '''Determine if instanced sprite batches can be used in the current
+        context.
+
+        :rtype: bool
+        '''
+        return gl_info.have_version(2, 1)
+
+    def __init__(self, texture,
+                 blend_src=GL_SRC_ALPHA,
+                 blend_dest=GL_ONE_MINUS_SRC_ALPHA,
+                 usage='dynamic'):
+        '''Create an instanced sprite batch.
+
+        :Parameters:
+            `texture` : `Texture`
+                The texture containing every image drawn by the batch.  It
+                must have target ``GL_TEXTURE_2D``.
+            `blend_src` : int
+                OpenGL blend source mode.
+            `blend_dest` : int
+                OpenGL blend destination mode.
+            `usage` : str
+                Buffer object usage hint for the instance data, one of
+                ``"stream"``, ``"dynamic"`` or ``"static"``.
+
+        :raise GLException: if OpenGL 2.1 is not available.
+        '''
+        if not self.is_supported():
+            raise GLException('Instanced sprites require OpenGL 2.1 '
+                              '(GLSL 1.20); use Sprite instead')
+        assert texture.target == GL_TEXTURE_2D, \
+            'Instanced sprites require a GL_TEXTURE_2D texture'
+        self.texture = texture
+        self.blend_src = blend_src
+        self.blend_dest = blend_dest
+
+        self._usage = {
+            'static': GL_STATIC_DRAW,
+            'dynamic': GL_DYNAMIC_DRAW,
+            'stream': GL_STREAM_DRAW,
+        }[usage]
+        self._capacity = self._initial_capacity
+        self._buffer = vertexbuffer.create_mappable_buffer(
+            self._capacity * ctypes.sizeof(_Instance), usage=self._usage)
+        self._sprites = []
+
+        # Incremented when instances are moved or the buffer is resized,
+        # invalidating regions held by sprites.
+        self._version = 0
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def add(self, img, x=0, y=0):
+        '''Add a sprite to the batch.
+
+        :Parameters:
+            `img` : `AbstractImage`
+                Image to display; must be a region of the batch's texture.
+            `x` : float
+                X coordinate of the sprite.
+            `y` : float
+                Y coordinate of the sprite.
+
+        :rtype: `InstancedSprite`
+        '''
+        index = len(self._sprites)
+        if index == self._capacity:
+            self._capacity *= 2
+            self._buffer.resize(self._capacity * ctypes.sizeof(_Instance))
+            self._version += 1
+        sprite = InstancedSprite(self, index, img, x, y)
+        self._sprites.append(sprite)
+        return sprite
+
+    def _get_region(self, index):
+        size = ctypes.sizeof(_Instance)
+        return self._buffer.get_region(index * size, size,
+                                       ctypes.POINTER(_Instance))
+
+    def _remove(self, sprite):
+        # Move the last instance into the removed sprite's slot.
+        last = self._sprites.pop()
+        if last is not sprite:
+            index = sprite._index
+            region = self._get_region(index)
+            ctypes.memmove(ctypes.addressof(region.array),
+                           ctypes.addressof(last._get_instance()),
+                           ctypes.sizeof(_Instance))
+            region.invalidate()
+            self._sprites[index] = last
+            last._index = index
+            last._region_version = None
+
+    def draw(self):
+        '''Draw all sprites in the batch.'''
+        count = len(self._sprites)
+        if not count:
+            return
+
+        program = _get_instanced_program()
+        stride = ctypes.sizeof(_Instance)
+
+        glPushAttrib(GL_COLOR_BUFFER_BIT | GL_ENABLE_BIT)
+        glEnable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, self.texture.id)
+        glEnable(GL_BLEND)
+        glBlendFunc(self.blend_src, self.blend_dest)
+        glUseProgram(program.program)
+        glUniform1i(program.texture, 0)
+
+        program.corner_buffer.bind()
+        glEnableVertexAttribArray(program.corner)
+        glVertexAttribPointer(program.corner, 2, GL_FLOAT, False, 0,
+                              program.corner_buffer.ptr)
+
+        if program.draw_instanced:
+            self._buffer.bind()
+            for location, n, gl_type, normalized, offset in \
+                    program.attributes:
+                glEnableVertexAttribArray(location)
+                glVertexAttribPointer(location, n, gl_type, normalized,
+                                      stride, self._buffer.ptr + offset)
+                program.attrib_divisor(location, 1)
+            if vertexbuffer._workaround_vbo_finish:
+                glFinish()
+
+            program.draw_instanced(GL_TRIANGLE_STRIP, 0, 4, count)
+
+            for location, _, _, _, _ in program.attributes:
+                program.attrib_divisor(location, 0)
+                glDisableVertexAttribArray(location)
+            self._buffer.unbind()
+        else:
+            # No instancing: set each sprite's record as constant attribute
+            # values and draw its quad separately.
+            if vertexbuffer._workaround_vbo_finish:
+                glFinish()
+            (transform, _, _, _, _), (size_anchor, _, _, _, _), \
+                (tex_region, _, _, _, _), (color, _, _, _, _) = \
+                program.attributes
+            for sprite in self._sprites:
+                i = sprite._get_instance()
+                glVertexAttrib4f(transform, i.x, i.y, i.rotation, i.scale)
+                glVertexAttrib4f(size_anchor,
+                                 i.width, i.height, i.anchor_x, i.anchor_y)
+                glVertexAttrib4f(tex_region, i.s0, i.t0, i.s1, i.t1)
+                glVertexAttrib4Nub(color, *i.color)
+                glDrawArrays(GL_TRIANGLE_STRIP, 0, 4)
+
+        glDisableVertexAttribArray(program.corner)
+        program.corner_buffer.unbind()
+        glUseProgram(0)
+        glPopAttrib()
+
+    def delete(self):
+        '''Delete the batch and all its sprites, releasing the instance
+        buffer.'''
+        for sprite in self._sprites:
+            sprite._batch = None
+        self._sprites = []
+        self._buffer.delete()
+
+class InstancedSprite(object):
+    '''A sprite drawn by an `InstancedSpriteBatch`.
+
+    Use `InstancedSpriteBatch.add` to create instanced sprites.  Each
+    property change writes only this sprite's instance record.
+
+    :since: pyglet 1.2
+    '''
+    __slots__ = ['_batch', '_index', '_region', '_region_version',
+                 '_texture', '_visible', '_scale', '_opacity', '_rgb']
+
+    def __init__(self, batch, index, img, x, y):
+        self._batch = batch
+        self._index = index
+        self._region = None
+        self._region_version = None
+        self._visible = True
+        self._scale = 1.0
+        self._opacity = 255
+        self._rgb = (255, 255, 255)
+
+        instance = self._edit_instance()
+        instance.x = x
+        instance.y = y
+        instance.rotation = 0
+        instance.scale = 1.0
+        instance.color[:] = [255, 255, 255, 255]
+        self._texture = None
+        self._set_texture(img.get_texture())
+
+    def _get_region(self):
+        batch = self._batch
+        if self._region_version != batch._version:
+            self._region = batch._get_region(self._index)
+            self._region_version = batch._version
+        return self._region
+
+    def _get_instance(self):
+        # Instance record for reading only; use _edit_instance to change it.
+        return self._get_region().array
+
+    def _edit_instance(self):
+        # Instance record for writing, marked for upload.
+        region = self._get_region()
+        region.invalidate()
+        return region.array
+
+    def delete(self):
+        '''Remove the sprite from its batch.'''
+        if self._batch is not None:
+            self._batch._remove(self)
+            self._batch = None
+            self._region = None
+
+    def _set_texture(self, texture):
+        assert texture.id == self._batch.texture.id, \
+            'Image must be a region of the batch texture'
+        self._texture = texture
+        tex_coords = texture.tex_coords
+        instance = self._edit_instance()
+        instance.width = texture.width
+        instance.height = texture.height
+        instance.anchor_x = texture.anchor_x
+        instance.anchor_y = texture.anchor_y
+        instance.s0 = tex_coords[0]
+        instance.t0 = tex_coords[1]
+        instance.s1 = tex_coords[3]
+        instance.t1 = tex_coords[7]
+
+    image = property(lambda self: self._texture,
+                     lambda self, img: self._set_texture(img.get_texture()),
+                     doc='''Image to display.
+
+    Must be a region of the batch's texture.
+
+    :type: `AbstractImage`
+    ''')
+
+    def set_position(self, x, y):
+        '''Set the X and Y coordinates of the sprite simultaneously.
+
+        :Parameters:
+            `x` : float
+                X coordinate of the sprite.
+            `y` : float
+                Y coordinate of the sprite.
+
+        '''
+        instance = self._edit_instance()
+        instance.x = x
+        instance.y = y
+
+    position = property(lambda self: (self.x, self.y),
+                        lambda self, t: self.set_position(*t),
+                        doc='''The (x, y) coordinates of the sprite.
+
+    :type: (float, float)
+    ''')
+
+    def _set_x(self, x):
+        self._edit_instance().x = x
+
+    x = property(lambda self: self._get_instance().x, _set_x,
+                 doc='''X coordinate of the sprite.
+
+    :type: float
+    ''')
+
+    def _set_y(self, y):
+        self._edit_instance().y = y
+
+    y = property(lambda self: self._get_instance().y, _set_y,
+                 doc='''Y coordinate of the sprite.
+
+    :type: float
+    ''')
+
+    def _set_rotation(self, rotation):
+        self._edit_instance().rotation = rotation
+
+    rotation = property(lambda self: self._get_instance().rotation,
+                        _set_rotation,
+                        doc='''Clockwise rotation of the sprite, in degrees.
+
+    :type: float
+    ''')
+
+    def _set_scale(self, scale):
+        self._scale = scale
+        if self._visible:
+            self._edit_instance().scale = scale
+
+    scale = property(lambda self: self._scale, _set_scale,
+                     doc='''Scaling factor.
+
+    :type: float
+    ''')
+
+    def _set_visible(self, visible):
+        self._visible = visible
+        self._edit_instance().scale = visible and self._scale or 0.
+
+    visible = property(lambda self: self._visible, _set_visible,
+                       doc='''True if the sprite will be drawn.
+
+    :type: bool
+    ''')
+
+    def _update_color(self):
+        r, g, b = self._rgb
+        self._edit_instance().color[:] = [r, g, b, int(self._opacity)]
+
+    def _set_opacity(self, opacity):
+        self._opacity = opacity
+        self._update_color()
+
+    opacity = property(lambda self: self._opacity, _set_opacity,
+                       doc='''Blend opacity, from 0 to 255.
+
+    :type: int
+    ''')
+
+    def _set_color(self, rgb):
+        self._rgb = map(int, rgb)
+        self._update_color()
+
+    color = property(lambda self: self._rgb, _set_color,
+                     doc='''Blend color, as an RGB tuple of integers.
+
+    :type: (int, int, int)
+    ''')
@@ -1685,6 +1685,39 @@ class FPSDisplay(object):
         self.update()
         self._window_flip()
 
+class GLStatsDisplay(FPSDisplay):
+    '''Display of the OpenGL calls made per frame.
+
+    Creating a `GLStatsDisplay` enables `pyglet.gl.gl_stats`, and ends a
+    frame of counts each time the window buffer is flipped.  The label shows
+    the GL calls, draw calls, vertices, texture binds and buffer bytes
+    uploaded in the last frame.  It is used in the same way as `FPSDisplay`;
+    note that drawing the display itself adds to the counts.
+
+    :since: pyglet 1.2
+    '''
+    def __init__(self, window):
+        super(GLStatsDisplay, self).__init__(window)
+        from pyglet.gl import gl_stats
+        gl_stats.enable()
+        self.label.font_size = 12
+
+    def update(self):
+        '''Finish counting a frame, and update the label every
+        `update_period` seconds.  This method is called automatically when
+        the window buffer is flipped.
+        '''
+        from pyglet.gl import gl_stats
+        self._stats = gl_stats.end_frame()
+        super(GLStatsDisplay, self).update()
+
+    def set_fps(self, fps):
+        stats = self._stats
+        self.label.text = ('%.2f fps  %d calls  %d draws  %d vertices  '
+                           '%d binds  %d KB') % (
+            fps, stats.total_calls, stats.draw_calls, stats.vertices,
+            stats.texture_binds, stats.buffer_bytes // 1024)
+
 if _is_epydoc:
     # We are building documentation
     Window = BaseWindow
@@ -0,0 +1,130 @@
+'''Tests for pyglet.graphics.allocation.Allocator.
+'''
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyglet.graphics import allocation
+
+class AllocatorTestCase(unittest.TestCase):
+    def check_regions(self, allocator, regions):
+        # Compare against the regions given as a list of (start, size), and
+        # check the free space is the complement.
+        starts, sizes = allocator.get_allocated_regions()
+        self.assertEqual(zip(starts, sizes), regions)
+        self.assertEqual(allocator.get_free_size(),
+                         allocator.capacity - sum(sizes))
+
+    def test_best_fit_lowest_start(self):
+        allocator = allocation.Allocator(100)
+        starts = [allocator.alloc(10) for i in range(10)]
+        self.assertEqual(starts, range(0, 100, 10))
+        for start in (70, 10, 40):
+            allocator.dealloc(start, 10)
+        allocator.dealloc(85, 5)
+
+        # Smallest block that fits, then the lowest of equal blocks
+        self.assertEqual(allocator.alloc(5), 85)
+        self.assertEqual(allocator.alloc(8), 10)
+        self.assertEqual(allocator.alloc(8), 40)
+        self.assertEqual(allocator.alloc(2), 18)
+
+    def test_free_merge(self):
+        allocator = allocation.Allocator(40)
+        for i in range(4):
+            allocator.alloc(10)
+        allocator.dealloc(10, 10)
+        self.check_regions(allocator, [(0, 10), (20, 20)])
+        allocator.dealloc(20, 10)
+        self.check_regions(allocator, [(0, 10), (30, 10)])
+        self.assertEqual(allocator.get_fragmented_free_size(), 20)
+
+        # Both neighbours merge into a single free block
+        allocator.alloc(10)
+        allocator.dealloc(0, 10)
+        allocator.dealloc(30, 10)
+        allocator.dealloc(10, 10)
+        self.check_regions(allocator, [])
+        self.assertEqual(allocator.alloc(40), 0)
+
+    def test_out_of_memory(self):
+        allocator = allocation.Allocator(20)
+        allocator.alloc(5)
+        allocator.alloc(10)
+        allocator.dealloc(0, 5)
+        try:
+            allocator.alloc(10)
+        except allocation.AllocatorMemoryException, e:
+            # Only the free space at the end can be extended
+            self.assertEqual(e.requested_capacity, 25)
+        else:
+            self.fail('Expected AllocatorMemoryException')
+        allocator.set_capacity(25)
+        self.assertEqual(allocator.alloc(10), 15)
+
+    def test_realloc(self):
+        allocator = allocation.Allocator(20)
+        self.assertEqual(allocator.alloc(10), 0)
+        self.assertEqual(allocator.realloc(0, 10, 15), 0)
+        self.assertEqual(allocator.alloc(5), 15)
+        self.assertEqual(allocator.realloc(0, 15, 5), 0)
+        self.check_regions(allocator, [(0, 5), (15, 5)])
+        # No room after the region: moved to the lowest block that fits
+        self.assertEqual(allocator.realloc(15, 5, 8), 5)
+        self.check_regions(allocator, [(0, 13)])
+
+    def test_double_free(self):
+        allocator = allocation.Allocator(30)
+        allocator.alloc(10)
+        allocator.alloc(10)
+        allocator.dealloc(0, 10)
+        self.assertRaises(AssertionError, allocator.dealloc, 0, 10)
+        # Overlapping a freed region at a different start
+        self.assertRaises(AssertionError, allocator.dealloc, 5, 10)
+        self.assertRaises(AssertionError, allocator.dealloc, 15, 10)
+        self.check_regions(allocator, [(10, 10)])
+
+    def test_regions_replaced_on_change(self):
+        allocator = allocation.Allocator(30)
+        allocator.alloc(10)
+        regions = allocator.get_allocated_regions()
+        self.assertTrue(allocator.get_allocated_regions() is regions)
+        allocator.alloc(10)
+        self.assertFalse(allocator.get_allocated_regions() is regions)
+        self.assertEqual(regions, ([0], [10]))
+
+    def test_random(self):
+        rand = random.Random(1)
+        allocator = allocation.Allocator(1000)
+        used = [False] * 1000
+        regions = []
+        for i in range(2000):
+            if regions and rand.random() < 0.5:
+                start, size = regions.pop(rand.randrange(len(regions)))
+                allocator.dealloc(start, size)
+                used[start:start + size] = [False] * size
+                continue
+            size = rand.randint(1, 30)
+            try:
+                start = allocator.alloc(size)
+            except allocation.AllocatorMemoryException:
+                continue
+            self.assertFalse(any(used[start:start + size]))
+            used[start:start + size] = [True] * size
+            regions.append((start, size))
+
+        expected = []
+        for start in range(1000):
+            if used[start]:
+                if expected and sum(expected[-1]) == start:
+                    expected[-1] = (expected[-1][0], expected[-1][1] + 1)
+                else:
+                    expected.append((start, 1))
+        self.check_regions(allocator, expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+'''Tests for scheduled function profiling in pyglet.clock.
+'''
+
+import gc
+import os
+import sys
+import unittest
+import weakref
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyglet import clock
+
+class Alien(object):
+    def destroy(self, dt):
+        pass
+
+def move(dt):
+    pass
+
+class ProfilingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.time = 0.
+        self.clock = clock.Clock(time_function=lambda: self.time)
+        self.clock.enable_profiling()
+
+    def tick(self, dt=1.):
+        self.time += dt
+        self.clock.tick()
+
+    def test_methods_share_stats(self):
+        aliens = [Alien() for i in range(50)]
+        refs = [weakref.ref(alien) for alien in aliens]
+        for alien in aliens:
+            self.clock.schedule_once(alien.destroy, 0.5)
+        self.clock.schedule(move)
+        del aliens, alien
+        self.tick()
+        gc.collect()
+
+        stats = dict((s.name, s) for s in self.clock.get_profile_stats())
+        self.assertEqual(sorted(stats), [
+            '%s.Alien.destroy' % __name__, '%s.move' % __name__])
+        self.assertEqual(stats['%s.Alien.destroy' % __name__].calls, 50)
+        self.assertEqual(stats['%s.move' % __name__].calls, 1)
+        self.assertEqual([ref() for ref in refs], [None] * 50)
+
+    def test_closures_share_stats(self):
+        for i in range(10):
+            self.clock.schedule_once(lambda dt: None, 0.5)
+        self.tick()
+        stats = self.clock.get_profile_stats()
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(stats[0].calls, 10)
+
+    def test_log_not_profiled(self):
+        self.clock.enable_profiling(log_interval=1.)
+        self.clock.schedule(move)
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.tick()
+            self.tick()
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertTrue('move' in output)
+        self.assertEqual([s.name for s in self.clock.get_profile_stats()],
+                         ['%s.move' % __name__])
+
+    def test_default_clock_functions(self):
+        default = clock.get_default()
+        clock.set_default(self.clock)
+        try:
+            self.clock.schedule(move)
+            self.tick()
+            output = StringIO()
+            clock.print_profile_stats(output)
+            self.assertTrue('%s.move' % __name__ in output.getvalue())
+            clock.reset_profile_stats()
+            self.assertEqual(clock.get_profile_stats(), [])
+        finally:
+            clock.set_default(default)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+'''Tests for glyph creation with pyglet.font.base.Font.prewarm.
+
+Font textures are emulated in client memory, so no context is needed.
+'''
+
+import ctypes
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+pyglet.options['debug_gl'] = False
+
+from pyglet import image
+from pyglet.font import base
+from pyglet.gl import *
+
+class FakeTextureAtlas(base.GlyphTextureAtlas):
+    # Texture contents are kept in `memory`, one byte per pixel.
+    textures = {}
+
+    def __init__(self, width, height, target, id):
+        super(FakeTextureAtlas, self).__init__(width, height, target, id)
+        self.memory = bytearray(width * height)
+        self.textures[id] = self
+
+    @classmethod
+    def create_for_size(cls, target, min_width, min_height,
+                        internalformat=None):
+        return cls(min_width, min_height, target, len(cls.textures) + 1)
+
+    def blit_into(self, source, x, y, z):
+        self.write(x, y, source.width, source.height,
+                   source.get_image_data().get_data('A', source.width))
+
+    def write(self, x, y, width, height, data):
+        TextureTestCase.uploads.append((self.id, width * height))
+        for row in range(height):
+            offset = (y + row) * self.width + x
+            self.memory[offset:offset + width] = \
+                data[row * width:(row + 1) * width]
+
+    def __del__(self):
+        pass
+
+class FakeGlyphRenderer(base.GlyphRenderer):
+    def __init__(self, font):
+        self.font = font
+        font.renderers += 1
+
+    def render(self, text):
+        # Each character has a distinct size and fill value.
+        width = 3 + ord(text) % 5
+        height = 4 + ord(text) % 3
+        data = ''.join([chr((ord(text) + i) & 0xff)
+                        for i in range(width * height)])
+        return self.font.create_glyph(
+            image.ImageData(width, height, 'A', data))
+
+class FakeFont(base.Font):
+    glyph_renderer_class = FakeGlyphRenderer
+    texture_class = FakeTextureAtlas
+    texture_width = 32
+    texture_height = 16
+
+    def __init__(self):
+        super(FakeFont, self).__init__()
+        self.renderers = 0
+
+class TextureTestCase(unittest.TestCase):
+    uploads = []
+
+    def setUp(self):
+        self.saved = []
+        del self.uploads[:]
+        FakeTextureAtlas.textures.clear()
+        self.bound = None
+        self.reads = []
+        for name in ('glPushClientAttrib', 'glPixelStorei',
+                     'glPopClientAttrib'):
+            self.patch(base, name, lambda *args: None)
+        self.patch(base, 'glBindTexture', self._bind_texture)
+        self.patch(base, 'glTexSubImage2D', self._tex_sub_image)
+        self.patch(base, 'glGetTexImage', self._get_tex_image)
+
+    def tearDown(self):
+        for obj, name, value in reversed(self.saved):
+            setattr(obj, name, value)
+
+    def patch(self, obj, name, value):
+        self.saved.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def _bind_texture(self, target, id):
+        self.bound = FakeTextureAtlas.textures[id]
+
+    def _tex_sub_image(self, target, level, x, y, width, height, format,
+                       type, pixels):
+        self.assertEqual(format, GL_ALPHA)
+        self.bound.write(x, y, width, height,
+                         ctypes.string_at(pixels, width * height))
+
+    def _get_tex_image(self, target, level, format, type, pixels):
+        self.reads.append(self.bound.id)
+        ctypes.memmove(pixels, str(self.bound.memory),
+                       len(self.bound.memory))
+
+    def memory(self, font):
+        return sorted((texture.id, str(texture.memory))
+                      for texture in font.textures)
+
+    def glyph_coords(self, font):
+        return sorted((c, glyph.owner.id, glyph.x, glyph.y)
+                      for c, glyph in font.glyphs.items())
+
+class PrewarmTestCase(TextureTestCase):
+    text = u'0123456789 SCORE LIVES HI-SCORE'
+
+    def test_same_as_get_glyphs(self):
+        font = FakeFont()
+        font.get_glyphs(self.text)
+        expected_memory = self.memory(font)
+        expected_glyphs = self.glyph_coords(font)
+        glyph_uploads = len(self.uploads)
+
+        FakeTextureAtlas.textures.clear()
+        del self.uploads[:]
+        font = FakeFont()
+        font.prewarm(self.text)
+        self.assertEqual(self.memory(font), expected_memory)
+        self.assertEqual(self.glyph_coords(font), expected_glyphs)
+
+        # One upload per texture rather than per glyph.
+        self.assertTrue(len(font.textures) > 1)
+        self.assertEqual(sorted(id for id, size in self.uploads),
+                         sorted(texture.id for texture in font.textures))
+        self.assertTrue(glyph_uploads > len(self.uploads))
+        self.assertEqual(font.renderers, 1)
+        self.assertEqual(self.reads, [])
+
+    def test_uploads_after_prewarm(self):
+        font = FakeFont()
+        font.prewarm(u'ABC')
+        del self.uploads[:]
+        font.get_glyphs(u'D')
+        self.assertEqual(len(self.uploads), 1)
+        self.assertEqual(font.textures[0]._staging, None)
+
+    def test_existing_glyphs_kept(self):
+        font = FakeFont()
+        font.get_glyphs(u'ABCD')
+        expected_memory = self.memory(font)
+
+        FakeTextureAtlas.textures.clear()
+        font = FakeFont()
+        font.get_glyphs(u'AB')
+        del self.uploads[:]
+        font.prewarm(u'ABCD')
+        self.assertEqual(self.reads, [font.textures[0].id])
+        self.assertEqual(len(self.uploads), 1)
+        self.assertEqual(self.memory(font), expected_memory)
+
+    def test_already_created(self):
+        font = FakeFont()
+        font.get_glyphs(self.text)
+        del self.uploads[:]
+        font.prewarm(self.text)
+        self.assertEqual(self.uploads, [])
+        self.assertEqual(self.reads, [])
+
+    def test_unstaged_format(self):
+        # Sized internal formats are uploaded glyph by glyph.
+        font = FakeFont()
+        font.texture_internalformat = GL_ALPHA8
+        font.prewarm(u'ABC')
+        self.assertEqual(len(self.uploads), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+'''Tests for error checking in pyglet.gl.lib.
+'''
+
+import ctypes
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from pyglet import gl
+from pyglet.gl import lib
+
+class ErrorCheckTestCase(unittest.TestCase):
+    def setUp(self):
+        self.saved = []
+
+    def tearDown(self):
+        for obj, name, value in reversed(self.saved):
+            setattr(obj, name, value)
+        lib._linked_functions.pop('glTestFunction', None)
+
+    def patch(self, obj, name, value):
+        self.saved.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def test_check_error(self):
+        errors = [gl.GL_INVALID_ENUM, gl.GL_INVALID_VALUE]
+        self.patch(gl, 'glGetError', lambda: errors and errors.pop(0) or 0)
+        self.patch(gl, 'gluErrorString',
+                   lambda error: ctypes.c_char_p('error %d' % error))
+        try:
+            lib.check_error()
+        except gl.GLException, e:
+            self.assertEqual(str(e), 'error %d' % gl.GL_INVALID_ENUM)
+        else:
+            self.fail('Expected GLException')
+        # Remaining errors were cleared
+        self.assertEqual(errors, [])
+        lib.check_error()
+
+    def decorate(self, debug_gl, per_frame):
+        self.patch(lib, '_debug_gl', debug_gl)
+        self.patch(lib, '_debug_gl_per_frame', per_frame)
+        func = ctypes.CFUNCTYPE(None)(lambda: None)
+        lib.decorate_function(func, 'glTestFunction')
+        self.assertTrue(lib._linked_functions['glTestFunction'] is func)
+        return func.errcheck
+
+    def test_errcheck_per_call(self):
+        self.assertTrue(self.decorate(True, False) is lib.errcheck)
+
+    def test_no_errcheck_per_frame(self):
+        self.assertEqual(self.decorate(True, True), None)
+
+    def test_no_errcheck_release(self):
+        self.assertEqual(self.decorate(False, False), None)
+
+if __name__ == '__main__':
+    unittest.main()
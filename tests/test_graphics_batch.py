@@ -0,0 +1,142 @@
+'''Tests for draw list maintenance in pyglet.graphics.Batch.
+
+No OpenGL context is needed; vertex data is kept in client-side arrays and
+the draw lists are inspected rather than drawn.  Run with::
+
+    python -m unittest discover tests
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+pyglet.options['debug_gl'] = False
+
+from pyglet import graphics
+from pyglet import sprite
+from pyglet.gl import *
+
+class FakeTexture(object):
+    target = GL_TEXTURE_2D
+
+    def __init__(self, id):
+        self.id = id
+
+class BatchDrawListTestCase(unittest.TestCase):
+    def test_equal_parent_groups(self):
+        batch = graphics.Batch()
+        batch.add(4, GL_POINTS, graphics.TextureGroup(FakeTexture(1),
+            parent=graphics.OrderedGroup(0)), 'v2f')
+        batch._update_draw_list()
+        batch.add(4, GL_POINTS, graphics.TextureGroup(FakeTexture(2),
+            parent=graphics.OrderedGroup(0)), 'v2f')
+        batch._update_draw_list()
+
+        self.assertEqual(len(batch.top_groups), 1)
+        # OrderedGroup set/unset around two texture groups, each with a
+        # set, draw and unset.
+        self.assertEqual(len(batch._draw_list), 8)
+
+    def test_deleted_groups_removed(self):
+        batch = graphics.Batch()
+        for i in range(50):
+            vertex_list = batch.add(4, GL_POINTS,
+                graphics.TextureGroup(FakeTexture(i)), 'v2f')
+            batch._update_draw_list()
+            vertex_list.delete()
+        batch._update_draw_list()
+
+        self.assertEqual(batch.top_groups, [])
+        self.assertEqual(batch._draw_list, [])
+
+    def test_migrated_groups_removed(self):
+        batch = graphics.Batch()
+        group = graphics.OrderedGroup(0)
+        vertex_list = batch.add(4, GL_POINTS, group, 'v2f')
+        batch._update_draw_list()
+        batch.migrate(vertex_list, GL_POINTS, graphics.OrderedGroup(1), batch)
+        batch._update_draw_list()
+
+        self.assertEqual(batch.top_groups, [graphics.OrderedGroup(1)])
+        self.assertEqual(len(batch._draw_list), 3)
+
+class StateSortingTestCase(unittest.TestCase):
+    def setUp(self):
+        # Record the GL calls made by sprite group state changes.
+        self.calls = []
+        self.saved_functions = {}
+        for name in ('glEnable', 'glDisable', 'glBindTexture', 'glBlendFunc',
+                     'glPushAttrib', 'glPopAttrib'):
+            self.saved_functions[name] = getattr(sprite, name)
+            setattr(sprite, name, self._recorder(name))
+
+    def tearDown(self):
+        for name, function in self.saved_functions.items():
+            setattr(sprite, name, function)
+
+    def _recorder(self, name):
+        def record(*args):
+            self.calls.append((name,) + args)
+        return record
+
+    def _run_draw_list(self, batch):
+        # Call the state changes of the draw list, noting domain draws.
+        batch._update_draw_list()
+        for function in batch._draw_list:
+            if getattr(function, '__self__', None) is None:
+                self.calls.append('draw')
+            else:
+                function()
+
+    def test_sprite_group_transitions(self):
+        textures = [FakeTexture(i) for i in (1, 2, 3)]
+        batch = graphics.Batch(state_sorting=True)
+        for blend_dest in (GL_ONE, GL_ONE_MINUS_SRC_ALPHA):
+            for texture in textures:
+                group = sprite.SpriteGroup(texture, GL_SRC_ALPHA, blend_dest)
+                batch.add(4, GL_POINTS, group, 'v2f')
+
+        self._run_draw_list(batch)
+        self.assertEqual(batch.state_changes_saved, 5)
+
+        bind = lambda id: ('glBindTexture', GL_TEXTURE_2D, id)
+        blend = lambda dest: ('glBlendFunc', GL_SRC_ALPHA, dest)
+        self.assertEqual(self.calls, [
+            ('glEnable', GL_TEXTURE_2D), bind(1),
+            ('glPushAttrib', GL_COLOR_BUFFER_BIT), ('glEnable', GL_BLEND),
+            blend(GL_ONE), 'draw',
+            bind(1), blend(GL_ONE_MINUS_SRC_ALPHA), 'draw',
+            bind(2), blend(GL_ONE), 'draw',
+            bind(2), blend(GL_ONE_MINUS_SRC_ALPHA), 'draw',
+            bind(3), blend(GL_ONE), 'draw',
+            bind(3), blend(GL_ONE_MINUS_SRC_ALPHA), 'draw',
+            ('glPopAttrib',), ('glDisable', GL_TEXTURE_2D),
+        ])
+
+    def test_no_transition_after_children(self):
+        batch = graphics.Batch(state_sorting=True)
+        first = sprite.SpriteGroup(FakeTexture(1), GL_SRC_ALPHA, GL_ONE)
+        second = sprite.SpriteGroup(FakeTexture(2), GL_SRC_ALPHA, GL_ONE)
+        child = sprite.SpriteGroup(FakeTexture(3), GL_SRC_ALPHA, GL_ONE,
+                                   parent=first)
+        batch.add(4, GL_POINTS, child, 'v2f')
+        batch.add(4, GL_POINTS, second, 'v2f')
+
+        self._run_draw_list(batch)
+        self.assertEqual(batch.state_changes_saved, 0)
+
+        set_state = lambda id: [('glEnable', GL_TEXTURE_2D),
+            ('glBindTexture', GL_TEXTURE_2D, id),
+            ('glPushAttrib', GL_COLOR_BUFFER_BIT), ('glEnable', GL_BLEND),
+            ('glBlendFunc', GL_SRC_ALPHA, GL_ONE)]
+        unset_state = [('glPopAttrib',), ('glDisable', GL_TEXTURE_2D)]
+        self.assertEqual(self.calls,
+            set_state(1) + set_state(3) + ['draw'] + unset_state +
+            unset_state + set_state(2) + ['draw'] + unset_state)
+
+if __name__ == '__main__':
+    unittest.main()
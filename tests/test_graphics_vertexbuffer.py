@@ -0,0 +1,137 @@
+'''Tests for dirty range tracking and streaming buffers in
+pyglet.graphics.vertexbuffer.
+
+OpenGL calls made by the buffers are recorded instead of executed, so no
+context is needed.
+'''
+
+import ctypes
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+pyglet.options['debug_gl'] = False
+
+from pyglet.graphics import vertexbuffer
+from pyglet.gl import *
+
+class FakeContext(object):
+    _workaround_vbo_finish = False
+
+    def __init__(self):
+        self.deleted_buffers = []
+
+    def delete_buffer(self, id):
+        self.deleted_buffers.append(id)
+
+class BufferTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.next_id = 1
+        self.saved_functions = {}
+        functions = dict((name, self._recorder(name)) for name in
+            ('glBindBuffer', 'glBufferData', 'glPushClientAttrib',
+             'glPopClientAttrib'))
+        functions['glGenBuffers'] = self._gen_buffers
+        functions['glDeleteBuffers'] = self._delete_buffers
+        functions['glBufferSubData'] = self._buffer_sub_data
+        for name, function in functions.items():
+            self.saved_functions[name] = getattr(vertexbuffer, name)
+            setattr(vertexbuffer, name, function)
+        self.saved_context = pyglet.gl.current_context
+        pyglet.gl.current_context = FakeContext()
+
+    def tearDown(self):
+        for name, function in self.saved_functions.items():
+            setattr(vertexbuffer, name, function)
+        pyglet.gl.current_context = self.saved_context
+
+    def _recorder(self, name):
+        def record(*args):
+            self.calls.append((name,) + args)
+        return record
+
+    def _gen_buffers(self, count, ids):
+        if isinstance(ids, GLuint):
+            ids.value = self.next_id
+        else:
+            for i in range(count):
+                ids[i] = self.next_id + i
+        self.next_id += count
+
+    def _delete_buffers(self, count, ids):
+        if isinstance(ids, GLuint):
+            ids = [ids.value]
+        self.calls.append(('glDeleteBuffers', list(ids)))
+
+    def _buffer_sub_data(self, target, start, size, ptr):
+        self.calls.append(('glBufferSubData', start, size))
+
+    def uploads(self, buffer):
+        del self.calls[:]
+        buffer.bind()
+        return [call[1:] for call in self.calls
+                if call[0] == 'glBufferSubData']
+
+class DirtyRangesTestCase(BufferTestCase):
+    def create_buffer(self, size):
+        return vertexbuffer.MappableVertexBufferObject(
+            size, GL_ARRAY_BUFFER, GL_DYNAMIC_DRAW)
+
+    def test_sequential_ranges_merged(self):
+        buffer = self.create_buffer(100000)
+        for start in range(0, 8000, 8):
+            buffer.get_region(start, 8, ctypes.POINTER(ctypes.c_byte * 8)
+                              ).invalidate()
+        self.assertEqual(len(buffer._dirty_ranges), 1)
+        self.assertEqual(self.uploads(buffer), [(0, 8000)])
+
+    def test_distant_ranges(self):
+        buffer = self.create_buffer(100000)
+        buffer._invalidate_range(90000, 90010)
+        buffer._invalidate_range(0, 10)
+        buffer._invalidate_range(5, 20)
+        self.assertEqual(self.uploads(buffer), [(0, 20), (90000, 10)])
+
+    def test_ranges_bounded(self):
+        buffer = self.create_buffer(1000000)
+        for i in range(1000):
+            start = (i * 7919) % 100 * 10000
+            buffer._invalidate_range(start, start + 10)
+        self.assertTrue(len(buffer._dirty_ranges) <=
+                        buffer._dirty_ranges_limit)
+        uploads = self.uploads(buffer)
+        self.assertTrue(len(uploads) <= buffer.dirty_max_ranges)
+        self.assertEqual(uploads[0][0], 0)
+        self.assertEqual(sum(uploads[-1]), 990010)
+
+class StreamingBufferTestCase(BufferTestCase):
+    def create_buffer(self, size, buffer_count):
+        return vertexbuffer.StreamingVertexBufferObject(
+            size, GL_ARRAY_BUFFER, GL_STREAM_DRAW, buffer_count)
+
+    def test_round_robin(self):
+        buffer = self.create_buffer(100, 3)
+        ids = []
+        for i in range(4):
+            buffer._invalidate_range(10, 20)
+            self.assertEqual(self.uploads(buffer), [(0, 100)])
+            ids.append(buffer.id)
+        self.assertEqual(ids, [2, 3, 1, 2])
+        # Unchanged buffers are bound without uploading
+        self.assertEqual(self.uploads(buffer), [])
+
+    def test_delete_twice(self):
+        buffer = self.create_buffer(100, 2)
+        buffer.delete()
+        buffer.delete()
+        self.assertEqual([call for call in self.calls
+                          if call[0] == 'glDeleteBuffers'],
+                         [('glDeleteBuffers', [1, 2])])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+'''Tests for vertex domain compaction in pyglet.graphics.vertexdomain.
+
+No OpenGL context is needed; vertex data is kept in client-side arrays.
+'''
+
+import gc
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+pyglet.options['debug_gl'] = False
+
+from pyglet.graphics import vertexdomain
+
+class CompactionTestCase(unittest.TestCase):
+    def create_lists(self, domain, count):
+        vertex_lists = []
+        for i in range(count):
+            vertex_list = domain.create(2)
+            vertex_list.vertices[:] = [i, i, i, -i]
+            vertex_lists.append(vertex_list)
+        return vertex_lists
+
+    def test_not_automatic(self):
+        domain = vertexdomain.create_domain('v2f/none')
+        vertex_lists = self.create_lists(domain, 200)
+        for vertex_list in vertex_lists[:150]:
+            vertex_list.delete()
+        self.assertEqual(vertex_lists[150].start, 300)
+        self.assertEqual(domain.allocator.capacity, 512)
+
+    def test_compact_remaps_starts(self):
+        domain = vertexdomain.create_domain('v2f/none')
+        vertex_lists = self.create_lists(domain, 200)
+        kept = vertex_lists[1::3]
+        for vertex_list in vertex_lists:
+            if vertex_list not in kept:
+                vertex_list.delete()
+        domain.compact()
+
+        self.assertEqual([vertex_list.start for vertex_list in kept],
+                         range(0, 2 * len(kept), 2))
+        self.assertEqual(domain.allocator.capacity, 256)
+        self.assertEqual(domain.allocator.get_allocated_regions(),
+                         ([0], [2 * len(kept)]))
+        for i, vertex_list in zip(range(1, 200, 3), kept):
+            self.assertEqual(list(vertex_list.vertices), [i, i, i, -i])
+
+    def test_automatic_threshold(self):
+        domain = vertexdomain.create_domain('v2f/none')
+        domain.compact_threshold = 0.5
+        vertex_lists = self.create_lists(domain, 200)
+        for vertex_list in vertex_lists[:150]:
+            vertex_list.delete()
+        self.assertTrue(domain.allocator.capacity < 512)
+        for i in range(150, 200):
+            self.assertEqual(list(vertex_lists[i].vertices), [i, i, i, -i])
+
+    def test_indexed_compact(self):
+        domain = vertexdomain.create_indexed_domain('v2f/none')
+        vertex_lists = []
+        for i in range(50):
+            vertex_list = domain.create(3, 4)
+            vertex_list.vertices[:] = [i] * 6
+            vertex_list.indices[:] = [vertex_list.start + j
+                                      for j in (0, 1, 2, 0)]
+            vertex_lists.append(vertex_list)
+        for vertex_list in vertex_lists[:40]:
+            vertex_list.delete()
+        domain.compact()
+
+        for i, vertex_list in enumerate(vertex_lists[40:]):
+            self.assertEqual(vertex_list.start, 3 * i)
+            self.assertEqual(vertex_list.index_start, 4 * i)
+            self.assertEqual(list(vertex_list.indices),
+                             [3 * i, 3 * i + 1, 3 * i + 2, 3 * i])
+            self.assertEqual(list(vertex_list.vertices), [40 + i] * 6)
+
+    def test_lists_not_kept_alive(self):
+        domain = vertexdomain.create_domain('v2f/none')
+        self.create_lists(domain, 10)
+        gc.collect()
+        self.assertEqual(len(domain._vertex_lists), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,283 @@
+'''Tests for pyglet.image.atlas.
+'''
+
+import gc
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from pyglet import image
+from pyglet.gl import GL_TEXTURE_RECTANGLE_ARB
+from pyglet.image import atlas
+
+def overlaps(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+class MaxRectsAllocatorTestCase(unittest.TestCase):
+    def check_free_rects(self, allocator, allocated):
+        # Free rectangles lie within the area, do not overlap allocated
+        # areas and are not contained in one another.
+        for rect in allocator.free_rects:
+            x1, y1, x2, y2 = rect
+            self.assertTrue(0 <= x1 < x2 <= allocator.width)
+            self.assertTrue(0 <= y1 < y2 <= allocator.height)
+            for area in allocated:
+                self.assertFalse(overlaps((x1, y1, x2 - x1, y2 - y1), area))
+            self.assertFalse(atlas._contained(rect, allocator.free_rects))
+
+    def test_fill(self):
+        allocator = atlas.MaxRectsAllocator(64, 64)
+        allocated = set()
+        for i in range(16):
+            x, y = allocator.alloc(16, 16)
+            allocated.add((x, y, 16, 16))
+        self.assertEqual(len(allocated), 16)
+        self.assertEqual(allocator.get_usage(), 1.0)
+        self.assertEqual(allocator.free_rects, [])
+        self.assertRaises(atlas.AllocatorException, allocator.alloc, 1, 1)
+
+    def test_too_large(self):
+        allocator = atlas.MaxRectsAllocator(64, 32)
+        self.assertRaises(atlas.AllocatorException, allocator.alloc, 65, 1)
+        self.assertRaises(atlas.AllocatorException, allocator.alloc, 1, 33)
+        self.assertEqual(allocator.alloc(64, 32), (0, 0))
+
+    def test_mixed_sizes_no_overlap(self):
+        rand = random.Random(1)
+        allocator = atlas.MaxRectsAllocator(256, 256)
+        allocated = []
+        for i in range(200):
+            width, height = rand.randint(1, 40), rand.randint(1, 40)
+            try:
+                x, y = allocator.alloc(width, height)
+            except atlas.AllocatorException:
+                continue
+            area = (x, y, width, height)
+            self.assertTrue(x + width <= 256 and y + height <= 256)
+            for other in allocated:
+                self.assertFalse(overlaps(area, other))
+            allocated.append(area)
+        self.assertEqual(allocator.used_area,
+                         sum([w * h for x, y, w, h in allocated]))
+        self.check_free_rects(allocator, allocated)
+
+    def test_denser_than_strips(self):
+        rand = random.Random(2)
+        sizes = [(rand.randint(4, 48), rand.randint(4, 48))
+                 for i in range(300)]
+
+        def fill(allocator):
+            for width, height in sizes:
+                try:
+                    allocator.alloc(width, height)
+                except atlas.AllocatorException:
+                    pass
+            return allocator.get_usage()
+
+        self.assertTrue(fill(atlas.MaxRectsAllocator(256, 256)) >
+                        fill(atlas.Allocator(256, 256)))
+
+    def test_dealloc_reuse(self):
+        allocator = atlas.MaxRectsAllocator(64, 64)
+        areas = [allocator.alloc(32, 32) + (32, 32) for i in range(4)]
+        self.assertRaises(atlas.AllocatorException, allocator.alloc, 32, 32)
+
+        allocator.dealloc(*areas[1])
+        self.assertEqual(allocator.alloc(32, 32), areas[1][:2])
+
+        # Two adjoining areas (in one column) merge into one free
+        # rectangle.
+        allocator.dealloc(*areas[0])
+        allocator.dealloc(*areas[1])
+        self.check_free_rects(allocator, areas[2:])
+        self.assertEqual(allocator.alloc(32, 64), (0, 0))
+        self.check_free_rects(allocator, [(0, 0, 32, 64)] + areas[2:])
+
+    def test_dealloc_all(self):
+        rand = random.Random(3)
+        allocator = atlas.MaxRectsAllocator(128, 128)
+        allocated = []
+        for i in range(50):
+            width, height = rand.randint(1, 30), rand.randint(1, 30)
+            try:
+                allocated.append(allocator.alloc(width, height) +
+                                 (width, height))
+            except atlas.AllocatorException:
+                pass
+        rand.shuffle(allocated)
+        while allocated:
+            allocator.dealloc(*allocated.pop())
+            self.check_free_rects(allocator, allocated)
+        self.assertEqual(allocator.free_rects, [(0, 0, 128, 128)])
+        self.assertEqual(allocator.get_fragmentation(), 0.)
+
+class AllocatorTestCase(unittest.TestCase):
+    def test_dealloc_strip_tail(self):
+        allocator = atlas.Allocator(64, 64)
+        areas = [allocator.alloc(16, 16) + (16, 16) for i in range(3)]
+        self.assertEqual([area[:2] for area in areas],
+                         [(0, 0), (16, 0), (32, 0)])
+
+        # Only the area at the end of the strip is reused.
+        allocator.dealloc(*areas[1])
+        self.assertEqual(allocator.alloc(16, 16), (48, 0))
+        allocator.dealloc(48, 0, 16, 16)
+        self.assertEqual(allocator.alloc(16, 16), (48, 0))
+
+        allocator.dealloc(48, 0, 16, 16)
+        allocator.dealloc(*areas[2])
+        self.assertEqual(allocator.alloc(32, 16), (32, 0))
+
+    def test_dealloc_all(self):
+        allocator = atlas.Allocator(64, 64)
+        areas = [allocator.alloc(40, 20) + (40, 20) for i in range(3)]
+        for area in areas:
+            allocator.dealloc(*area)
+        self.assertEqual(allocator.get_usage(), 0.)
+        self.assertEqual(allocator.alloc(64, 64), (0, 0))
+
+class FakeTexture(image.Texture):
+    # A texture that records blits instead of calling OpenGL.
+    def __init__(self, width, height):
+        super(FakeTexture, self).__init__(width, height,
+                                          GL_TEXTURE_RECTANGLE_ARB, 1)
+        self.blits = []
+
+    def blit_into(self, source, x, y, z):
+        self.blits.append((x, y, source.width, source.height))
+
+    def __del__(self):
+        pass
+
+class TextureAtlasTestCase(unittest.TestCase):
+    def setUp(self):
+        self.create = image.Texture.__dict__['create']
+        image.Texture.create = classmethod(
+            lambda cls, width, height, *args, **kwargs:
+                FakeTexture(width, height))
+
+    def tearDown(self):
+        image.Texture.create = self.create
+
+    def image(self, width, height):
+        return image.ImageData(width, height, 'RGBA',
+                               '\0' * (width * height * 4))
+
+    def test_no_reclaim_by_default(self):
+        texture_atlas = atlas.TextureAtlas(64, 64)
+        region = texture_atlas.add(self.image(64, 32))
+        self.assertEqual((region.x, region.y), (0, 0))
+        del region
+        gc.collect()
+
+        region = texture_atlas.add(self.image(64, 32))
+        self.assertEqual((region.x, region.y), (0, 32))
+        self.assertRaises(atlas.AllocatorException,
+                          texture_atlas.add, self.image(64, 32))
+
+    def test_reclaim(self):
+        texture_atlas = atlas.TextureAtlas(64, 64, reclaim=True)
+        region = texture_atlas.add(self.image(64, 64))
+        self.assertRaises(atlas.AllocatorException,
+                          texture_atlas.add, self.image(1, 1))
+        del region
+        gc.collect()
+
+        region = texture_atlas.add(self.image(64, 64))
+        self.assertEqual((region.x, region.y), (0, 0))
+
+    def test_derived_regions_keep_area(self):
+        texture_atlas = atlas.TextureAtlas(64, 64, reclaim=True)
+        region = texture_atlas.add(self.image(64, 32))
+        grid = image.TextureGrid(image.ImageGrid(region, 2, 2))
+        transformed = region.get_transform(flip_x=True)
+        frame = grid[3]
+        del region, grid
+        gc.collect()
+
+        # The frame and transformed image keep the sheet in use.
+        region = texture_atlas.add(self.image(64, 32))
+        self.assertEqual((region.x, region.y), (0, 32))
+        self.assertEqual((frame.x, frame.y), (32, 16))
+
+        del transformed, frame
+        gc.collect()
+        region = texture_atlas.add(self.image(64, 32))
+        self.assertEqual((region.x, region.y), (0, 0))
+
+    def test_texture_grid_survives(self):
+        texture_atlas = atlas.TextureAtlas(64, 64, reclaim=True)
+        grid = image.TextureGrid(image.ImageGrid(
+            texture_atlas.add(self.image(64, 32)), 2, 2))
+        gc.collect()
+        region = texture_atlas.add(self.image(64, 32))
+        self.assertEqual((region.x, region.y), (0, 32))
+        self.assertRaises(atlas.AllocatorException,
+                          texture_atlas.add, self.image(1, 1))
+
+        del grid
+        gc.collect()
+        self.assertEqual(gc.garbage, [])
+        region = texture_atlas.add(self.image(64, 32))
+        self.assertEqual((region.x, region.y), (0, 0))
+
+    def test_remove(self):
+        texture_atlas = atlas.TextureAtlas(64, 64)
+        region = texture_atlas.add(self.image(64, 64))
+        texture_atlas.remove(region)
+        region = texture_atlas.add(self.image(64, 64))
+        self.assertEqual((region.x, region.y), (0, 0))
+
+    def test_keyed_kept_without_reclaim(self):
+        texture_atlas = atlas.TextureAtlas(64, 64)
+        texture_atlas.add(self.image(64, 32), 'a')
+        gc.collect()
+        texture_atlas.add(self.image(64, 32))
+        self.assertRaises(atlas.AllocatorException,
+                          texture_atlas.add, self.image(64, 32))
+
+        region = texture_atlas.get('a')
+        self.assertEqual((region.x, region.y), (0, 0))
+        self.assertTrue(texture_atlas.get('a') is region)
+        self.assertEqual(len(texture_atlas.texture.blits), 2)
+
+    def test_keyed_evicted_with_reclaim(self):
+        texture_atlas = atlas.TextureAtlas(64, 64, reclaim=True)
+        texture_atlas.add(self.image(64, 32), 'a')
+        texture_atlas.add(self.image(64, 32), 'b')
+        gc.collect()
+
+        # Retrieving and releasing 'a' again makes 'b' the least recently
+        # released, so it is evicted first.
+        self.assertEqual(texture_atlas.get('a').y, 0)
+        gc.collect()
+        region = texture_atlas.add(self.image(64, 32))
+        self.assertEqual(region.y, 32)
+        self.assertEqual(texture_atlas.get('b'), None)
+        self.assertEqual(texture_atlas.get('a').y, 0)
+
+    def test_bin_reclaim(self):
+        texture_bin = atlas.TextureBin(64, 64)
+        region = texture_bin.add(self.image(64, 64))
+        del region
+        gc.collect()
+        texture_bin.add(self.image(64, 64))
+        self.assertEqual(len(texture_bin.atlases), 2)
+
+        texture_bin = atlas.TextureBin(64, 64, reclaim=True)
+        region = texture_bin.add(self.image(64, 64))
+        del region
+        gc.collect()
+        texture_bin.add(self.image(64, 64))
+        self.assertEqual(len(texture_bin.atlases), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+'''Tests for pixel format conversion in pyglet.image.ImageData.
+'''
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from pyglet import image
+
+def _reference_convert(data, width, height, format, pitch, new_format,
+                       new_pitch):
+    # Pixel by pixel conversion; missing components are taken from the
+    # first component, and rows are padded with zero bytes.
+    rows = [data[y * abs(pitch):(y + 1) * abs(pitch)] for y in range(height)]
+    components = len(format)
+    result = []
+    for row in rows:
+        out = []
+        for x in range(width):
+            pixel = row[x * components:(x + 1) * components]
+            for c in new_format:
+                i = format.find(c)
+                out.append(pixel[max(i, 0)])
+        out = ''.join(out)
+        out += '\0' * (abs(new_pitch) - len(out))
+        result.append(out[:abs(new_pitch)])
+    if pitch * new_pitch < 0:
+        result.reverse()
+    return ''.join(result)
+
+class ConvertTestCase(unittest.TestCase):
+    def create(self, width, height, format, pitch):
+        rand = random.Random(width * height)
+        data = ''.join([chr(rand.randrange(256))
+                        for i in range(abs(pitch) * height)])
+        return image.ImageData(width, height, format, data, pitch), data
+
+    def test_conversions(self):
+        width, height = 7, 5
+        for format, new_format in (('RGBA', 'BGRA'), ('RGBA', 'RGB'),
+                                   ('RGB', 'RGBA'), ('BGRA', 'ARGB'),
+                                   ('L', 'RGB'), ('LA', 'RGBA'),
+                                   ('RGB', 'RGB')):
+            for pitch_pad, new_pitch_pad in ((0, 0), (3, 0), (0, 5)):
+                for sign in (1, -1):
+                    pitch = width * len(format) + pitch_pad
+                    new_pitch = sign * (width * len(new_format) +
+                                        new_pitch_pad)
+                    img, data = self.create(width, height, format, pitch)
+                    self.assertEqual(
+                        img.get_data(new_format, new_pitch),
+                        _reference_convert(data, width, height, format,
+                                           pitch, new_format, new_pitch),
+                        (format, pitch, new_format, new_pitch))
+
+    def test_cache_keeps_last_conversion(self):
+        img, data = self.create(4, 4, 'RGBA', 16)
+        bgra = img.get_data('BGRA', 16)
+        self.assertTrue(img.get_data('BGRA', 16) is bgra)
+        rgb = img.get_data('RGB', 12)
+        self.assertTrue(img.get_data('RGB', 12) is rgb)
+        # Only the last conversion is kept
+        self.assertFalse(img.get_data('BGRA', 16) is bgra)
+        self.assertEqual(img.get_data('BGRA', 16), bgra)
+
+    def test_cache_cleared_by_set_data(self):
+        img, data = self.create(4, 4, 'RGBA', 16)
+        img.get_data('BGRA', 16)
+        img.set_data('RGBA', 16, '\1\2\3\4' * 16)
+        self.assertEqual(img.get_data('BGRA', 16), '\3\2\1\4' * 16)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+'''Tests for the DXT encoders in pyglet.image.codecs.s3tc and the DDS
+encoder, checked by decoding with pyglet's software decoders.
+'''
+
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from pyglet import image
+from pyglet.gl import *
+from pyglet.image.codecs import dds
+from pyglet.image.codecs import s3tc
+
+numpy = s3tc.numpy
+
+def decode_rgba(decoded):
+    # Return the pixels of a PackedImageData as a list of RGBA tuples.
+    decoded.unpack()
+    data = bytearray(decoded.data)
+    if decoded.format == GL_RGB:
+        return [tuple(data[i:i + 3]) + (255,)
+                for i in range(0, len(data), 3)]
+    return [tuple(data[i:i + 4]) for i in range(0, len(data), 4)]
+
+def expand_565(r, g, b):
+    # Color as decoded by decode_dxt1_rgb, which does not replicate bits.
+    return r & 0xf8, g & 0xfc, b & 0xf8
+
+def pixels_from(block_colors, width, height):
+    # Build RGBA data of width x height where each 4x4 block at (bx, by)
+    # has the colors given by block_colors(bx, by, x, y).
+    data = []
+    for y in range(height):
+        for x in range(width):
+            data.append(block_colors(x // 4, y // 4, x % 4, y % 4))
+    return data
+
+def pack(pixels):
+    return ''.join([''.join(map(chr, pixel)) for pixel in pixels])
+
+@unittest.skipIf(numpy is None, 'DXT encoding requires NumPy')
+class DXTEncoderTestCase(unittest.TestCase):
+    def test_dxt1_solid_blocks(self):
+        colors = [(248, 0, 0, 255), (0, 252, 0, 255), (0, 0, 248, 255),
+                  (128, 64, 32, 255), (0, 0, 0, 255), (248, 252, 248, 255)]
+        pixels = pixels_from(lambda bx, by, x, y: colors[by * 3 + bx], 12, 8)
+        data = s3tc.encode_dxt1(pack(pixels), 12, 8)
+        self.assertEqual(len(data), 6 * 8)
+        self.assertEqual(decode_rgba(s3tc.decode_dxt1_rgb(data, 12, 8)),
+                         pixels)
+
+    def test_dxt1_two_colors(self):
+        # Each block uses two colors, exactly representable as 5:6:5, so
+        # they are the end points and decode exactly.
+        def block_colors(bx, by, x, y):
+            if (x + y + bx) % 2:
+                return (200, 100, 40, 255)
+            return (16, 32 * (by + 1), 240, 255)
+        pixels = pixels_from(block_colors, 8, 8)
+        expected = [expand_565(*pixel[:3]) + (255,) for pixel in pixels]
+        data = s3tc.encode_dxt1(pack(pixels), 8, 8)
+        self.assertEqual(decode_rgba(s3tc.decode_dxt1_rgb(data, 8, 8)),
+                         expected)
+
+    def test_dxt1_gradient(self):
+        # Colors along a line within each block are interpolated from the
+        # end points, to within the 5:6:5 quantisation error.
+        pixels = pixels_from(lambda bx, by, x, y:
+            ((bx * 4 + x) * 16, by * 64 + x * 20, 128, 255), 16, 16)
+        data = s3tc.encode_dxt1(pack(pixels), 16, 16)
+        decoded = decode_rgba(s3tc.decode_dxt1_rgb(data, 16, 16))
+        error = max([abs(a - b) for pixel, result in zip(pixels, decoded)
+                     for a, b in zip(pixel, result)])
+        self.assertTrue(error <= 8, error)
+
+    def test_dxt1_unaligned(self):
+        # Images are padded to whole blocks by repeating the edges.
+        pixels = pixels_from(lambda bx, by, x, y:
+            (bx * 248, by * 252, 0, 255), 6, 5)
+        data = s3tc.encode_dxt1(pack(pixels), 6, 5)
+        self.assertEqual(len(data), 4 * 8)
+        decoded = decode_rgba(s3tc.decode_dxt1_rgb(data, 8, 8))
+        self.assertEqual([decoded[y * 8 + x]
+                          for y in range(5) for x in range(6)], pixels)
+
+    def test_dxt5_alpha(self):
+        def block_colors(bx, by, x, y):
+            alpha = (0, 255, 128, 37)[(x + y) % 2 + bx * 2]
+            if y >= 2:
+                alpha = (255, 0, 37, 128)[(x + y) % 2 + bx * 2]
+            return (248, 252 * by, 0, alpha)
+        pixels = pixels_from(block_colors, 8, 8)
+        data = s3tc.encode_dxt5(pack(pixels), 8, 8)
+        self.assertEqual(len(data), 4 * 16)
+        self.assertEqual(decode_rgba(s3tc.decode_dxt5(data, 8, 8)), pixels)
+
+    def test_dxt5_alpha_ramp(self):
+        pixels = pixels_from(lambda bx, by, x, y:
+            (0, 0, 0, (y * 4 + x) * 17), 4, 4)
+        data = s3tc.encode_dxt5(pack(pixels), 4, 4)
+        decoded = decode_rgba(s3tc.decode_dxt5(data, 4, 4))
+        error = max([abs(pixel[3] - result[3])
+                     for pixel, result in zip(pixels, decoded)])
+        self.assertTrue(error <= 255 // 14 + 1, error)
+
+@unittest.skipIf(numpy is None, 'DDS encoding requires NumPy')
+class DDSEncoderTestCase(unittest.TestCase):
+    def round_trip(self, img, compression=None):
+        file = StringIO()
+        dds.DDSImageEncoder(compression).encode(img, file, 'test.dds')
+        file.seek(0)
+        return dds.DDSImageDecoder().decode(file, 'test.dds')
+
+    def test_opaque_dxt1(self):
+        pixels = pixels_from(lambda bx, by, x, y:
+            (bx * 248, by * 252, 128, 255), 8, 8)
+        img = self.round_trip(image.ImageData(8, 8, 'RGBA', pack(pixels)))
+        self.assertTrue(isinstance(img, image.CompressedImageData))
+        self.assertEqual((img.width, img.height), (8, 8))
+        self.assertEqual(img.gl_format, GL_COMPRESSED_RGB_S3TC_DXT1_EXT)
+        expected = [expand_565(*pixel[:3]) + (255,) for pixel in pixels]
+        self.assertEqual(decode_rgba(img.decoder(img.data, 8, 8)), expected)
+
+    def test_transparent_dxt5(self):
+        pixels = pixels_from(lambda bx, by, x, y:
+            (248, 0, 248, (x % 2) * 255), 4, 4)
+        img = self.round_trip(image.ImageData(4, 4, 'RGBA', pack(pixels)))
+        self.assertEqual(img.gl_format, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT)
+        self.assertEqual(decode_rgba(img.decoder(img.data, 4, 4)), pixels)
+
+    def test_forced_compression(self):
+        pixels = pixels_from(lambda bx, by, x, y: (0, 0, 0, 255), 4, 4)
+        img = self.round_trip(image.ImageData(4, 4, 'RGBA', pack(pixels)),
+                              'DXT5')
+        self.assertEqual(img.gl_format, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT)
+        self.assertRaises(dds.DDSEncodeException, self.round_trip,
+            image.ImageData(4, 4, 'RGBA', pack(pixels)), 'DXT3')
+
+    def test_padded(self):
+        pixels = pixels_from(lambda bx, by, x, y:
+            (bx * 248, by * 252, 0, 255), 6, 3)
+        img = self.round_trip(image.ImageData(6, 3, 'RGBA', pack(pixels)))
+        self.assertEqual((img.width, img.height), (8, 4))
+        self.assertEqual((img.content_width, img.content_height), (6, 3))
+        decoded = decode_rgba(img.decoder(img.data, 8, 4))
+        self.assertEqual([decoded[y * 8 + x]
+                          for y in range(3) for x in range(6)], pixels)
+        # Padding repeats the last column and row.
+        self.assertEqual(decoded[3 * 8 + 7], pixels[-1])
+
+    def test_unpadded_header(self):
+        pixels = pixels_from(lambda bx, by, x, y: (0, 0, 0, 255), 4, 4)
+        img = self.round_trip(image.ImageData(4, 4, 'RGBA', pack(pixels)))
+        self.assertFalse(isinstance(img, dds._PaddedCompressedImageData))
+
+if __name__ == '__main__':
+    unittest.main()
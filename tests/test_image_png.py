@@ -0,0 +1,141 @@
+'''Tests for the PNG decoder fast path in pyglet.image.codecs.png.
+
+Images with random data and every filter type are decoded both by the fast
+path and by PyPNG, and the results compared.
+'''
+
+import os
+import random
+import struct
+import sys
+import unittest
+import zlib
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from pyglet.image.codecs import png
+
+def _chunk(tag, data):
+    crc = zlib.crc32(data, zlib.crc32(tag)) & 0xffffffff
+    return struct.pack('!I', len(data)) + tag + data + struct.pack('!I', crc)
+
+def _make_png(width, height, color_type, filters, palette=None,
+              transparency=None, seed=0):
+    # Random image data with the given filter type for each row.
+    rand = random.Random(seed)
+    row_bytes = width * png._color_type_planes[color_type]
+    rows = []
+    for y in range(height):
+        rows.append(chr(filters[y % len(filters)]))
+        rows.append(''.join([chr(rand.randrange(256))
+                             for i in range(row_bytes)]))
+    chunks = [_chunk('IHDR', struct.pack('!2I5B', width, height, 8,
+                                         color_type, 0, 0, 0))]
+    if palette is not None:
+        chunks.append(_chunk('PLTE', palette))
+    if transparency is not None:
+        chunks.append(_chunk('tRNS', transparency))
+    data = zlib.compress(''.join(rows))
+    # Split the image data over several IDAT chunks
+    for i in range(0, len(data), 1000):
+        chunks.append(_chunk('IDAT', data[i:i + 1000]))
+    chunks.append(_chunk('IEND', ''))
+    return png._signature + ''.join(chunks)
+
+class PNGFastPathTestCase(unittest.TestCase):
+    # Row filter patterns: each filter type alone, short runs of average
+    # and Paeth rows (reconstructed row by row), and long runs
+    # (reconstructed by diagonals).
+    filter_patterns = [[0], [1], [2], [3], [4], range(5), [3, 3, 4, 2]]
+
+    def setUp(self):
+        self.decoder = png.PNGImageDecoder()
+
+    def decode_both(self, data):
+        fast = png._decode_fast(data)
+        self.assertNotEqual(fast, None)
+        fast_image = self.decoder.decode(StringIO(data), 'test.png')
+        pypng_image = self.decoder._decode_pypng(StringIO(data), 'test.png')
+        return fast_image, pypng_image
+
+    def check_same(self, data):
+        fast_image, pypng_image = self.decode_both(data)
+        self.assertEqual(fast_image.format, pypng_image.format)
+        pitch = fast_image.width * len(fast_image.format)
+        self.assertEqual(fast_image.get_data(fast_image.format, pitch),
+                         pypng_image.get_data(fast_image.format, pitch))
+
+    def test_color_types(self):
+        if png.numpy is None:
+            return
+        for color_type in (0, 2, 4, 6):
+            for filters in self.filter_patterns:
+                self.check_same(_make_png(100, 30, color_type, filters))
+
+    def test_odd_sizes(self):
+        if png.numpy is None:
+            return
+        for width, height in ((1, 1), (1, 40), (37, 3), (300, 1)):
+            for filters in self.filter_patterns:
+                self.check_same(_make_png(width, height, 6, filters))
+
+    def test_palette_transparency(self):
+        if png.numpy is None:
+            return
+        # The red component of each palette entry is its index.
+        palette = ''.join([chr(i) + chr(255 - i) + chr(i * 7 & 0xff)
+                           for i in range(256)])
+        transparency = ''.join([chr(i * 5 & 0xff) for i in range(100)])
+        for filters in self.filter_patterns:
+            data = _make_png(60, 20, 3, filters, palette, transparency)
+            fast_image, pypng_image = self.decode_both(data)
+
+            # Colours match PyPNG.  PyPNG ignores tRNS; the fast path gives
+            # each palette entry its alpha, or 255 past the end of tRNS.
+            self.assertEqual(fast_image.format, 'RGBA')
+            pitch = fast_image.width * 3
+            self.assertEqual(fast_image.get_data('RGB', pitch),
+                             pypng_image.get_data('RGB', pitch))
+            rgba = fast_image.get_data('RGBA', fast_image.width * 4)
+            for i in range(0, len(rgba), 4):
+                index = ord(rgba[i])
+                if index < len(transparency):
+                    self.assertEqual(rgba[i + 3], transparency[index])
+                else:
+                    self.assertEqual(rgba[i + 3], '\xff')
+
+    def test_palette_opaque(self):
+        if png.numpy is None:
+            return
+        palette = ''.join([chr(i) * 3 for i in range(256)])
+        self.check_same(_make_png(40, 10, 3, range(5), palette))
+
+    def test_without_numpy(self):
+        numpy = png.numpy
+        png.numpy = None
+        try:
+            self.check_same(_make_png(50, 10, 2, [0]))
+            for filters in ([1], [0, 0, 3]):
+                self.assertEqual(
+                    png._decode_fast(_make_png(50, 10, 2, filters)), None)
+            palette = ''.join([chr(i) * 3 for i in range(256)])
+            self.assertEqual(
+                png._decode_fast(_make_png(8, 8, 3, [0], palette)), None)
+        finally:
+            png.numpy = numpy
+
+    def test_fallback_to_pypng(self):
+        # 16-bit images are left to PyPNG
+        data = _make_png(4, 4, 2, [0]).replace(
+            _chunk('IHDR', struct.pack('!2I5B', 4, 4, 8, 2, 0, 0, 0)),
+            _chunk('IHDR', struct.pack('!2I5B', 2, 4, 16, 2, 0, 0, 0)))
+        self.assertEqual(png._decode_fast(data), None)
+        image = self.decoder.decode(StringIO(data), 'test.png')
+        self.assertEqual((image.width, image.height), (2, 4))
+
+if __name__ == '__main__':
+    unittest.main()
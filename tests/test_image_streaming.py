@@ -0,0 +1,203 @@
+'''Tests for budgeted texture uploads with pyglet.image.TextureStreamer.
+
+OpenGL calls made by the streamer are emulated, so no context is needed.
+'''
+
+import ctypes
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+pyglet.options['debug_gl'] = False
+
+from pyglet import image
+from pyglet.gl import *
+
+class StreamerTestCase(unittest.TestCase):
+    pbo = True
+    sync = True
+
+    def setUp(self):
+        self.saved = []
+        self.uploads = []
+        self.rows = {}
+        self.fences = []
+        self.waited = []
+        self.signalled = True
+        self.buffer = None
+        self.buffer_bound = 0
+
+        self.patch(image.Texture, 'create', classmethod(
+            lambda cls, width, height, *args, **kwargs:
+                image.Texture(width, height, GL_TEXTURE_2D, 1)))
+        self.patch(image.gl_info, 'have_version',
+                   lambda major, minor=0, release=0:
+                       (major, minor) <= (2, 1) and self.pbo or
+                       (major, minor) <= (3, 2) and self.sync)
+        self.patch(image.gl_info, 'have_extension', lambda name: False)
+        for name in ('glBindTexture', 'glPushClientAttrib', 'glPixelStorei',
+                     'glPopClientAttrib', 'glUnmapBuffer', 'glDeleteBuffers'):
+            self.patch(image, name, lambda *args: None)
+        self.patch(image, 'glGenBuffers', self._gen_buffers)
+        self.patch(image, 'glBindBuffer', self._bind_buffer)
+        self.patch(image, 'glBufferData', self._buffer_data)
+        self.patch(image, 'glMapBuffer', self._map_buffer)
+        self.patch(image, 'glTexSubImage2D', self._tex_sub_image)
+        self.patch(image, 'glFenceSync', self._fence_sync)
+        self.patch(image, 'glClientWaitSync', self._client_wait_sync)
+        self.patch(image, 'glDeleteSync', self.fences.remove)
+
+    def tearDown(self):
+        for obj, name, value in reversed(self.saved):
+            setattr(obj, name, value)
+
+    def patch(self, obj, name, value):
+        self.saved.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def _gen_buffers(self, count, id):
+        id._obj.value = 7
+
+    def _bind_buffer(self, target, id):
+        self.buffer_bound = id
+
+    def _buffer_data(self, target, size, data, usage):
+        self.buffer = ctypes.create_string_buffer(size)
+
+    def _map_buffer(self, target, access):
+        return ctypes.addressof(self.buffer)
+
+    def _tex_sub_image(self, target, level, x, y, width, height, format,
+                       type, pixels):
+        row_bytes = width * 4
+        if pixels is None:
+            self.assertEqual(self.buffer_bound, 7)
+            data = self.buffer.raw
+        else:
+            self.assertEqual(self.buffer_bound, 0)
+            data = ctypes.string_at(pixels.value, row_bytes * height)
+        self.uploads.append(row_bytes * height)
+        for i in range(height):
+            self.rows[y + i] = data[i * row_bytes:(i + 1) * row_bytes]
+
+    def _fence_sync(self, condition, flags):
+        fence = object()
+        self.fences.append(fence)
+        return fence
+
+    def _client_wait_sync(self, fence, flags, timeout):
+        # A fence stays signalled once a blocking wait on it has returned.
+        if timeout:
+            self.waited.append(fence)
+        if self.signalled or fence in self.waited:
+            return GL_ALREADY_SIGNALED
+        return GL_TIMEOUT_EXPIRED
+
+    def image(self, width, height):
+        data = ''.join([chr(i & 0xff) for i in range(width * height * 4)])
+        return image.ImageData(width, height, 'RGBA', data), data
+
+    def uploaded(self, height):
+        return ''.join([self.rows[y] for y in range(height)])
+
+    def test_budget(self):
+        img, data = self.image(16, 32)
+        streamer = image.TextureStreamer(bytes_per_frame=16 * 4 * 5)
+        upload = streamer.stream(img)
+        self.assertEqual((upload.texture.width, upload.texture.height),
+                         (16, 32))
+        self.assertEqual(self.uploads, [])
+
+        frames = 0
+        while not upload.done():
+            del self.uploads[:]
+            streamer.update(1 / 60.)
+            self.assertTrue(sum(self.uploads) <= streamer.bytes_per_frame)
+            frames += 1
+        self.assertEqual(frames, 7)
+        self.assertEqual(self.uploaded(32), data)
+
+    def test_row_larger_than_budget(self):
+        img, data = self.image(16, 4)
+        streamer = image.TextureStreamer(bytes_per_frame=10)
+        upload = streamer.stream(img)
+        for i in range(4):
+            self.assertFalse(upload.done())
+            del self.uploads[:]
+            streamer.update()
+            self.assertEqual(self.uploads, [16 * 4])
+        self.assertTrue(upload.done())
+        self.assertEqual(self.uploaded(4), data)
+
+    def test_queue_order_and_callbacks(self):
+        first, first_data = self.image(8, 4)
+        second, second_data = self.image(8, 4)
+        streamer = image.TextureStreamer(bytes_per_frame=8 * 4 * 6)
+        done = []
+        uploads = [streamer.stream(first), streamer.stream(second)]
+        for upload in uploads:
+            upload.add_done_callback(done.append)
+
+        # The first image and half of the second fit in the first frame.
+        streamer.update()
+        self.assertEqual(done, [uploads[0]])
+        self.assertEqual(sorted(self.rows), range(4))
+        streamer.update()
+        self.assertEqual(done, uploads)
+
+        late = []
+        uploads[0].add_done_callback(late.append)
+        self.assertEqual(late, [uploads[0]])
+
+    def test_fence_pending(self):
+        img, data = self.image(8, 2)
+        streamer = image.TextureStreamer()
+        upload = streamer.stream(img)
+        self.signalled = False
+        streamer.update()
+        self.assertFalse(upload.done())
+        self.assertEqual(len(self.fences), 1)
+
+        self.signalled = True
+        streamer.update()
+        self.assertTrue(upload.done())
+        self.assertEqual(self.fences, [])
+
+    def test_result(self):
+        img, data = self.image(8, 8)
+        streamer = image.TextureStreamer(bytes_per_frame=8 * 4)
+        upload = streamer.stream(img)
+        streamer.update()
+        self.signalled = False
+        self.assertTrue(upload.result() is upload.texture)
+        self.assertTrue(upload.done())
+        self.assertEqual(self.fences, [])
+        self.assertEqual(self.uploaded(8), data)
+        self.assertEqual(streamer._queue, [])
+
+    def test_flush(self):
+        streamer = image.TextureStreamer(bytes_per_frame=1)
+        uploads = [streamer.stream(self.image(4, 4)[0]) for i in range(3)]
+        streamer.flush()
+        self.assertTrue(all(upload.done() for upload in uploads))
+
+class ClientMemoryStreamerTestCase(StreamerTestCase):
+    # Without pixel buffer objects or fences, rows are uploaded from the
+    # image data directly.
+    pbo = False
+    sync = False
+
+    def test_fence_pending(self):
+        img, data = self.image(8, 2)
+        streamer = image.TextureStreamer()
+        upload = streamer.stream(img)
+        streamer.update()
+        self.assertTrue(upload.done())
+        self.assertEqual(self.fences, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,316 @@
+'''Tests for pyglet.resource loaders.
+
+Images are loaded as image data only, so no OpenGL context is needed.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+
+from pyglet import image
+from pyglet import resource
+from pyglet.gl import GL_TEXTURE_2D
+from pyglet.gl import gl_info
+from pyglet.image.codecs import dds
+
+class ResourceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.resource_dir = os.path.join(self.dir, 'res')
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        os.mkdir(self.resource_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_image(self, name, width=4, height=3, value=0):
+        data = ''.join([chr((value + i) & 0xff)
+                        for i in range(width * height * 4)])
+        img = image.ImageData(width, height, 'RGBA', data)
+        img.save(os.path.join(self.resource_dir, name))
+        return data
+
+    def loader(self, **kwargs):
+        return resource.Loader(path=[self.resource_dir], **kwargs)
+
+    def get_data(self, img, pitch):
+        # Cached images hold a ctypes array mapped from the cache file.
+        return str(bytearray(img.get_data('RGBA', pitch)))
+
+class DecodedImageCacheTestCase(ResourceTestCase):
+    def test_round_trip(self):
+        data = self.write_image('a.png')
+        img = self.loader(cache_dir=self.cache_dir)._load_image('a.png')
+        self.assertEqual(self.get_data(img, 16), data)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        # A new loader reads the decoded data from the cache
+        loader = self.loader(cache_dir=self.cache_dir)
+        source = loader._get_cache_source('a.png')
+        cached = resource._read_cached_image(self.cache_dir, *source)
+        self.assertNotEqual(cached, None)
+        self.assertEqual((cached.width, cached.height), (4, 3))
+        self.assertEqual(self.get_data(cached, 16), data)
+        self.assertEqual(self.get_data(loader._load_image('a.png'), 16), data)
+
+    def test_source_changed(self):
+        self.write_image('a.png')
+        self.loader(cache_dir=self.cache_dir)._load_image('a.png')
+        data = self.write_image('a.png', 5, 3, value=100)
+        filename = os.path.join(self.resource_dir, 'a.png')
+        os.utime(filename, (0, 0))
+
+        loader = self.loader(cache_dir=self.cache_dir)
+        self.assertEqual(resource._read_cached_image(
+            self.cache_dir, *loader._get_cache_source('a.png')), None)
+        img = loader._load_image('a.png')
+        self.assertEqual(self.get_data(img, 20), data)
+
+    def test_corrupt_cache_ignored(self):
+        data = self.write_image('a.png')
+        loader = self.loader(cache_dir=self.cache_dir)
+        loader._load_image('a.png')
+        source = loader._get_cache_source('a.png')
+        file = open(resource._get_cache_filename(self.cache_dir, source[0]),
+                    'wb')
+        file.write('garbage')
+        file.close()
+        img = self.loader(cache_dir=self.cache_dir)._load_image('a.png')
+        self.assertEqual(self.get_data(img, 16), data)
+
+    def test_no_cache_dir(self):
+        self.write_image('a.png')
+        self.loader()._load_image('a.png')
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+class IndexTestCase(ResourceTestCase):
+    def test_reject_traversal(self):
+        open(os.path.join(self.dir, 'secret.txt'), 'w').close()
+        open(os.path.join(self.resource_dir, 'a.txt'), 'w').close()
+        loader = self.loader()
+        self.assertEqual(loader.file('a.txt').read(), '')
+        for name in ('../secret.txt', 'sub/../../secret.txt', './a.txt',
+                     'sub//a.txt', os.path.join(self.dir, 'secret.txt'),
+                     '/a.txt', ''):
+            self.assertRaises(resource.ResourceNotFoundException,
+                              loader.location, name)
+
+    def test_subdirectory(self):
+        os.mkdir(os.path.join(self.resource_dir, 'sub'))
+        open(os.path.join(self.resource_dir, 'sub', 'b.txt'), 'w').close()
+        loader = self.loader()
+        self.assertEqual(loader.file('sub/b.txt').read(), '')
+        self.assertRaises(resource.ResourceNotFoundException,
+                          loader.location, 'sub/c.txt')
+
+    def test_index_round_trip(self):
+        index = {'/a': (1.5, frozenset(['x.png', 'y.png'])),
+                 '/b': (2.0, frozenset())}
+        file = StringIO()
+        resource._dump_index(index, file)
+        self.assertEqual(resource._load_index(StringIO(file.getvalue())),
+                         index)
+        self.assertRaises(Exception, resource._load_index,
+                          StringIO('{"/a": 1}'))
+
+    def test_stored_index_used(self):
+        open(os.path.join(self.resource_dir, 'a.txt'), 'w').close()
+        loader = self.loader(cache_dir=self.cache_dir)
+        loader.location('a.txt')
+        loader._store_index()
+
+        listdir = os.listdir
+        listed = []
+        def record_listdir(path):
+            listed.append(path)
+            return listdir(path)
+        os.listdir = record_listdir
+        try:
+            loader = self.loader(cache_dir=self.cache_dir)
+            loader.location('a.txt')
+            self.assertEqual(listed, [])
+
+            # A modified directory is listed again
+            open(os.path.join(self.resource_dir, 'b.txt'), 'w').close()
+            os.utime(self.resource_dir, (0, 0))
+            loader = self.loader(cache_dir=self.cache_dir)
+            loader.location('b.txt')
+            self.assertEqual(listed, [self.resource_dir])
+        finally:
+            os.listdir = listdir
+
+    def test_loaders_share_index(self):
+        other_dir = os.path.join(self.dir, 'other')
+        os.mkdir(other_dir)
+        first = self.loader(cache_dir=self.cache_dir)
+        second = resource.Loader(path=[other_dir], cache_dir=self.cache_dir)
+        open(os.path.join(self.resource_dir, 'a.txt'), 'w').close()
+        open(os.path.join(other_dir, 'b.txt'), 'w').close()
+        first.location('a.txt')
+        second.location('b.txt')
+        first._store_index()
+        second._store_index()
+
+        stored = self.loader(cache_dir=self.cache_dir)._get_stored_index()
+        self.assertEqual(sorted(stored), sorted([self.resource_dir,
+                                                 other_dir]))
+
+class PreloadTestCase(ResourceTestCase):
+    def loader(self, **kwargs):
+        # Keep image data instead of uploading it to a texture.
+        loader = super(PreloadTestCase, self).loader(**kwargs)
+        loader._upload_image = lambda img, atlas=True: img
+        return loader
+
+    def check_preload(self, **kwargs):
+        names = ['%d.png' % i for i in range(6)]
+        data = dict((name, self.write_image(name, value=i * 10))
+                    for i, name in enumerate(names))
+        progress = []
+        loader = self.loader(cache_dir=self.cache_dir)
+        images = loader.preload(names + names[:2],
+            callback=lambda *args: progress.append(args), **kwargs)
+
+        self.assertEqual(len(images), 8)
+        for name, img in zip(names + names[:2], images):
+            self.assertEqual(self.get_data(img, 16), data[name])
+        self.assertEqual(sorted(name for name, _, _ in progress), names)
+        self.assertEqual([args[1:] for args in progress],
+                         [(i, 6) for i in range(1, 7)])
+        self.assertTrue(loader.image('3.png') is images[3])
+
+        # Decoded images were written to the cache
+        self.assertEqual(len(os.listdir(self.cache_dir)), 6)
+        images = self.loader(cache_dir=self.cache_dir).preload(names)
+        for name, img in zip(names, images):
+            self.assertEqual(self.get_data(img, 16), data[name])
+
+    def test_threads(self):
+        self.check_preload(workers=3)
+
+    def test_processes(self):
+        self.check_preload(workers=2, processes=True)
+
+class LazyImageTestCase(ResourceTestCase):
+    def loader(self, **kwargs):
+        # Upload to a texture object without touching OpenGL.
+        loader = super(LazyImageTestCase, self).loader(**kwargs)
+        self.uploads = []
+        def upload_image(img, atlas=True):
+            self.uploads.append(img)
+            return image.Texture(img.width, img.height, GL_TEXTURE_2D, 1)
+        loader._upload_image = upload_image
+        return loader
+
+    def test_size_from_header(self):
+        self.write_image('a.png', 5, 3)
+        img = self.loader().image('a.png', lazy=True)
+        self.assertTrue(isinstance(img, resource.LazyImage))
+        self.assertEqual((img.width, img.height), (5, 3))
+        self.assertFalse(img.is_loaded)
+        self.assertEqual(self.uploads, [])
+
+        rotated = self.loader().image('a.png', rotate=90, lazy=True)
+        self.assertEqual((rotated.width, rotated.height), (3, 5))
+
+    def test_anchor_not_shared(self):
+        self.write_image('a.png')
+        loader = self.loader()
+        first = loader.image('a.png', lazy=True)
+        second = loader.image('a.png', lazy=True)
+        self.assertFalse(first is second)
+
+        first.anchor_x = 2
+        self.assertEqual(second.anchor_x, 0)
+        first_texture = first.get_texture()
+        second_texture = second.get_texture()
+        self.assertEqual(len(self.uploads), 1)
+        self.assertEqual(first_texture.id, second_texture.id)
+        self.assertEqual(first_texture.anchor_x, 2)
+        self.assertEqual(second_texture.anchor_x, 0)
+
+        second.anchor_y = 1
+        self.assertEqual(second_texture.anchor_y, 1)
+        self.assertEqual(first_texture.anchor_y, 0)
+        self.assertEqual(loader.image('a.png').anchor_y, 0)
+
+    def test_not_abstract_image(self):
+        self.write_image('a.png')
+        img = self.loader().image('a.png', lazy=True)
+        self.assertFalse(isinstance(img, image.AbstractImage))
+        self.assertTrue(isinstance(img.get_texture(), image.AbstractImage))
+        self.assertEqual(img.id, 1)
+        self.assertTrue(img.is_loaded)
+
+@unittest.skipIf(dds.s3tc.numpy is None, 'DDS encoding requires NumPy')
+class CompressedVariantTestCase(ResourceTestCase):
+    def setUp(self):
+        super(CompressedVariantTestCase, self).setUp()
+        self.s3tc = True
+        self.have_extension = gl_info.have_extension
+        gl_info.have_extension = lambda name: (
+            name == 'GL_EXT_texture_compression_s3tc' and self.s3tc)
+
+    def tearDown(self):
+        gl_info.have_extension = self.have_extension
+        super(CompressedVariantTestCase, self).tearDown()
+
+    def write_variant(self, name):
+        self.write_image(name)
+        img = image.load(os.path.join(self.resource_dir, name))
+        img.save(os.path.join(self.resource_dir,
+                              os.path.splitext(name)[0] + '.dds'),
+                 encoder=dds.DDSImageEncoder())
+
+    def test_variant_preferred(self):
+        self.write_variant('a.png')
+        loader = self.loader(prefer_compressed=True)
+        self.assertEqual(loader._get_compressed_variant('a.png'), 'a.dds')
+        self.assertEqual(loader._get_compressed_variant('a.dds'), None)
+        img = loader._load_image('a.png')
+        self.assertTrue(isinstance(img, image.CompressedImageData))
+        self.assertEqual((img.content_width, img.content_height), (4, 3))
+
+    def test_not_preferred(self):
+        self.write_variant('a.png')
+        loader = self.loader()
+        self.assertEqual(loader._get_compressed_variant('a.png'), None)
+        self.assertFalse(isinstance(loader._load_image('a.png'),
+                                    image.CompressedImageData))
+
+    def test_unsupported(self):
+        self.write_variant('a.png')
+        self.s3tc = False
+        loader = self.loader(prefer_compressed=True)
+        self.assertEqual(loader._get_compressed_variant('a.png'), None)
+
+    def test_variant_elsewhere(self):
+        # Only a variant in the same location as the image is used.
+        self.write_variant('a.png')
+        other_dir = os.path.join(self.dir, 'other')
+        os.mkdir(other_dir)
+        os.rename(os.path.join(self.resource_dir, 'a.png'),
+                  os.path.join(other_dir, 'a.png'))
+        loader = resource.Loader(path=[other_dir, self.resource_dir],
+                                 prefer_compressed=True)
+        self.assertEqual(loader._get_compressed_variant('a.png'), None)
+        self.assertEqual(loader._get_compressed_variant('b.png'), None)
+
+    def test_default_loader(self):
+        self.assertEqual(resource._default_loader.prefer_compressed, False)
+        resource._default_loader.prefer_compressed = True
+        try:
+            self.assertEqual(resource.prefer_compressed, True)
+        finally:
+            resource.prefer_compressed = False
+
+if __name__ == '__main__':
+    unittest.main()
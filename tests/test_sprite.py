@@ -0,0 +1,278 @@
+'''Tests for pyglet.sprite.
+
+No OpenGL context is needed; vertex data is kept in client-side arrays and
+OpenGL calls are recorded instead of executed.
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pyglet
+pyglet.options['shadow_window'] = False
+pyglet.options['debug_gl'] = False
+
+from pyglet import image
+from pyglet import sprite
+from pyglet.gl import *
+from pyglet.graphics import vertexbuffer
+
+class PatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.saved = []
+
+    def tearDown(self):
+        for obj, name, value in reversed(self.saved):
+            setattr(obj, name, value)
+
+    def patch(self, obj, name, value):
+        self.saved.append((obj, name, getattr(obj, name)))
+        setattr(obj, name, value)
+
+    def record(self, obj, *names):
+        for name in names:
+            self.patch(obj, name, self._recorder(name))
+
+    def _recorder(self, name):
+        def record(*args):
+            self.calls.append((name,) + args)
+        return record
+
+class FakeProgram(object):
+    program = 1
+    texture = 0
+    corner = 0
+
+    def __init__(self, calls, instanced):
+        self.attributes = [(i + 1, 4, GL_FLOAT, False, 0) for i in range(4)]
+        self.corner_buffer = vertexbuffer.VertexArray(32)
+        if instanced:
+            self.draw_instanced = lambda *args: calls.append(
+                ('draw_instanced',) + args)
+            self.attrib_divisor = lambda *args: None
+        else:
+            self.draw_instanced = None
+
+class InstancedSpriteTestCase(PatchTestCase):
+    def setUp(self):
+        super(InstancedSpriteTestCase, self).setUp()
+        # Instance data is kept in a vertex array.
+        self.patch(gl_info, 'have_version', lambda major, minor=0: True)
+        self.patch(vertexbuffer, '_enable_vbo', False)
+        self.texture = image.Texture(64, 64, GL_TEXTURE_2D, 1)
+
+    def test_unsupported(self):
+        self.patch(gl_info, 'have_version', lambda major, minor=0: False)
+        self.assertFalse(sprite.InstancedSpriteBatch.is_supported())
+        self.assertRaises(GLException,
+                          sprite.InstancedSpriteBatch, self.texture)
+
+    def test_instance_records(self):
+        batch = sprite.InstancedSpriteBatch(self.texture)
+        region = self.texture.get_region(32, 16, 16, 8)
+        sprites = [batch.add(region, x=i, y=2 * i) for i in range(20)]
+        sprites[3].rotation = 90
+        sprites[4].visible = False
+        sprites[5].scale = 2
+        sprites[5].opacity = 128
+
+        instance = sprites[3]._get_instance()
+        self.assertEqual((instance.x, instance.y, instance.rotation),
+                         (3, 6, 90))
+        self.assertEqual((instance.width, instance.height), (16, 8))
+        self.assertEqual((instance.s0, instance.t0, instance.s1, instance.t1),
+                         (0.5, 0.25, 0.75, 0.375))
+        self.assertEqual(sprites[4]._get_instance().scale, 0)
+        self.assertEqual(sprites[5]._get_instance().scale, 2)
+        self.assertEqual(list(sprites[5]._get_instance().color),
+                         [255, 255, 255, 128])
+
+        # The last sprite moves into a deleted sprite's slot
+        sprites[3].delete()
+        self.assertEqual(len(batch), 19)
+        self.assertEqual(sprites[19]._index, 3)
+        self.assertEqual((sprites[19].x, sprites[19].y), (19, 38))
+
+    def draw(self, instanced):
+        self.record(sprite, 'glPushAttrib', 'glPopAttrib', 'glEnable',
+                    'glBindTexture', 'glBlendFunc', 'glUseProgram',
+                    'glUniform1i', 'glEnableVertexAttribArray',
+                    'glDisableVertexAttribArray', 'glVertexAttribPointer',
+                    'glVertexAttrib4f', 'glVertexAttrib4Nub', 'glDrawArrays',
+                    'glFinish')
+        program = FakeProgram(self.calls, instanced)
+        self.patch(sprite, '_get_instanced_program', lambda: program)
+        batch = sprite.InstancedSpriteBatch(self.texture)
+        for i in range(3):
+            batch.add(self.texture)
+        batch.draw()
+        return [call[0] for call in self.calls]
+
+    def test_draw_instanced(self):
+        self.patch(vertexbuffer, '_workaround_vbo_finish', False)
+        names = self.draw(True)
+        self.assertEqual(names.count('draw_instanced'), 1)
+        self.assertFalse('glFinish' in names)
+
+    def test_draw_workaround_finish(self):
+        self.patch(vertexbuffer, '_workaround_vbo_finish', True)
+        names = self.draw(True)
+        self.assertTrue(names.index('glFinish') <
+                        names.index('draw_instanced'))
+
+    def test_draw_not_instanced(self):
+        self.patch(vertexbuffer, '_workaround_vbo_finish', False)
+        names = self.draw(False)
+        self.assertEqual(names.count('glDrawArrays'), 3)
+        self.assertEqual(names.count('glVertexAttrib4Nub'), 3)
+
+class SpriteArrayTestCase(PatchTestCase):
+    def create_sprites(self, count, subpixel=False):
+        batch = pyglet.graphics.Batch()
+        texture = image.Texture(64, 64, GL_TEXTURE_2D, 1)
+        texture.anchor_x = 8
+        images = [texture.get_region(0, 0, 16, 32),
+                  image.Texture(32, 32, GL_TEXTURE_2D, 2)]
+        return [sprite.Sprite(images[i % 2], batch=batch, subpixel=subpixel)
+                for i in range(count)]
+
+    def check_transforms(self, subpixel):
+        count = 20
+        x = [i * 10.5 for i in range(count)]
+        y = [i * -3.25 for i in range(count)]
+        rotation = [i * 20 % 360 for i in range(count)]
+        scale = [1 + i % 3 for i in range(count)]
+
+        sprites = self.create_sprites(count, subpixel)
+        sprites[5].visible = False
+        array = sprite.SpriteArray(sprites)
+        array.set_transforms(x, y, rotation, scale)
+
+        expected = self.create_sprites(count, subpixel)
+        expected[5].visible = False
+        for i, s in enumerate(expected):
+            s.set_position(x[i], y[i])
+            s.rotation = rotation[i]
+            s.scale = scale[i]
+
+        for s, e in zip(sprites, expected):
+            self.assertEqual((s.x, s.y, s.rotation, s.scale),
+                             (e.x, e.y, e.rotation, e.scale))
+            for a, b in zip(s._vertex_list.vertices, e._vertex_list.vertices):
+                self.assertAlmostEqual(a, b, 3)
+
+    def test_set_transforms(self):
+        self.check_transforms(False)
+        self.check_transforms(True)
+
+    def test_set_transforms_without_numpy(self):
+        self.patch(sprite, 'numpy', None)
+        self.check_transforms(False)
+        self.check_transforms(True)
+
+    def test_partial_transforms(self):
+        sprites = self.create_sprites(4)
+        for s in sprites:
+            s.rotation = 45
+        sprite.SpriteArray(sprites).set_transforms(x=[1, 2, 3, 4])
+        self.assertEqual([(s.x, s.y, s.rotation) for s in sprites],
+                         [(i, 0, 45) for i in (1, 2, 3, 4)])
+
+class CompactSpriteTestCase(unittest.TestCase):
+    def test_no_instance_dict(self):
+        batch = pyglet.graphics.Batch()
+        texture = image.Texture(16, 16, GL_TEXTURE_2D, 1)
+        s = sprite.CompactSprite(texture, batch=batch)
+        self.assertFalse(hasattr(s, '__dict__'))
+        self.assertFalse(hasattr(s._vertex_list, '__dict__'))
+        self.assertRaises(AttributeError, setattr, s, 'health', 10)
+
+    def test_same_as_sprite(self):
+        batch = pyglet.graphics.Batch()
+        texture = image.Texture(16, 16, GL_TEXTURE_2D, 1)
+        sprites = [sprite.Sprite(texture, batch=batch),
+                   sprite.CompactSprite(texture, batch=batch)]
+        for s in sprites:
+            s.set_position(10, 20)
+            s.rotation = 30
+            s.scale = 2
+            s.color = (255, 0, 0)
+            s.opacity = 128
+        self.assertEqual(list(sprites[0]._vertex_list.vertices),
+                         list(sprites[1]._vertex_list.vertices))
+        self.assertEqual(list(sprites[0]._vertex_list.colors),
+                         list(sprites[1]._vertex_list.colors))
+        self.assertEqual(sprites[0].group, sprites[1].group)
+
+        sprites[1].delete()
+        self.assertEqual(sprites[1]._vertex_list, None)
+
+class TextureSwapTestCase(PatchTestCase):
+    def setUp(self):
+        super(TextureSwapTestCase, self).setUp()
+        self.batch = pyglet.graphics.Batch()
+        self.sheet = image.Texture(64, 64, GL_TEXTURE_2D, 1000)
+
+    def test_groups_shared(self):
+        parent = pyglet.graphics.OrderedGroup(1)
+        sprites = [sprite.Sprite(self.sheet.get_region(i * 16, 0, 16, 16),
+                                 batch=self.batch, group=parent)
+                   for i in range(4)]
+        self.assertEqual(len(set(id(s._group) for s in sprites)), 1)
+        other = sprite.Sprite(self.sheet, batch=self.batch,
+                              group=pyglet.graphics.OrderedGroup(1))
+        self.assertFalse(other._group is sprites[0]._group)
+
+    def test_swap_within_texture(self):
+        s = sprite.Sprite(self.sheet.get_region(0, 0, 16, 16),
+                          batch=self.batch)
+        vertex_list = s._vertex_list
+        domain = vertex_list.domain
+        start = vertex_list.start
+        # Equal but distinct texture id
+        same = image.Texture(64, 64, GL_TEXTURE_2D, int('1000'))
+        s.image = same.get_region(16, 0, 16, 16)
+        self.assertTrue(s._vertex_list is vertex_list)
+        self.assertTrue(vertex_list.domain is domain)
+        self.assertEqual(vertex_list.start, start)
+        self.assertEqual(list(vertex_list.tex_coords)[:2], [0.25, 0])
+
+    def test_swap_texture_migrates(self):
+        s = sprite.Sprite(self.sheet, batch=self.batch)
+        group = s._group
+        vertex_list = s._vertex_list
+        s.image = image.Texture(64, 64, GL_TEXTURE_2D, 2)
+        self.assertFalse(s._group is group)
+        self.assertTrue(s._vertex_list is vertex_list)
+        self.assertTrue(self.batch.group_map[s._group].values()[0]
+                        is vertex_list.domain)
+        self.assertTrue(self.batch.group_map[group].values()[0]._is_empty())
+
+    def test_animation_updates_position_on_change(self):
+        calls = []
+        update_position = sprite.Sprite._update_position
+        def record(self):
+            calls.append(self)
+            update_position(self)
+        self.patch(sprite.Sprite, '_update_position', record)
+
+        frames = [self.sheet.get_region(i * 16, 0, 16, 16) for i in range(3)]
+        frames.append(self.sheet.get_region(0, 16, 32, 32))
+        animation = image.Animation.from_image_sequence(frames, 0.1)
+        s = sprite.Sprite(animation, x=5, batch=self.batch)
+        pyglet.clock.unschedule(s._animate)
+        del calls[:]
+        s._animate(0.1)
+        s._animate(0.1)
+        self.assertEqual(calls, [])
+        s._animate(0.1)
+        self.assertEqual(calls, [s])
+        self.assertEqual(list(s._vertex_list.vertices),
+                         [5, 0, 37, 0, 37, 32, 5, 32])
+        pyglet.clock.unschedule(s._animate)
+
+if __name__ == '__main__':
+    unittest.main()